@@ -4,15 +4,98 @@ from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin, urlparse
 import time
+from collections import deque
+
+from 爬虫组件.重试 import CircuitOpenError, HostCircuitBreaker, RetryPolicy
 
 class WebCrawler:
-    def __init__(self):
+    def __init__(self, page_delay=1, image_delay=0.5, retry_policy=None, circuit_breaker=None):
         self.visited_urls = set()
+        self.page_delay = page_delay
+        self.image_delay = image_delay
+        self.retry_policy = retry_policy or RetryPolicy()  # 与更新版爬虫共用的重试策略
+        self.breaker = circuit_breaker or HostCircuitBreaker()  # 按主机的熔断器
+        self.host_next_time = {}  # 主机 -> 下次允许请求的时间
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
     
+    def _wait_for_host(self, url, delay):
+        """按主机礼貌延迟：只等待同一主机距上次请求剩余的时间"""
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        start = max(now, self.host_next_time.get(host, 0))
+        self.host_next_time[host] = start + delay
+        if start > now:
+            time.sleep(start - now)
+    
+    def _defer_host(self, host, seconds):
+        """推迟该主机的下一次请求（不缩短已有的更长推迟），由_wait_for_host等待"""
+        self.host_next_time[host] = max(self.host_next_time.get(host, 0), time.monotonic() + seconds)
+    
+    def _get(self, url, delay, **kwargs):
+        """
+        带重试的GET：按retry_policy退避（连接、读取和状态码各有独立的重试次数，429/503遵守Retry-After），
+        连续失败的主机由熔断器暂停；重试次数用完或主机被熔断时抛出最后的异常或返回最后一次的响应
+        请求前主机已处于熔断中时抛出CircuitOpenError
+        """
+        host = urlparse(url).netloc
+        if not self.breaker.allow(host):
+            raise CircuitOpenError(f"主机熔断中: {host}")
+        attempts = self.retry_policy.new_attempts()
+        while True:
+            self._wait_for_host(url, delay)
+            try:
+                response = self.session.get(url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    self.breaker.record_failure(host)
+                kind = self.retry_policy.error_kind(e)
+                wait = None if kind is None else self.retry_policy.next_delay(attempts, kind)
+                if wait is None or not self.breaker.allow(host):
+                    raise
+                print(f"请求 {url} 失败，{wait:.1f}秒后重试: {e}")
+            else:
+                status = response.status_code
+                if status >= 500:
+                    self.breaker.record_failure(host)
+                elif status != 429:
+                    self.breaker.record_success(host)
+                if status not in self.retry_policy.RETRY_STATUS:
+                    return response
+                # Retry-After总是推迟该主机的后续请求，即使超过max_retry_after、本URL不再重试
+                retry_after = self.retry_policy.retry_after(status, response.headers)
+                if retry_after is not None:
+                    self._defer_host(host, retry_after)
+                wait = self.retry_policy.next_delay(attempts, 'status', retry_after)
+                if wait is None or not self.breaker.allow(host):
+                    return response
+                response.close()
+                print(f"{url} 返回 {status}，{wait:.1f}秒后重试")
+            self._defer_host(host, wait)
+    
+    @staticmethod
+    def _decode(response):
+        """
+        解码页面：HTTP头声明的编码 → 正文前4KB中<meta>声明的编码 → UTF-8 → windows-1252
+        不使用response.text，避免未声明编码时对整个正文做统计检测
+        """
+        body = response.content
+        match = re.search(r'charset\s*=\s*["\']?([\w.:-]+)', response.headers.get('content-type', ''), re.I)
+        if not match:
+            match = re.search(r'<meta[^>]*?charset\s*=\s*["\']?\s*([\w.:-]+)',
+                              body[:4096].decode('ascii', errors='replace'), re.I)
+        if match:
+            try:
+                return body.decode(match.group(1), errors='replace')
+            except LookupError:
+                pass
+        try:
+            return body.decode('utf-8')
+        except UnicodeDecodeError:
+            return body.decode('cp1252', errors='replace')
+    
     def is_valid_url(self, url):
         """检查URL是否有效"""
         parsed = urlparse(url)
@@ -20,22 +103,24 @@ class WebCrawler:
     
     def get_all_links(self, url):
         """获取页面中的所有链接"""
-        links = set()
         try:
-            response = self.session.get(url, timeout=5)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                full_url = urljoin(url, href)
-                if self.is_valid_url(full_url):
-                    links.add(full_url)
-            
-            return links
+            response = self._get(url, self.page_delay, timeout=5)
+            soup = BeautifulSoup(self._decode(response), 'html.parser')
+            return self._extract_links(url, soup)
         except Exception as e:
             print(f"获取链接时出错: {e}")
             return set()
     
+    def _extract_links(self, url, soup):
+        """从已解析的页面中提取链接"""
+        links = set()
+        for a_tag in soup.find_all('a', href=True):
+            href = a_tag['href']
+            full_url = urljoin(url, href)
+            if self.is_valid_url(full_url):
+                links.add(full_url)
+        return links
+    
     def crawl(self, start_url, max_depth=1, content_types=None, save_dir='./crawled_data'):
         """
         爬取网页内容
@@ -50,48 +135,52 @@ class WebCrawler:
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
         
-        self._crawl_recursive(start_url, max_depth=max_depth, current_depth=1, 
-                            content_types=content_types, save_dir=save_dir)
-    
-    def _crawl_recursive(self, url, max_depth, current_depth, content_types, save_dir):
-        """递归爬取网页"""
-        if url in self.visited_urls or current_depth > max_depth:
-            return
+        # 广度优先：显式队列代替递归，入队时去重
+        queue = deque([(start_url, 1)])
+        self.visited_urls.add(start_url)
         
-        self.visited_urls.add(url)
+        while queue:
+            url, current_depth = queue.popleft()
+            links = self._crawl_page(url, current_depth, content_types, save_dir)
+            
+            # 如果未达到最大深度，继续爬取链接
+            if current_depth < max_depth:
+                for link in links:
+                    if link not in self.visited_urls:
+                        self.visited_urls.add(link)
+                        queue.append((link, current_depth + 1))
+    
+    def _crawl_page(self, url, current_depth, content_types, save_dir):
+        """爬取单个网页，返回页面中的链接"""
         print(f"正在爬取: {url} (深度: {current_depth})")
         
         try:
-            response = self.session.get(url, timeout=5)
+            response = self._get(url, self.page_delay, timeout=5)
             response.raise_for_status()
             
+            # 只解析一次，各保存步骤共享同一棵解析树
+            soup = BeautifulSoup(self._decode(response), 'html.parser')
+            links = self._extract_links(url, soup)
+            
             # 根据内容类型保存数据
             if 'all' in content_types or 'text' in content_types:
-                self._save_text_content(url, response.text, save_dir)
+                self._save_text_content(url, soup, save_dir)
             
             if 'all' in content_types or 'images' in content_types:
-                self._save_images(url, response.text, save_dir)
+                self._save_images(url, soup, save_dir)
             
             if 'all' in content_types or 'links' in content_types:
-                self._save_links(url, response.text, save_dir)
+                self._save_links(url, links, save_dir)
             
-            # 如果未达到最大深度，继续爬取链接
-            if current_depth < max_depth:
-                links = self.get_all_links(url)
-                for link in links:
-                    self._crawl_recursive(link, max_depth, current_depth + 1, 
-                                         content_types, save_dir)
-                    
-            # 礼貌性延迟
-            time.sleep(1)
+            return links
             
         except Exception as e:
             print(f"爬取 {url} 时出错: {e}")
+            return set()
     
-    def _save_text_content(self, url, html_content, save_dir):
+    def _save_text_content(self, url, soup, save_dir):
         """保存文本内容"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
             text = soup.get_text(separator='\n', strip=True)
             
             # 创建有效的文件名
@@ -112,10 +201,9 @@ class WebCrawler:
         except Exception as e:
             print(f"保存文本内容时出错: {e}")
     
-    def _save_images(self, base_url, html_content, save_dir):
+    def _save_images(self, base_url, soup, save_dir):
         """保存图片"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
             img_tags = soup.find_all('img')
             
             if not img_tags:
@@ -132,7 +220,7 @@ class WebCrawler:
                 img_url = urljoin(base_url, img_url)
                 
                 try:
-                    response = self.session.get(img_url, stream=True, timeout=5)
+                    response = self._get(img_url, self.image_delay, stream=True, timeout=5)
                     response.raise_for_status()
                     
                     # 获取图片扩展名
@@ -159,24 +247,12 @@ class WebCrawler:
                 except Exception as e:
                     print(f"下载图片 {img_url} 时出错: {e}")
                 
-                # 礼貌性延迟
-                time.sleep(0.5)
-                
         except Exception as e:
             print(f"保存图片时出错: {e}")
     
-    def _save_links(self, url, html_content, save_dir):
+    def _save_links(self, url, links, save_dir):
         """保存链接"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            links = set()
-            
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                full_url = urljoin(url, href)
-                if self.is_valid_url(full_url):
-                    links.add(full_url)
-            
             if not links:
                 return
             
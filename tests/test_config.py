@@ -0,0 +1,45 @@
+"""爬虫参数按用途分组为配置对象；单项参数在未给出对应配置对象时用于构造它"""
+import pytest
+
+import 更新版Python爬虫 as crawler
+
+
+def test_config_objects():
+    spider = crawler.EnhancedWebCrawler(
+        politeness=crawler.PolitenessConfig(crawl_delay=0, obey_robots=False),
+        scope=crawler.ScopeConfig(max_pages_per_host=5),
+        storage=crawler.StorageConfig(checkpoint=False, seen_store='bloom'),
+        focus=crawler.FocusConfig(focus_topic=['python']),
+        recrawl=crawler.RecrawlConfig(incremental=True),
+        dns_cache=False)
+    assert spider.scheduler.default_delay == 0
+    assert not spider.obey_robots
+    assert spider.max_pages_per_host == 5
+    assert not spider.checkpoint
+    assert spider.focus_topic is not None and spider.frontier_ordering == 'priority'
+    assert spider.incremental
+
+
+def test_options_build_missing_configs():
+    spider = crawler.EnhancedWebCrawler(crawl_delay=0, max_pages_per_host=5, pool_maxsize=4, dns_cache=False)
+    assert spider.scheduler.default_delay == 0
+    assert spider.max_pages_per_host == 5
+    assert spider.transport.pool_maxsize == 4
+
+
+def test_option_conflicting_with_config_object():
+    with pytest.raises(TypeError):
+        crawler.EnhancedWebCrawler(politeness=crawler.PolitenessConfig(), crawl_delay=0)
+
+
+def test_unknown_option():
+    with pytest.raises(TypeError):
+        crawler.EnhancedWebCrawler(crawl_dealy=0)
+
+
+def test_cross_config_validation():
+    with pytest.raises(ValueError):
+        crawler.EnhancedWebCrawler(storage=crawler.StorageConfig(http_cache=False),
+                                   recrawl=crawler.RecrawlConfig(incremental=True))
+    with pytest.raises(ValueError):
+        crawler.ScopeConfig(near_duplicate_policy='drop')
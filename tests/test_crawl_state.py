@@ -0,0 +1,52 @@
+"""检查点恢复：主机的字节预算在resume后继续累计"""
+import sqlite3
+
+import 更新版Python爬虫 as crawler
+
+
+def test_host_bytes_survive_reopen(tmp_path):
+    path = str(tmp_path / 'state.sqlite')
+    state = crawler.CrawlStateStore(path)
+    state.record_host('a.example')
+    state.record_bytes('a.example', 1000)
+    state.record_bytes('a.example', 500)
+    state.record_bytes('b.example', 20)
+    state.close()
+
+    state = crawler.CrawlStateStore(path)
+    assert state.host_bytes() == {'a.example': 1500, 'b.example': 20}
+    assert state.host_stats()['a.example'] == {'requests': 1, 'errors': 0}
+    state.close()
+
+
+def test_old_database_gets_bytes_column(tmp_path):
+    path = str(tmp_path / 'state.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE host_stats (host TEXT PRIMARY KEY, requests INTEGER NOT NULL DEFAULT 0, '
+                 'errors INTEGER NOT NULL DEFAULT 0)')
+    conn.execute("INSERT INTO host_stats VALUES ('a.example', 3, 1)")
+    conn.commit()
+    conn.close()
+
+    state = crawler.CrawlStateStore(path)
+    state.record_bytes('a.example', 10)
+    state.flush()
+    assert state.host_bytes() == {'a.example': 10}
+    assert state.host_stats()['a.example'] == {'requests': 3, 'errors': 1}
+    state.close()
+
+
+def test_resume_restores_byte_budget(tmp_path):
+    save_dir = str(tmp_path)
+    first = crawler.EnhancedWebCrawler(max_bytes_per_host=100, obey_robots=False)
+    first._open_crawl('http://a.example/', save_dir, resume=False)
+    first._record_bytes('http://a.example/page', 150)
+    first._close_crawl()
+
+    resumed = crawler.EnhancedWebCrawler(max_bytes_per_host=100, obey_robots=False)
+    resumed._open_crawl('http://a.example/', save_dir, resume=True)
+    try:
+        assert resumed._host_bytes == {'a.example': 150}
+        assert resumed._over_budget('a.example')
+    finally:
+        resumed._close_crawl()
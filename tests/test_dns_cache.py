@@ -0,0 +1,107 @@
+"""DNS缓存：临时失败不缓存，重试时不沿用缓存的失败（用桩解析器，不访问真实DNS）"""
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import 更新版Python爬虫 as crawler
+
+
+class StubResolver:
+    """按顺序返回预设结果的解析器：异常（如socket.gaierror）则抛出，否则作为地址列表返回"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, host):
+        self.calls += 1
+        result = self.results[min(self.calls, len(self.results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def again():
+    return socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+
+
+def noname():
+    return socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+
+
+def test_transient_failure_is_not_cached():
+    resolver = StubResolver(again(), ['127.0.0.1'])
+    cache = crawler.DnsCache(resolver=resolver)
+    with pytest.raises(socket.gaierror):
+        cache.resolve('flaky.test')
+    assert cache.resolve('flaky.test') == ('127.0.0.1',)
+    assert resolver.calls == 2
+    assert cache.stats()['transient_failures'] == 1
+
+
+def test_transient_prefetch_failure_is_not_served():
+    resolver = StubResolver(again(), ['127.0.0.1'])
+    cache = crawler.DnsCache(resolver=resolver)
+    cache.prefetch('flaky.test')
+    cache.close()
+    assert cache.resolve('flaky.test') == ('127.0.0.1',)
+    assert resolver.calls == 2
+
+
+def test_missing_host_is_cached_until_forgotten():
+    resolver = StubResolver(noname(), ['127.0.0.1'])
+    cache = crawler.DnsCache(resolver=resolver)
+    for _ in range(3):
+        with pytest.raises(socket.gaierror):
+            cache.resolve('missing.test')
+    assert resolver.calls == 1
+    assert cache.stats()['negative_hits'] == 2
+    cache.forget('missing.test')
+    assert cache.resolve('missing.test') == ('127.0.0.1',)
+    assert resolver.calls == 2
+
+
+def test_forget_keeps_successful_entries():
+    resolver = StubResolver(['127.0.0.1'])
+    cache = crawler.DnsCache(resolver=resolver)
+    cache.resolve('ok.test')
+    cache.forget('ok.test')
+    cache.resolve('ok.test')
+    assert resolver.calls == 1
+
+
+@pytest.fixture
+def server():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = b'<html><body>ok</body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd.server_port
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize('failure', [again, noname], ids=['EAI_AGAIN', 'EAI_NONAME'])
+def test_get_retries_with_fresh_resolution(server, failure):
+    # 第一次解析失败、之后成功：重试应重新解析并成功，而不是把重试次数耗在缓存的失败上
+    resolver = StubResolver(failure(), ['127.0.0.1'])
+    spider = crawler.EnhancedWebCrawler(crawl_delay=0, dns_cache=crawler.DnsCache(resolver=resolver),
+                                        retry_policy=crawler.RetryPolicy(backoff_base=0.01))
+    response = spider._get(f'http://flaky.test:{server}/', timeout=5)
+    assert response.status_code == 200
+    assert resolver.calls == 2
+    assert spider.metrics.counters().get('retries') == 1
@@ -0,0 +1,27 @@
+"""聚焦爬取时站点地图条目按URL相关度打分，并受focus_threshold限制"""
+import 更新版Python爬虫 as crawler
+
+
+def test_sitemap_entries_use_url_relevance(tmp_path):
+    spider = crawler.EnhancedWebCrawler(frontier_ordering='priority', focus_topic='python',
+                                        obey_robots=False, dns_cache=False, checkpoint=False)
+    spider._open_crawl('http://a.example/', str(tmp_path), resume=False)
+    try:
+        relevant = 'http://a.example/python-tutorial'
+        unrelated = 'http://a.example/gardening'
+        for url in (relevant, unrelated):
+            # lastmod时间戳不应绕过聚焦打分
+            spider._enqueue(url, 1, score=spider.score_sitemap_entry(url, 1700000000.0))
+        assert relevant in spider.frontier.seen
+        assert unrelated not in spider.frontier.seen
+        assert spider.metrics.counters().get('focus_skipped') == 1
+        assert spider.score_sitemap_entry(relevant, 1700000000.0) <= 1.0
+    finally:
+        spider._close_crawl()
+
+
+def test_sitemap_entries_use_lastmod_without_focus(tmp_path):
+    spider = crawler.EnhancedWebCrawler(frontier_ordering='priority', obey_robots=False,
+                                        dns_cache=False, checkpoint=False)
+    assert spider.score_sitemap_entry('http://a.example/gardening', 1700000000.0) == 1700000000.0
+    assert spider.score_sitemap_entry('http://a.example/gardening', None) == 0.0
@@ -0,0 +1,52 @@
+"""各HTML解析器后端在测试语料上的输出必须一致（以html.parser为基准）"""
+import os
+
+import pytest
+
+from 爬虫组件 import 解析
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'html_corpus')
+CORPUS = sorted(name for name in os.listdir(CORPUS_DIR) if name.endswith('.html'))
+BACKENDS = [name for name, parser_class in 解析.HTML_PARSERS.items() if parser_class.available()]
+PARTS = ('hrefs', 'images', 'text', 'anchors')
+
+
+def read(name):
+    with open(os.path.join(CORPUS_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def reference(body):
+    return 解析.SoupParser().extract(body.decode('utf-8'), True, True, True)
+
+
+@pytest.mark.parametrize('backend', [name for name in BACKENDS if name != 'html.parser'])
+@pytest.mark.parametrize('name', CORPUS)
+def test_backend_matches_reference(backend, name):
+    body = read(name)
+    parser = 解析.create_html_parser(backend)
+    expected = reference(body)
+    for label, result in (('str', parser.extract(body.decode('utf-8'), True, True, True)),
+                          ('bytes', parser.extract_bytes(body, True, True, True))):
+        for part, got, want in zip(PARTS, result, expected):
+            assert got == want, f"{backend} ({label}) {part} differs on {name}"
+
+
+@pytest.mark.parametrize('name', CORPUS)
+def test_streaming_extractor_finds_same_links(name):
+    body = read(name)
+    extractor = 解析.StreamingLinkExtractor()
+    links = extractor.feed_bytes(body) + extractor.finish()
+    assert sorted(links) == sorted(reference(body)[0])
+
+
+def test_hidden_content_is_not_extracted():
+    hrefs, images, text, _ = reference(read('template.html'))
+    assert '/tpl' not in hrefs and images == [] and 'template text' not in text
+    hrefs, _, text, _ = reference(read('textarea.html'))
+    assert hrefs == ['/real']
+    assert 'ta <b>x</b> & y <a href="/in-textarea">z</a>' in text
+
+
+def test_frame_outside_frameset_is_kept():
+    assert reference(read('frame_in_body.html'))[0] == ['/x', '/f']
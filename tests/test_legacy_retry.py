@@ -0,0 +1,58 @@
+"""旧版爬虫与更新版共用重试策略和熔断器：HTTP日期格式的Retry-After推迟主机，连续5xx打开熔断"""
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import Python爬虫工具 as legacy
+from 爬虫组件.重试 import CircuitOpenError, HostCircuitBreaker, RetryPolicy
+
+
+@pytest.fixture
+def server():
+    """按路径返回状态码：/busy 返回503和10分钟后的HTTP日期Retry-After，/error 返回500"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        requests = 0
+
+        def do_GET(self):
+            Handler.requests += 1
+            self.send_response(503 if self.path == '/busy' else 500)
+            if self.path == '/busy':
+                self.send_header('Retry-After', formatdate(time.time() + 600, usegmt=True))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd, Handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_http_date_retry_after_defers_host(server):
+    httpd, handler = server
+    spider = legacy.WebCrawler(page_delay=0)
+    host = f'127.0.0.1:{httpd.server_port}'
+    response = spider._get(f'http://{host}/busy', 0, timeout=5)
+    # 超过max_retry_after：不重试，但该主机的后续请求要等到约10分钟后
+    assert response.status_code == 503
+    assert handler.requests == 1
+    assert spider.host_next_time[host] >= time.monotonic() + 590
+
+
+def test_repeated_errors_open_circuit(server):
+    httpd, handler = server
+    spider = legacy.WebCrawler(page_delay=0, retry_policy=RetryPolicy(status_retries=5, backoff_base=0.01),
+                               circuit_breaker=HostCircuitBreaker(failure_threshold=2))
+    url = f'http://127.0.0.1:{httpd.server_port}/error'
+    # 熔断打开后不再重试
+    assert spider._get(url, 0, timeout=5).status_code == 500
+    assert handler.requests == 2
+    with pytest.raises(CircuitOpenError):
+        spider._get(url, 0, timeout=5)
@@ -0,0 +1,51 @@
+"""按主机的礼貌调度：429/503退避不缩短已有的推迟，退避倍数有独立的上限，Retry-After总是推迟主机"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import 更新版Python爬虫 as crawler
+
+
+def test_backoff_keeps_longer_deferral():
+    scheduler = crawler.PolitenessScheduler(default_delay=1.0)
+    scheduler.defer('a.example', 600)
+    ready = scheduler.ready_at('a.example')
+    scheduler.record('a.example', 429)
+    assert scheduler.ready_at('a.example') >= ready
+
+
+def test_penalty_capped_by_max_penalty():
+    scheduler = crawler.PolitenessScheduler(default_delay=0.1, backoff_factor=2.0, max_delay=1000, max_penalty=8.0)
+    for _ in range(20):
+        scheduler.record('a.example', 503)
+    assert scheduler.delay_for('a.example') == 0.1 * 8.0
+    # 成功响应后退避逐渐恢复
+    scheduler.record('a.example', 200)
+    assert scheduler.delay_for('a.example') < 0.1 * 8.0
+
+
+def test_retry_after_defers_host_even_when_not_retrying():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(429)
+            self.send_header('Retry-After', '600')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        spider = crawler.EnhancedWebCrawler(crawl_delay=0, dns_cache=False)
+        host = f'127.0.0.1:{httpd.server_port}'
+        # Retry-After超过max_retry_after：不重试本URL，但该主机的后续请求要等到600秒后
+        response = spider._get(f'http://{host}/', timeout=5)
+        assert response.status_code == 429
+        assert spider.scheduler.ready_at(host) >= time.monotonic() + 590
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
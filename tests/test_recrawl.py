@@ -0,0 +1,68 @@
+"""增量重爬历史：失败的复查也推进最近抓取时间，已不存在的页面从历史中删除；重爬计划只计入真正入队的URL"""
+import 更新版Python爬虫 as crawler
+
+DAY = 86400.0
+
+
+def history(tmp_path, **kwargs):
+    return crawler.RecrawlHistory(str(tmp_path / 'recrawl.sqlite'), **kwargs)
+
+
+def test_failed_revisit_moves_last_fetched(tmp_path):
+    recrawl = history(tmp_path)
+    recrawl.record('http://a.example/broken', 1, True, now=0.0)
+    recrawl.record('http://a.example/ok', 1, True, now=0.0)
+    assert recrawl.record_failure('http://a.example/broken', 500, now=10 * DAY) == 'failed'
+    recrawl.record('http://a.example/ok', 1, False, now=10 * DAY)
+
+    # 失败的页面不应因为最近抓取时间停留在过去而一直排在最前
+    plan = recrawl.plan(2, now=11 * DAY)
+    probabilities = {url: probability for url, _, probability in plan}
+    assert probabilities['http://a.example/broken'] < 0.5
+    recrawl.close()
+
+
+def test_gone_pages_are_dropped(tmp_path):
+    recrawl = history(tmp_path)
+    for status in (404, 410):
+        url = f'http://a.example/{status}'
+        recrawl.record(url, 1, True, now=0.0)
+        assert recrawl.record_failure(url, status, now=DAY) == 'gone'
+        assert not recrawl.known(url)
+    assert len(recrawl) == 0
+    recrawl.close()
+
+
+def test_repeated_failures_drop_page(tmp_path):
+    recrawl = history(tmp_path, max_failures=3)
+    url = 'http://a.example/flaky'
+    recrawl.record(url, 1, True, now=0.0)
+    assert recrawl.record_failure(url, None, now=DAY) == 'failed'
+    assert recrawl.record_failure(url, 503, now=2 * DAY) == 'failed'
+    # 成功抓取后重新计数
+    recrawl.record(url, 1, False, now=3 * DAY)
+    assert recrawl.record_failure(url, None, now=4 * DAY) == 'failed'
+    assert recrawl.record_failure(url, None, now=5 * DAY) == 'failed'
+    assert recrawl.record_failure(url, None, now=6 * DAY) == 'gone'
+    assert not recrawl.known(url)
+    recrawl.close()
+
+
+def test_unknown_url_is_ignored(tmp_path):
+    recrawl = history(tmp_path)
+    assert recrawl.record_failure('http://a.example/new', 404) is None
+    assert len(recrawl) == 0
+    recrawl.close()
+
+
+def test_revisits_already_queued_are_not_counted_twice(tmp_path):
+    spider = crawler.EnhancedWebCrawler(incremental=True, obey_robots=False, dns_cache=False, checkpoint=False)
+    spider._open_crawl('http://a.example/', str(tmp_path), resume=False)
+    try:
+        spider.recrawl.record('http://a.example/known', 1, True, now=0.0)
+        spider.frontier.push('http://a.example/known', 1, 0.0)
+        before = dict(spider._host_pages)
+        spider._schedule_revisits()
+        assert spider._host_pages == before
+    finally:
+        spider._close_crawl()
@@ -0,0 +1,59 @@
+"""分片输出：后台线程的写入错误要报告给调用方，线程退出后write()不能阻塞"""
+import json
+
+import pytest
+
+from 爬虫组件 import 输出
+
+
+class FailingSink(输出.JsonlShardSink):
+    """URL含有fail的记录编码失败"""
+
+    def encode(self, url, fetched_at, text, links):
+        if 'fail' in url:
+            raise ValueError(f"无法编码: {url}")
+        return super().encode(url, fetched_at, text, links)
+
+
+def test_records_round_trip(tmp_path):
+    sink = 输出.JsonlShardSink(str(tmp_path))
+    assert sink.write('http://a.example/', 'hello', {'http://a.example/b'})
+    sink.close()
+    record = json.loads(sink.read('http://a.example/'))
+    assert record['text'] == 'hello'
+    assert record['links'] == ['http://a.example/b']
+
+
+def test_write_error_raised_by_next_write(tmp_path):
+    sink = FailingSink(str(tmp_path))
+    sink.write('http://a.example/fail', 'x')
+    # 等后台线程处理完失败的记录
+    for _ in range(200):
+        if sink._error is not None:
+            break
+        sink._writer.join(0.01)
+    with pytest.raises(ValueError):
+        sink.write('http://a.example/ok', 'y')
+    sink.close()
+
+
+def test_write_error_raised_by_close(tmp_path):
+    sink = FailingSink(str(tmp_path))
+    sink.write('http://a.example/fail', 'x')
+    with pytest.raises(ValueError):
+        sink.close()
+
+
+def test_setup_failure_does_not_block(tmp_path):
+    # 索引路径是目录时后台线程无法打开数据库
+    broken = tmp_path / 'broken'
+    (broken / 'index.sqlite').mkdir(parents=True)
+    sink = 输出.JsonlShardSink(str(broken), queue_size=1)
+    sink._writer.join(5)
+    assert not sink._writer.is_alive()
+    # 第一次报告线程的错误，之后报告线程已退出，都不会在满队列上阻塞
+    with pytest.raises(Exception):
+        sink.write('http://a.example/1', 'x')
+    with pytest.raises(RuntimeError):
+        sink.write('http://a.example/2', 'x')
+    sink.close()
@@ -0,0 +1,208 @@
+"""传输参数在本机HTTP/1.1和HTTP/2（h2c）服务器上的实际效果：连接复用、每连接请求数、总连接数上限"""
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import 更新版Python爬虫 as crawler
+
+PAGES = 6
+# 服务器每个响应的延迟，让异步引擎有机会并发请求
+RESPONSE_DELAY = 0.05
+
+
+def page(path):
+    """根页面链接到所有页面，其余页面链接回根页面；未知路径返回None"""
+    if path == '/':
+        links = ''.join(f'<a href="/p/{i}">p{i}</a>' for i in range(1, PAGES))
+    elif path.startswith('/p/') and path[3:].isdigit() and 0 < int(path[3:]) < PAGES:
+        links = '<a href="/">home</a>'
+    else:
+        return None
+    return f'<html><body><p>{path}</p>{links}</body></html>'.encode()
+
+
+class CountingServer:
+    """HTTP/1.1 keep-alive服务器，统计连接数和请求数"""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                time.sleep(RESPONSE_DELAY)
+                body = page(self.path)
+                self.send_response(404 if body is None else 200)
+                body = body or b'not found'
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class H2cServer:
+    """以prior knowledge方式直接说HTTP/2的明文服务器，统计连接数和同时打开的流数"""
+
+    def __init__(self, h2):
+        self.h2 = h2
+        self.connections = 0
+        self.requests = 0
+        self.max_streams = 0
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._run, args=(ready,), daemon=True).start()
+        ready.wait(5)
+        self.url = f'http://127.0.0.1:{self.port}/'
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+        self.loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        h2 = self.h2
+        self.connections += 1
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        open_streams = set()
+
+        async def respond(stream_id, path):
+            await asyncio.sleep(RESPONSE_DELAY)
+            body = page(path)
+            status = 404 if body is None else 200
+            body = body or b'not found'
+            conn.send_headers(stream_id, [(':status', str(status)), ('content-type', 'text/html; charset=utf-8'),
+                                          ('content-length', str(len(body)))])
+            conn.send_data(stream_id, body, end_stream=True)
+            writer.write(conn.data_to_send())
+            open_streams.discard(stream_id)
+
+        while True:
+            data = await reader.read(65535)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    headers = {name.decode() if isinstance(name, bytes) else name:
+                               value.decode() if isinstance(value, bytes) else value
+                               for name, value in event.headers}
+                    self.requests += 1
+                    open_streams.add(event.stream_id)
+                    self.max_streams = max(self.max_streams, len(open_streams))
+                    asyncio.ensure_future(respond(event.stream_id, headers[':path']))
+            writer.write(conn.data_to_send())
+        writer.close()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def http11():
+    server = CountingServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def h2c():
+    h2 = pytest.importorskip('h2')
+    pytest.importorskip('httpx')
+    import h2.config
+    import h2.connection
+    import h2.events
+    server = H2cServer(h2)
+    yield server
+    server.close()
+
+
+def crawl(engine, url, save_dir, **kwargs):
+    spider = engine(crawl_delay=0, obey_robots=False, checkpoint=False, http_cache=False, dns_cache=False, **kwargs)
+    # 不按响应时间拉开同一主机的请求间隔，异步引擎的并发请求才会真正重叠
+    spider.scheduler.latency_factor = 0
+    spider.crawl(url, max_depth=2, content_types=['links'], save_dir=str(save_dir))
+    return spider
+
+
+def test_sync_reuses_one_connection(http11, tmp_path):
+    crawl(crawler.EnhancedWebCrawler, http11.url, tmp_path)
+    assert http11.requests == PAGES
+    assert http11.connections == 1
+
+
+def test_sync_max_requests_per_connection(http11, tmp_path):
+    transport = crawler.TransportConfig(max_requests_per_connection=2)
+    crawl(crawler.EnhancedWebCrawler, http11.url, tmp_path, transport=transport)
+    assert http11.requests == PAGES
+    assert http11.connections == (PAGES + 1) // 2
+
+
+def test_async_pool_connections_limits_total_connections(http11, tmp_path):
+    pytest.importorskip('aiohttp')
+    transport = crawler.TransportConfig(pool_connections=1)
+    crawl(crawler.AsyncWebCrawler, http11.url, tmp_path, transport=transport, per_host_concurrency=4)
+    assert http11.requests == PAGES
+    assert http11.connections == 1
+
+
+def test_async_opens_parallel_connections_without_limit(http11, tmp_path):
+    pytest.importorskip('aiohttp')
+    crawl(crawler.AsyncWebCrawler, http11.url, tmp_path, per_host_concurrency=4)
+    assert http11.requests == PAGES
+    assert http11.connections > 1
+
+
+def test_async_rejects_max_requests_per_connection():
+    with pytest.raises(ValueError):
+        crawler.AsyncWebCrawler(transport=crawler.TransportConfig(max_requests_per_connection=10))
+
+
+def test_async_http2_rejects_pool_maxsize():
+    with pytest.raises(ValueError):
+        crawler.AsyncWebCrawler(transport=crawler.TransportConfig(http2=True, pool_maxsize=4))
+    # 默认值不受影响
+    crawler.AsyncWebCrawler(transport=crawler.TransportConfig(http2=True))
+
+
+def test_sync_rejects_http2():
+    with pytest.raises(ValueError):
+        crawler.EnhancedWebCrawler(transport=crawler.TransportConfig(http2=True))
+
+
+def test_h2c_multiplexes_one_connection(h2c, tmp_path):
+    pytest.importorskip('aiohttp')
+    transport = crawler.TransportConfig(http2='h2c')
+    crawl(crawler.AsyncWebCrawler, h2c.url, tmp_path, transport=transport, per_host_concurrency=4)
+    assert h2c.requests == PAGES
+    assert h2c.connections == 1
+    assert h2c.max_streams > 1
@@ -1,15 +1,153 @@
 import os
 import requests
-from bs4 import BeautifulSoup
 import re
+import io
 from urllib.parse import urljoin, urlparse
 import time
+import hashlib
+import gzip
+import zlib
 import logging
+import asyncio
+import contextlib
+import multiprocessing
+from xml.etree import ElementTree
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm  # 进度条支持（需安装：pip install tqdm）
 
+try:
+    import aiohttp  # 异步引擎支持（需安装：pip install aiohttp）
+except ImportError:
+    aiohttp = None
+
+try:
+    import httpx  # 异步引擎的可选HTTP/2传输（需安装：pip install httpx[http2]）
+except ImportError:
+    httpx = None
+
+from 爬虫组件.网址 import SEEN_STORES, UrlPatternAnalyzer, canonicalize_url, compile_strip_params, url_pattern
+from 爬虫组件.解析 import (CharsetResolver, MAX_ANCHOR_CHARS, PageResult, StreamingLinkExtractor,
+                     create_html_parser, decode_body, init_parse_worker, parse_body, parse_in_worker)
+from 爬虫组件.调度 import CrawlFrontier, PolitenessScheduler, PriorityOrdering
+from 爬虫组件.重试 import CircuitOpenError, HostCircuitBreaker, RetryPolicy
+from 爬虫组件.站点规则 import RobotsCache, RobotsRules, iter_sitemap, parse_lastmod
+from 爬虫组件.状态存储 import CrawlStateStore, HttpValidatorCache, RecrawlHistory
+from 爬虫组件.内容分析 import LinkGraph, SimHashIndex, simhash
+from 爬虫组件.输出 import ContentAddressedImageStore, FileSink, OUTPUT_SINKS
+from 爬虫组件.配置 import (FocusConfig, PolitenessConfig, RecrawlConfig, ScopeConfig, StorageConfig,
+                     TransportConfig, config_from_options)
+from 爬虫组件.域名解析 import DnsCache, DnsCacheResolver
+from 爬虫组件.传输 import Http2Response, TimedHTTPAdapter, take_connect_time
+from 爬虫组件.指标 import CrawlMetrics, MetricsServer
+
+
 class EnhancedWebCrawler:
-    def __init__(self):
-        self.visited_urls = set()
+    # 当前主机尚在礼貌延迟中时，最多连续跳过多少个待爬URL去处理其他主机
+    MAX_DEFERRALS = 100
+    # download_resource在服务器返回304时的返回值
+    UNCHANGED = 'unchanged'
+    # 站点地图播种时最多读取的站点地图文件数（含索引中嵌套的）
+    MAX_SITEMAPS = 1000
+    # 是否支持TransportConfig.http2
+    SUPPORTS_HTTP2 = False
+
+    def __init__(self, frontier_ordering='bfs', html_parser='auto', max_body_size=10 * 1024 * 1024,
+                 srcset_mode='all', politeness=None, scope=None, storage=None, focus=None, recrawl=None,
+                 transport=None, dns_cache=True, metrics_hooks=None, metrics_port=None, **options):
+        """
+        :param frontier_ordering: 待爬队列的排序策略（'bfs', 'host', 'priority', 'pagerank'），
+            'pagerank'时记录链接图并按链接的PageRank排序（未计算过的链接取父页面PageRank按出链数均分）
+        :param html_parser: HTML解析器后端（'auto', 'selectolax', 'lxml', 'html.parser'），未安装时回退到html.parser
+        :param max_body_size: 只提取链接时流式读取的正文上限（字节），超出后停止读取；None表示不限制
+        :param srcset_mode: 'all' 下载srcset中的所有候选，'best' 只下载宽度/像素密度最大的一个
+        :param politeness: 请求间隔、robots.txt、重试和熔断（PolitenessConfig实例）
+        :param scope: URL规范化、陷阱检测、按主机配额和近似重复处理（ScopeConfig实例）
+        :param storage: 检查点、已见URL和待爬队列的存储、HTTP缓存和输出（StorageConfig实例）
+        :param focus: 聚焦爬取和链接图（FocusConfig实例）
+        :param recrawl: 增量重爬（RecrawlConfig实例）
+        :param transport: 连接池、keep-alive和超时设置（TransportConfig实例）；HTTP/2只用于异步引擎
+            以上配置为None时使用默认配置
+        :param dns_cache: DNS缓存：True时使用默认设置的DnsCache，也可传入DnsCache实例（如使用自定义解析器），
+            False时每次新建连接都由系统解析；缓存在每次爬取开始时清空，链接入队时即在后台预解析其主机
+            （HTTP/2客户端不使用此缓存）
+        :param metrics_hooks: 指标钩子列表，每个钩子接收事件字典（见CrawlMetrics.add_hook）
+        :param metrics_port: 爬取期间在该端口提供Prometheus格式的 /metrics（仅本机），None表示不启动
+        :param options: 各配置对象的单项参数（如crawl_delay=0、incremental=True），用于未给出该配置对象时
+            构造它；与对应的配置对象同时给出时报错
+        """
+        politeness = config_from_options(PolitenessConfig, politeness, options)
+        scope = config_from_options(ScopeConfig, scope, options)
+        storage = config_from_options(StorageConfig, storage, options)
+        focus = config_from_options(FocusConfig, focus, options)
+        recrawl = config_from_options(RecrawlConfig, recrawl, options)
+        transport = config_from_options(TransportConfig, transport, options)
+        if options:
+            raise TypeError(f"未知参数: {', '.join(options)}")
+        # 已入队的规范化URL（入队时去重）
+        seen_store = storage.seen_store
+        self.visited_urls = SEEN_STORES[seen_store]() if isinstance(seen_store, str) else seen_store
+        self.strip_params = compile_strip_params(scope.strip_query_params)
+        self.trap_detection = scope.trap_detection
+        self.max_urls_per_pattern = scope.max_urls_per_pattern
+        self.url_patterns = None
+        self._traps_reported = set()  # 已记录日志的 (主机, 原因) 或URL模板
+        self.max_pages_per_host = scope.max_pages_per_host
+        self.max_bytes_per_host = scope.max_bytes_per_host
+        self._host_pages = {}  # 主机 -> 已入队的页面数
+        self._host_bytes = {}  # 主机 -> 已下载的字节数
+        self.focus_topic = focus.focus_topic
+        self.focus_threshold = focus.focus_threshold
+        self.focus_budget = focus.focus_budget
+        self.focus_weights = focus.focus_weights
+        self._pages_dispatched = 0
+        if self.focus_topic is not None and frontier_ordering == 'bfs':
+            frontier_ordering = 'priority'
+        self.frontier_ordering = frontier_ordering
+        self.max_frontier_memory = storage.max_frontier_memory
+        self.frontier = None
+        self.checkpoint = storage.checkpoint
+        self.checkpoint_interval = storage.checkpoint_interval
+        self.state = None
+        self.host_stats = {}  # 主机 -> {'requests': 请求数, 'errors': 错误数}
+        self.use_http_cache = storage.http_cache
+        self.http_cache = None
+        if recrawl.incremental and not storage.http_cache:
+            raise ValueError("增量模式需要http_cache判断页面是否变化")
+        self.incremental = recrawl.incremental
+        self.recrawl_budget = recrawl.recrawl_budget
+        self.recrawl = None
+        self.use_link_graph = focus.link_graph or frontier_ordering == 'pagerank'
+        self.pagerank_interval = focus.pagerank_interval
+        self.link_graph = None
+        self._link_graph_path = None
+        self._page_ranks = None  # 最近一次计算的PageRank（按链接图中的ID）
+        self._pages_since_rank = 0
+        self.near_duplicate_policy = scope.near_duplicate_policy
+        self.near_duplicate_distance = scope.near_duplicate_distance
+        self.near_duplicates = None
+        self.content_addressed_images = storage.content_addressed_images
+        self.image_store = None
+        self.srcset_mode = srcset_mode
+        self._images_seen = set()  # 本次爬取中已处理过的图片URL
+        self.html_parser = create_html_parser(html_parser)
+        self.charsets = CharsetResolver()
+        self.max_body_size = max_body_size
+        self.output_sink = storage.output_sink
+        self.shard_compression = storage.shard_compression
+        self.max_shard_bytes = storage.max_shard_bytes
+        self.sink = None
+        self.metrics = CrawlMetrics(metrics_hooks)
+        self.metrics_port = metrics_port
+        self._metrics_server = None
+        self.obey_robots = politeness.obey_robots
+        self.robots_ttl = politeness.robots_ttl
+        self.robots_user_agent = politeness.robots_user_agent
+        self.robots = None
+        self.retry_policy = politeness.retry_policy or RetryPolicy()
+        self.breaker = politeness.circuit_breaker or HostCircuitBreaker()
+        self._suspended = {}  # 熔断中的主机 -> 暂停调度的待爬条目
+        self.scheduler = PolitenessScheduler(default_delay=politeness.crawl_delay, host_delays=politeness.host_delays)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -17,6 +155,19 @@ class EnhancedWebCrawler:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
         })
+        self.transport = transport
+        if self.transport.http2 and not self.SUPPORTS_HTTP2:
+            raise ValueError("HTTP/2只用于异步引擎（AsyncWebCrawler）")
+        self.dns_cache = DnsCache() if dns_cache is True else (dns_cache or None)
+        if self.dns_cache is not None and self.dns_cache.on_resolve is None:
+            self.dns_cache.on_resolve = self._observe_dns
+        self.adapter = TimedHTTPAdapter(pool_connections=self.transport.pool_connections,
+                                        pool_maxsize=self.transport.pool_maxsize,
+                                        keepalive_timeout=self.transport.keepalive_timeout,
+                                        max_requests_per_connection=self.transport.max_requests_per_connection,
+                                        dns_cache=self.dns_cache)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
         self.setup_logging()
 
     def setup_logging(self):
@@ -33,7 +184,11 @@ class EnhancedWebCrawler:
 
     def is_valid_url(self, url):
         """检查URL是否有效"""
-        parsed = urlparse(url)
+        try:
+            parsed = urlparse(url)
+            parsed.port  # 端口不是数字或超出范围时抛出ValueError
+        except ValueError:
+            return False
         if not all([parsed.scheme, parsed.netloc]):
             return False
         
@@ -53,35 +208,12 @@ class EnhancedWebCrawler:
         return text[:max_length].strip('_')
 
     def get_all_links(self, url):
-        """获取页面中的所有有效链接"""
-        links = set()
+        """获取页面中的所有有效链接（边下载边提取，不构建DOM树）"""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # 检查内容类型是否为HTML
-            content_type = response.headers.get('content-type', '').lower()
-            if 'html' not in content_type:
-                self.logger.warning(f"非HTML内容: {url} (Content-Type: {content_type})")
-                return links
+            links, _ = self._stream_links(url)
+            if links is None:
+                return set()
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 查找所有可能的链接标签
-            for tag in soup.find_all(['a', 'link', 'area'], href=True):
-                href = tag['href'].strip()
-                if href.startswith('javascript:') or href.startswith('mailto:'):
-                    continue
-                full_url = urljoin(url, href)
-                if self.is_valid_url(full_url):
-                    links.add(full_url)
-            
-            # 处理iframe/srcset等特殊标签
-            for tag in soup.find_all(['iframe', 'frame'], src=True):
-                full_url = urljoin(url, tag['src'].strip())
-                if self.is_valid_url(full_url):
-                    links.add(full_url)
-            
             self.logger.info(f"从 {url} 提取到 {len(links)} 个链接")
             return links
             
@@ -89,40 +221,218 @@ class EnhancedWebCrawler:
             self.logger.error(f"获取 {url} 链接时出错: {str(e)}")
             return set()
 
+    def parse_page(self, url, html, content_types=None):
+        """
+        解析一次页面，同时产出文本、图片候选和出链
+        :param content_types: 需要的内容类型，未请求的部分不做提取（出链总是提取）
+        :return: PageResult
+        """
+        want_text, want_images, want_anchors = self._wanted_parts(content_types)
+        started = time.perf_counter()
+        hrefs, images, text, anchors = self.html_parser.extract(html, want_text, want_images, want_anchors)
+        self.metrics.observe('parse', time.perf_counter() - started, url)
+        return self._build_page(url, hrefs, images, text, anchors)
+
+    def _parse_body(self, url, body, encoding, content_types):
+        """解析原始正文（同parse_page），解析器支持该编码时直接接收字节"""
+        want_text, want_images, want_anchors = self._wanted_parts(content_types)
+        (hrefs, images, text, anchors), decode_seconds, parse_seconds = parse_body(
+            self.html_parser, body, encoding, want_text, want_images, want_anchors)
+        self._observe_parse(url, decode_seconds, parse_seconds)
+        return self._build_page(url, hrefs, images, text, anchors)
+
+    def _observe_parse(self, url, decode_seconds, parse_seconds):
+        """记录parse_body的耗时（字节直接交给解析器时没有单独的解码耗时）"""
+        if decode_seconds is not None:
+            self.metrics.observe('decode', decode_seconds, url)
+        self.metrics.observe('parse', parse_seconds, url)
+
+    def _resolve_charset(self, url, content_type, body):
+        """判定正文编码（见CharsetResolver），按来源计数，判定耗时计入解码阶段"""
+        started = time.perf_counter()
+        encoding, source = self.charsets.resolve(urlparse(url).netloc, content_type, body)
+        self.metrics.observe('decode', time.perf_counter() - started, url)
+        self.metrics.increment(f'charset_{source}')
+        return encoding
+
+    def _wanted_parts(self, content_types):
+        """
+        根据内容类型决定提取哪些部分，返回 (want_text, want_images, want_anchors)
+        近似重复检测和聚焦爬取总是需要正文，聚焦爬取还需要锚文本
+        """
+        if content_types is None:
+            content_types = ['all']
+        want_all = 'all' in content_types
+        focused = self.focus_topic is not None
+        want_text = want_all or 'text' in content_types or self.near_duplicate_policy is not None or focused
+        return want_text, want_all or 'images' in content_types, focused
+
+    def _build_page(self, url, hrefs, images, text, anchors=None):
+        """由解析器的原始输出构建PageResult（链接转为绝对URL并过滤，同一链接的多个锚文本合并）"""
+        page = PageResult(url, text, images)
+        for index, href in enumerate(hrefs):
+            full_url = urljoin(url, href)
+            if self.is_valid_url(full_url):
+                page.links.add(full_url)
+                if anchors and anchors[index]:
+                    key = canonicalize_url(full_url, self.strip_params)
+                    known = page.anchors.get(key)
+                    if known is None:
+                        page.anchors[key] = anchors[index]
+                    elif anchors[index] not in known and len(known) < MAX_ANCHOR_CHARS:
+                        page.anchors[key] = f"{known} | {anchors[index]}"[:MAX_ANCHOR_CHARS]
+        return page
+
     def download_resource(self, url, save_path):
-        """通用资源下载方法"""
+        """
+        通用资源下载方法
+        文件已存在且有缓存的验证器时发送条件请求，304时返回UNCHANGED
+        """
+        cached = None
+        if self.http_cache is not None and os.path.exists(save_path):
+            cached = self.http_cache.get(url)
+        return self._download(url, save_path, cached)[0]
+
+    def _download(self, url, save_path, cached=None):
+        """
+        下载资源到save_path，写入的同时计算SHA-256（失败时按retry_policy重试）
+        :param cached: 验证器缓存条目，非None时发送条件请求
+        :return: (结果, 摘要)，结果为True、UNCHANGED或False
+        """
         try:
-            for attempt in range(3):  # 重试机制
-                try:
-                    with self.session.get(url, stream=True, timeout=15) as response:
-                        response.raise_for_status()
-                        
-                        # 检查内容类型
-                        content_type = response.headers.get('content-type', '').lower()
-                        if 'image' in content_type or url.lower().split('?')[0].split('.')[-1] in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
-                            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-                            with open(save_path, 'wb') as f:
-                                for chunk in response.iter_content(8192):
-                                    f.write(chunk)
-                            return True
-                        else:
-                            self.logger.warning(f"非图片内容: {url} (Content-Type: {content_type})")
-                            return False
-                except requests.exceptions.RequestException as e:
-                    if attempt == 2:
-                        raise
-                    time.sleep(1)
+            with self._get(url, stream=True, timeout=15,
+                           headers=HttpValidatorCache.conditional_headers(cached)) as response:
+                if response.status_code == 304 and cached is not None:
+                    return self.UNCHANGED, None
+                response.raise_for_status()
+                
+                # 检查内容类型
+                content_type = response.headers.get('content-type', '').lower()
+                if 'image' in content_type or url.lower().split('?')[0].split('.')[-1] in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
+                    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                    digest = hashlib.sha256()
+                    started = time.perf_counter()
+                    with open(save_path, 'wb') as f:
+                        for chunk in response.iter_content(8192):
+                            digest.update(chunk)
+                            f.write(chunk)
+                        size = f.tell()
+                    self.metrics.observe('download', time.perf_counter() - started, url)
+                    self._record_bytes(url, size)
+                    if self.http_cache is not None:
+                        self.http_cache.store(url, response.headers, digest.hexdigest())
+                    return True, digest.hexdigest()
+                else:
+                    self.logger.warning(f"非图片内容: {url} (Content-Type: {content_type})")
+                    return False, None
         except Exception as e:
             self.logger.error(f"下载 {url} 失败: {str(e)}")
+            return False, None
+
+    def _fetch_page(self, url):
+        """
+        抓取页面的原始字节：有缓存的验证器时发送条件请求，304时使用缓存的正文
+        不使用response.text（未声明编码时requests按ISO-8859-1解码或对整个正文做统计检测），编码由_resolve_charset判定
+        :return: (正文字节, 编码, 内容是否与上次相同)，非文本内容返回 (None, None, False)
+        """
+        cached = self.http_cache.get(url) if self.http_cache is not None else None
+        
+        response = self._get(url, timeout=10, headers=HttpValidatorCache.conditional_headers(cached))
+        
+        if response.status_code == 304:
+            if cached is None or cached['body'] is None:
+                self.logger.warning(f"收到304但没有缓存副本: {url}")
+                return None, None, False
+            return zlib.decompress(cached['body']), cached['encoding'], True
+        response.raise_for_status()
+        
+        # 检查内容类型
+        content_type = response.headers.get('content-type', '').lower()
+        if not ('html' in content_type or 'text' in content_type):
+            self.logger.warning(f"跳过非文本内容: {url} (Content-Type: {content_type})")
+            return None, None, False
+        
+        body = response.content
+        self._record_bytes(url, len(body))
+        encoding = self._resolve_charset(url, content_type, body)
+        return body, encoding, self._store_validators(url, response.headers, body, encoding, cached)
+
+    def _stream_links(self, url, on_link=None):
+        """
+        流式抓取页面并提取链接：每读到一块正文就交给增量分词器，新链接立即回调on_link
+        正文超过max_body_size时停止读取（截断的正文不写入验证器缓存）
+        :return: (链接集合, 内容是否与上次相同)，非文本内容返回 (None, False)
+        """
+        cached = self.http_cache.get(url) if self.http_cache is not None else None
+        links = set()
+        
+        with self._get(url, stream=True, timeout=10,
+                       headers=HttpValidatorCache.conditional_headers(cached)) as response:
+            if response.status_code == 304:
+                if cached is None or cached['body'] is None:
+                    self.logger.warning(f"收到304但没有缓存副本: {url}")
+                    return None, False
+                extractor = StreamingLinkExtractor()
+                self._collect_links(url, extractor.feed_text(HttpValidatorCache.cached_text(cached)), links, on_link)
+                self._collect_links(url, extractor.finish(), links, on_link)
+                return links, True
+            response.raise_for_status()
+            
+            content_type = response.headers.get('content-type', '').lower()
+            if not ('html' in content_type or 'text' in content_type):
+                self.logger.warning(f"跳过非文本内容: {url} (Content-Type: {content_type})")
+                return None, False
+            
+            extractor = StreamingLinkExtractor(
+                max_bytes=self.max_body_size, resolve=lambda prefix: self._resolve_charset(url, content_type, prefix))
+            started = time.perf_counter()
+            for chunk in response.iter_content(8192):
+                self._collect_links(url, extractor.feed_bytes(chunk), links, on_link)
+                if extractor.truncated:
+                    self.logger.warning(f"正文超过 {self.max_body_size} 字节，停止读取: {url}")
+                    break
+            self._collect_links(url, extractor.finish(), links, on_link)
+            # 流式提取时下载和分词交替进行，合计为下载耗时
+            self.metrics.observe('download', time.perf_counter() - started, url)
+            self._record_bytes(url, extractor.bytes_read)
+        return links, self._store_stream_validators(url, response.headers, extractor, cached)
+
+    def _collect_links(self, url, hrefs, links, on_link):
+        """把原始链接解析为绝对URL，新的有效链接加入links并回调on_link"""
+        for href in hrefs:
+            full_url = urljoin(url, href)
+            if full_url not in links and self.is_valid_url(full_url):
+                links.add(full_url)
+                if on_link is not None:
+                    on_link(full_url)
+
+    def _store_stream_validators(self, url, headers, extractor, cached):
+        """流式抓取后保存验证器（规则同_store_validators），正文被截断时不保存"""
+        if self.http_cache is None or extractor.truncated:
+            return False
+        content_hash = extractor.digest.hexdigest()
+        self.http_cache.store(url, headers, content_hash, extractor.compressed_body(), extractor.encoding,
+                              compressed=True)
+        return cached is not None and cached['content_hash'] == content_hash
+
+    def _store_validators(self, url, headers, body, encoding, cached):
+        """保存页面的验证器和正文，返回内容是否与缓存相同（服务器不支持条件请求时按哈希判断）"""
+        if self.http_cache is None:
             return False
+        content_hash = hashlib.sha256(body).hexdigest()
+        self.http_cache.store(url, headers, content_hash, body, encoding)
+        return cached is not None and cached['content_hash'] == content_hash
 
-    def crawl(self, start_url, max_depth=1, content_types=None, save_dir='./crawled_data'):
+    def crawl(self, start_url, max_depth=1, content_types=None, save_dir='./crawled_data', resume=False,
+              use_sitemaps=False):
         """
         增强版爬取方法
         :param start_url: 起始URL
         :param max_depth: 爬取深度
         :param content_types: 内容类型 ('text', 'images', 'links', 'all')
         :param save_dir: 保存目录
+        :param resume: 是否从保存目录中的上次检查点继续
+        :param use_sitemaps: 是否用站点的sitemap播种（sitemap中的页面与start_url同为第1层）
         """
         if content_types is None:
             content_types = ['all']
@@ -131,141 +441,953 @@ class EnhancedWebCrawler:
             os.makedirs(save_dir)
         
         self.logger.info(f"开始爬取: {start_url} (深度: {max_depth})")
-        self._crawl_recursive(start_url, max_depth=max_depth, current_depth=1, 
-                            content_types=content_types, save_dir=save_dir)
+        self._open_crawl(start_url, save_dir, resume, use_sitemaps)
+        
+        try:
+            with tqdm(desc="爬取进度", unit="页") as progress:
+                parked = []
+                self.metrics.register_gauge('parked', lambda: len(parked))
+                self.metrics.register_gauge('suspended', lambda: sum(map(len, self._suspended.values())))
+                while self.frontier or parked or self._suspended:
+                    if self._budget_spent():
+                        self.logger.info(f"已抓取 {self._pages_dispatched} 个页面，达到抓取预算")
+                        break
+                    self._release_suspended()
+                    if not (self.frontier or parked):
+                        # 只剩熔断中的主机：等到最早的冷却结束
+                        time.sleep(self._suspended_wait())
+                        continue
+                    # 该主机仍在礼貌延迟中时先处理其他主机的URL
+                    entry = self._next_entry(parked, lambda host: self.scheduler.wait_time(host) <= 0)
+                    if entry is None:
+                        # 候选主机都在延迟中：取最早就绪的（同一主机取最早暂存的），由_crawl_page等待
+                        entry = min(parked, key=lambda e: self.scheduler.ready_at(urlparse(e[0]).netloc))
+                        parked.remove(entry)
+                    url, depth, _ = entry
+                    if self._skip_over_budget(entry):
+                        continue
+                    if not self.breaker.allow(urlparse(url).netloc):
+                        self._suspend(entry)
+                        continue
+                    
+                    self._pages_dispatched += 1
+                    try:
+                        self._crawl_page(url, depth, max_depth, content_types, save_dir)
+                    except CircuitOpenError:
+                        # 抓取过程中该主机被熔断：冷却结束后重新抓取
+                        self._suspend(entry)
+                        continue
+                    self._mark_done(url)
+                    progress.update(1)
+                    progress.set_postfix(待爬=len(self.frontier))
+        finally:
+            self._close_crawl()
         self.logger.info("爬取完成!")
 
-    def _crawl_recursive(self, url, max_depth, current_depth, content_types, save_dir):
-        """递归爬取核心方法"""
-        if url in self.visited_urls or current_depth > max_depth:
+    def _next_entry(self, parked, is_ready):
+        """
+        取下一个主机已就绪的待爬条目
+        未就绪主机的条目暂存在parked中（最多MAX_DEFERRALS条）并保持原有顺序，就绪后优先取出
+        按分数排序时暂存的条目先放回队列，与之后入队的高分条目重新比较
+        :return: 条目 (url, depth, score)，没有就绪的条目时返回None
+        """
+        if parked and isinstance(self.frontier.ordering, PriorityOrdering):
+            for entry in parked:
+                self.frontier.requeue(entry)
+            parked.clear()
+        for index, entry in enumerate(parked):
+            if is_ready(urlparse(entry[0]).netloc):
+                del parked[index]
+                return entry
+        while self.frontier and len(parked) < self.MAX_DEFERRALS:
+            entry = self.frontier.pop()
+            if is_ready(urlparse(entry[0]).netloc):
+                return entry
+            parked.append(entry)
+        return None
+
+    def _open_crawl(self, start_url, save_dir, resume, use_sitemaps=False):
+        """创建待爬队列和检查点；resume时从检查点恢复，否则从start_url（和站点地图）开始"""
+        self.frontier = self._create_frontier(save_dir)
+        self._suspended = {}
+        self.url_patterns = UrlPatternAnalyzer(self.max_urls_per_pattern) if self.trap_detection else None
+        self._pages_dispatched = 0
+        self._traps_reported = set()
+        self._host_pages = {}
+        self._host_bytes = {}
+        self.state = None
+        if self.dns_cache is not None:
+            self.dns_cache.clear()
+        self.logger.info(f"HTML解析器: {self.html_parser.name}")
+        
+        self.http_cache = None
+        if self.use_http_cache:
+            self.http_cache = HttpValidatorCache(os.path.join(save_dir, '.http_cache.sqlite'))
+        self.recrawl = None
+        if self.incremental:
+            self.recrawl = RecrawlHistory(os.path.join(save_dir, '.recrawl.sqlite'))
+        self.link_graph = None
+        self._page_ranks = None
+        self._pages_since_rank = 0
+        if self.use_link_graph:
+            self._link_graph_path = os.path.join(save_dir, '.link_graph')
+            self.link_graph = self._load_link_graph(resume or self.incremental)
+        self.near_duplicates = None
+        if self.near_duplicate_policy is not None:
+            self.near_duplicates = SimHashIndex(self.near_duplicate_distance, os.path.join(save_dir, '.simhash.sqlite'))
+        self.image_store = None
+        if self.content_addressed_images:
+            self.image_store = ContentAddressedImageStore(os.path.join(save_dir, 'images'))
+        self._images_seen = set()
+        self.sink = self._create_sink(save_dir)
+        self.robots = None
+        if self.obey_robots:
+            self.robots = RobotsCache(os.path.join(save_dir, '.robots.sqlite'),
+                                      ttl=self.robots_ttl, user_agent=self.robots_user_agent)
+        self._start_metrics()
+        
+        if self.checkpoint:
+            self.state = CrawlStateStore(os.path.join(save_dir, '.crawl_state.sqlite'),
+                                         commit_interval=self.checkpoint_interval)
+            if resume:
+                if self._restore_state():
+                    return
+            else:
+                self.state.reset()
+        
+        if self.recrawl is not None and len(self.recrawl):
+            self._schedule_revisits()
+        self._enqueue(start_url, 1)
+        if use_sitemaps:
+            self._seed_from_sitemaps(start_url)
+
+    def _load_link_graph(self, restore):
+        """restore时从快照恢复链接图（并计算一次PageRank），否则或快照不可用时新建"""
+        if restore and os.path.exists(os.path.join(self._link_graph_path, 'meta.json')):
+            try:
+                graph = LinkGraph.load(self._link_graph_path)
+            except (ValueError, KeyError, OSError, EOFError) as e:
+                self.logger.warning(f"读取链接图快照失败，重新记录: {str(e)}")
+            else:
+                self.logger.info(f"从快照恢复链接图: {len(graph)} 个URL, {len(graph.targets)} 条边")
+                self._page_ranks = graph.pagerank() if len(graph) else None
+                return graph
+        return LinkGraph()
+
+    def _record_links(self, url, links):
+        """把页面出链记入链接图，每pagerank_interval个页面重新计算PageRank"""
+        if self.link_graph is None:
             return
-            
-        self.visited_urls.add(url)
-        self.logger.info(f"处理 [{current_depth}/{max_depth}] {url}")
+        self.link_graph.add_page(url, (canonicalize_url(link, self.strip_params) for link in links))
+        self._pages_since_rank += 1
+        if self._pages_since_rank >= self.pagerank_interval:
+            self._update_ranks()
+
+    def _update_ranks(self):
+        """合并链接图、计算PageRank，'pagerank'排序时按新分数重排待爬队列，并保存快照"""
+        started = time.perf_counter()
+        self._page_ranks = self.link_graph.pagerank()
+        self._pages_since_rank = 0
+        if self.frontier_ordering == 'pagerank':
+            self.frontier.rescore(lambda entry: self._link_rank(entry[0]))
+        self.link_graph.snapshot(self._link_graph_path)
+        self.logger.info(f"链接图: {len(self.link_graph)} 个URL, {len(self.link_graph.targets)} 条边, "
+                         f"PageRank和快照耗时 {time.perf_counter() - started:.2f}秒")
+
+    def _link_rank(self, url, page=None):
+        """URL最近一次计算的PageRank；还没有时取父页面的PageRank按出链数均分，都没有时为0"""
+        node = self.link_graph.ids.get(url)
+        if node is not None and node < len(self._page_ranks):
+            return self._page_ranks[node]
+        if page is not None:
+            parent = self.link_graph.ids.get(page.url)
+            if parent is not None and parent < len(self._page_ranks):
+                return self._page_ranks[parent] / max(1, len(page.links))
+        return 0.0
+
+    def _schedule_revisits(self):
+        """增量模式：按变化概率选出本次重新抓取的已知页面放入待爬队列（priority排序下排在新链接之前）"""
+        planned = self.recrawl.plan(self.recrawl_budget)
+        for url, depth, probability in planned:
+            # 只计入真正入队的URL（如已从检查点恢复的不重复计入主机预算）
+            if self.frontier.push(url, depth, probability):
+                self._count_admitted(url)
+                if self.state is not None:
+                    self.state.record_enqueued(url, depth, probability)
+        self.logger.info(f"增量重爬: 已知 {len(self.recrawl)} 个页面, 本次重新抓取 {len(planned)} 个"
+                         + (f" (变化概率 {planned[-1][2]:.2f}-{planned[0][2]:.2f})" if planned else ''))
+
+    def _record_visit(self, url, depth, unchanged):
+        """增量模式下记录页面的抓取结果"""
+        if self.recrawl is not None and self.recrawl.record(url, depth, not unchanged):
+            self.metrics.increment('pages_unchanged' if unchanged else 'pages_changed')
+
+    def _record_failed_visit(self, url, error):
+        """增量模式下记录抓取失败的复查（只处理请求异常，解析、保存等错误不计入）"""
+        if self.recrawl is None or not isinstance(error, self._fetch_errors()):
+            return
+        outcome = self.recrawl.record_failure(url, self._error_status(error))
+        if outcome == 'gone':
+            self.metrics.increment('pages_gone')
+            self.logger.info(f"页面已不存在或多次复查失败，从重爬历史中删除: {url}")
+        elif outcome == 'failed':
+            self.metrics.increment('revisits_failed')
+
+    @staticmethod
+    def _fetch_errors():
+        """页面请求可能抛出的异常类型（含raise_for_status的HTTP错误）"""
+        return requests.exceptions.RequestException
+
+    @staticmethod
+    def _error_status(error):
+        """HTTP错误异常中的状态码（requests、httpx的response，aiohttp的status），网络错误返回None"""
+        status = getattr(error, 'status', None)
+        if status is None:
+            status = getattr(getattr(error, 'response', None), 'status_code', None)
+        return status
+
+    def _seed_from_sitemaps(self, start_url):
+        """
+        从robots.txt声明的站点地图（没有时用 /sitemap.xml）把页面直接放入待爬队列
+        站点地图索引中嵌套的站点地图依次读取；只接受与站点地图同一主机的URL
+        """
+        pending = deque(self._discover_sitemaps(start_url))
+        seen = set(pending)
+        fetched = submitted = 0
+        while pending and fetched < self.MAX_SITEMAPS:
+            sitemap_url = pending.popleft()
+            fetched += 1
+            host = urlparse(sitemap_url).netloc
+            try:
+                for kind, loc, lastmod in self._iter_remote_sitemap(sitemap_url):
+                    if kind == 'sitemap':
+                        if loc not in seen:
+                            seen.add(loc)
+                            pending.append(loc)
+                    elif urlparse(loc).netloc == host and self.is_valid_url(loc):
+                        self._enqueue(loc, 1, score=self.score_sitemap_entry(loc, parse_lastmod(lastmod)))
+                        submitted += 1
+            except (requests.exceptions.RequestException, ElementTree.ParseError, OSError, EOFError) as e:
+                self.logger.warning(f"读取站点地图 {sitemap_url} 失败: {str(e)}")
+        self.logger.info(f"站点地图播种: 读取 {fetched} 个站点地图, 提交 {submitted} 个URL, 待爬 {len(self.frontier)} 个")
+
+    def _discover_sitemaps(self, start_url):
+        """robots.txt中声明的站点地图，没有时返回站点根目录的 /sitemap.xml"""
+        if self.robots is not None:
+            try:
+                rules = self.robots.get(start_url) or self._fetch_robots(start_url)
+            except CircuitOpenError:
+                rules = RobotsRules()
+            if rules.sitemaps:
+                return list(rules.sitemaps)
+        return [RobotsCache.origin(start_url) + '/sitemap.xml']
+
+    def _iter_remote_sitemap(self, url):
+        """流式下载并解析一个站点地图，.xml.gz（按gzip文件头识别）边下载边解压"""
+        with self._get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            # 解除Content-Encoding传输压缩，再按内容判断是否为gzip文件
+            response.raw.decode_content = True
+            # 读完后不自动关闭，否则BufferedReader在末尾再次读取时会报错
+            response.raw.auto_close = False
+            stream = io.BufferedReader(response.raw)
+            if stream.peek(2)[:2] == b'\x1f\x8b':
+                stream = gzip.GzipFile(fileobj=stream)
+            yield from iter_sitemap(stream)
+
+    def _restore_state(self):
+        """从检查点恢复已入队集合、待爬队列、主机统计（含字节预算）和URL模板计数，返回是否有可恢复的状态"""
+        for url in self.state.iter_seen():
+            self.frontier.seen.add(url)
+            self._count_admitted(url)
+        pending = 0
+        for entry in self.state.iter_pending():
+            self.frontier.requeue(entry)
+            pending += 1
+        self.host_stats = self.state.host_stats()
+        self._host_bytes = self.state.host_bytes()
         
+        if not self.frontier.seen:
+            return False
+        self.logger.info(f"从检查点恢复: 已入队 {len(self.frontier.seen)} 个URL, 待爬 {pending} 个")
+        return True
+
+    def _close_crawl(self):
+        """关闭待爬队列并提交检查点"""
+        self._log_seen_store()
+        self._log_focus()
+        self.frontier.close()
+        if self.state is not None:
+            self.state.close()
+            self.state = None
+        if self.http_cache is not None:
+            self.http_cache.close()
+            self.http_cache = None
+        if self.near_duplicates is not None:
+            self.near_duplicates.close()
+            self.near_duplicates = None
+        if self.recrawl is not None:
+            self.recrawl.close()
+            self.recrawl = None
+        if self.link_graph is not None:
+            self.link_graph.snapshot(self._link_graph_path)
+            self.link_graph = None
+        if self.image_store is not None:
+            self.image_store.close()
+            self.image_store = None
+        if self.sink is not None:
+            sink, self.sink = self.sink, None
+            try:
+                sink.close()
+            except Exception as e:
+                # 分片输出在关闭时报告后台线程未报告的写入错误，其余资源照常关闭
+                self.logger.error(f"关闭输出时出错: {str(e)}")
+        if self.robots is not None:
+            self.robots.close()
+            self.robots = None
+        if self.dns_cache is not None:
+            self.dns_cache.close()
+        self._stop_metrics()
+
+    def _log_focus(self):
+        """报告聚焦爬取的收获率（相关页面占抓取页面的比例）"""
+        counters = self.metrics.counters()
+        fetched = counters.get('focus_pages', 0)
+        if self.focus_topic is not None and fetched:
+            relevant = counters.get('focus_relevant', 0)
+            self.logger.info(f"聚焦爬取: 解析 {fetched} 个页面, 相关 {relevant} 个 (收获率 {relevant / fetched:.0%}), "
+                             f"跳过 {counters.get('focus_skipped', 0)} 个低相关链接")
+
+    def _start_metrics(self):
+        """注册队列深度，按配置启动指标服务"""
+        self.metrics.register_gauge('frontier', lambda: len(self.frontier))
+        if self.url_patterns is not None:
+            self.metrics.register_gauge('url_patterns', lambda: len(self.url_patterns))
+        if hasattr(self.sink, 'pending'):
+            self.metrics.register_gauge('sink', self.sink.pending)
+        if self.metrics_port is not None and self._metrics_server is None:
+            self._metrics_server = MetricsServer(self.metrics, self.metrics_port)
+            self.logger.info(f"指标服务: http://127.0.0.1:{self._metrics_server.port}/metrics")
+
+    def _observe_dns(self, host, seconds, ok):
+        """DnsCache的解析回调：记录解析耗时和失败次数"""
+        self.metrics.observe('dns', seconds, host)
+        if not ok:
+            self.metrics.increment('dns_failures')
+
+    def _log_dns(self):
+        """报告DNS缓存的命中率和解析耗时"""
+        stats = self.dns_cache.stats()
+        if not stats.get('lookups') and not stats.get('resolutions'):
+            return
+        self.logger.info(f"DNS: 查询 {stats.get('lookups', 0)} 次, 命中率 {stats['hit_rate']:.0%} "
+                         f"(其中等待预解析 {stats.get('joins', 0)} 次), 平均等待 {stats['wait_ms_avg']:.1f}毫秒; "
+                         f"解析 {stats.get('resolutions', 0)} 个主机 (预解析 {stats.get('prefetches', 0)} 个, "
+                         f"失败 {stats.get('failures', 0)} 个), 平均 {stats['resolve_ms_avg']:.1f}毫秒, "
+                         f"最长 {stats['resolve_ms_max']:.1f}毫秒")
+
+    def _log_transport(self):
+        """报告连接的新建和复用次数（及因keep-alive限制关闭的连接数）"""
+        counters = self.metrics.counters()
+        opened, reused = counters.get('connections_opened', 0), counters.get('connections_reused', 0)
+        if not opened + reused:
+            return
+        closed = ''.join(f", {label} {self.adapter.stats[name]} 个" for name, label in
+                         (('closed_idle', '空闲超时关闭'), ('closed_max_requests', '达到请求数上限关闭'))
+                         if self.adapter.stats.get(name))
+        self.logger.info(f"连接: 新建 {opened} 个, 复用 {reused} 次 (复用率 {reused / (opened + reused):.0%}){closed}")
+
+    def _stop_metrics(self):
+        """输出各阶段耗时汇总并停止指标服务"""
+        self._log_transport()
+        if self.dns_cache is not None:
+            self._log_dns()
+        totals = self.metrics.stage_totals()
+        overall = sum(seconds for _, seconds in totals.values())
+        if overall:
+            summary = ', '.join(f"{stage} {seconds:.2f}秒/{count}次 ({seconds / overall:.0%})"
+                                for stage, (count, seconds) in totals.items())
+            self.logger.info(f"各阶段耗时: {summary}")
+        self.metrics.unregister_gauges()
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+            self._metrics_server = None
+
+    def _create_sink(self, save_dir):
+        """创建页面输出"""
+        if not isinstance(self.output_sink, str):
+            return self.output_sink
+        if self.output_sink == 'files':
+            return FileSink(save_dir, self.sanitize_filename)
+        sink = OUTPUT_SINKS[self.output_sink](os.path.join(save_dir, 'shards'),
+                                              compression=self.shard_compression,
+                                              max_shard_bytes=self.max_shard_bytes)
+        self.logger.info(f"页面输出到分片: {sink.root} ({self.output_sink}, {self.shard_compression})")
+        return sink
+
+    def _log_seen_store(self):
+        """报告已见URL存储的内存占用"""
+        store = self.frontier.seen
+        if hasattr(store, 'memory_bytes') and len(store):
+            memory = store.memory_bytes()
+            self.logger.info(f"已见URL存储({getattr(store, 'name', type(store).__name__)}): "
+                             f"{len(store)} 个URL, {memory / 1024:.1f} KB, "
+                             f"每个URL {memory / len(store):.1f} 字节")
+
+    def _enqueue(self, url, depth, page=None, score=None):
+        """
+        URL规范化后入队（已见过的、陷阱和超出主机预算的、增量模式下抓取过的忽略）并记录到检查点
+        score为None时由score_link计算；聚焦爬取时分数低于focus_threshold的不入队（种子URL除外）
+        """
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # 检查内容类型
-            content_type = response.headers.get('content-type', '').lower()
-            if not ('html' in content_type or 'text' in content_type):
-                self.logger.warning(f"跳过非文本内容: {url} (Content-Type: {content_type})")
+            url = canonicalize_url(url, self.strip_params)
+        except ValueError:
+            self.logger.warning(f"无效的URL: {url}")
+            return
+        if url in self.frontier.seen:
+            return
+        # 增量模式下抓取过的页面只按重爬计划抓取
+        if self.recrawl is not None and self.recrawl.known(url):
+            return
+        # 已知robots.txt禁止的URL不入队（规则未知的主机在抓取前再检查）
+        if self.robots is not None and self.robots.allowed_cached(url) is False:
+            self.metrics.increment('robots_blocked')
+            return
+        if not self._admit(url):
+            return
+        seed = page is None and score is None
+        if score is None:
+            score = self.score_link(url, depth, page)
+        if self.focus_topic is not None and not seed and score < self.focus_threshold:
+            self.metrics.increment('focus_skipped')
+            return
+        if self.frontier.push(url, depth, score):
+            if self.state is not None:
+                self.state.record_enqueued(url, depth, score)
+            # 在抓取之前解析好主机名
+            if self.dns_cache is not None:
+                self.dns_cache.prefetch(urlparse(url).hostname)
+
+    def _admit(self, url):
+        """新URL入队前检查主机预算和爬虫陷阱，通过时计入预算"""
+        host = urlparse(url).netloc
+        if self._over_budget(host) or (self.max_pages_per_host is not None
+                                       and self._host_pages.get(host, 0) >= self.max_pages_per_host):
+            self.metrics.increment('budget_skipped')
+            self._report_trap((host, 'budget'), f"主机 {host} 已达到抓取预算，后续URL不再入队")
+            return False
+        if self.url_patterns is not None:
+            reason = self.url_patterns.admit(url)
+            if reason is not None:
+                self.metrics.increment(f'trap_{reason}')
+                if reason == 'pattern':
+                    pattern = url_pattern(url)
+                    self._report_trap(pattern, f"URL模板 {pattern} 已达到 {self.max_urls_per_pattern} 个，"
+                                               f"同模板的URL不再入队")
+                else:
+                    self._report_trap((host, reason), f"疑似爬虫陷阱（{reason}），不入队: {url}")
+                return False
+        self._host_pages[host] = self._host_pages.get(host, 0) + 1
+        return True
+
+    def _count_admitted(self, url):
+        """计入一个已入队的URL（从检查点恢复或按重爬计划入队时）"""
+        host = urlparse(url).netloc
+        self._host_pages[host] = self._host_pages.get(host, 0) + 1
+        if self.url_patterns is not None:
+            self.url_patterns.record(url)
+
+    def _report_trap(self, key, message):
+        """同一主机的同类原因（或同一URL模板）只记录一次日志"""
+        if key not in self._traps_reported:
+            self._traps_reported.add(key)
+            self.logger.warning(message)
+
+    def _over_budget(self, host):
+        """该主机下载的字节数是否已达到max_bytes_per_host"""
+        return self.max_bytes_per_host is not None and self._host_bytes.get(host, 0) >= self.max_bytes_per_host
+
+    def _record_bytes(self, url, count):
+        """记录下载的正文字节数，计入主机的字节预算"""
+        host = urlparse(url).netloc
+        self._host_bytes[host] = self._host_bytes.get(host, 0) + count
+        if self.state is not None:
+            self.state.record_bytes(host, count)
+        self.metrics.increment('bytes_downloaded', count)
+
+    def _skip_over_budget(self, entry):
+        """主机已达到字节预算时丢弃待爬条目（标记为已处理），返回是否丢弃"""
+        if not self._over_budget(urlparse(entry[0]).netloc):
+            return False
+        self.metrics.increment('budget_skipped')
+        self._mark_done(entry[0])
+        return True
+
+    def _robots_allows(self, url):
+        """抓取前检查robots.txt（该源站的规则未缓存时先获取）"""
+        if self.robots is None:
+            return True
+        rules = self.robots.get(url)
+        if rules is None:
+            rules = self._fetch_robots(url)
+        return self._check_robots(url, rules)
+
+    def _fetch_robots(self, url):
+        """获取并缓存URL所属源站的robots.txt"""
+        robots_url = RobotsCache.robots_url(url)
+        try:
+            response = self._get(robots_url, timeout=10)
+            # robots.txt按RFC 9309为UTF-8
+            status, body = response.status_code, decode_body(response.content)
+        except CircuitOpenError:
+            raise
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"获取 {robots_url} 失败: {str(e)}")
+            status, body = None, None
+        return self.robots.put(url, status, body)
+
+    def _check_robots(self, url, rules):
+        """应用Crawl-delay并判断URL是否允许抓取"""
+        if rules.crawl_delay:
+            self.scheduler.set_min_delay(urlparse(url).netloc, rules.crawl_delay)
+        if rules.allowed_url(url):
+            return True
+        self.logger.info(f"robots.txt禁止抓取: {url}")
+        self.metrics.increment('robots_blocked')
+        return False
+
+    def _mark_done(self, url):
+        """标记URL已处理"""
+        if self.state is not None:
+            self.state.record_done(url)
+
+    def _create_frontier(self, save_dir):
+        """创建待爬队列，溢出文件放在保存目录下"""
+        return CrawlFrontier(
+            ordering=self.frontier_ordering,
+            max_in_memory=self.max_frontier_memory,
+            spill_dir=os.path.join(save_dir, '.frontier'),
+            seen=self.visited_urls,
+        )
+
+    def _wait_for_host(self, url):
+        """等待该主机的礼貌延迟（只阻塞访问同一主机的请求）"""
+        wait = self.scheduler.reserve(urlparse(url).netloc)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _get(self, url, **kwargs):
+        """
+        带重试的GET（参数同session.get，超时按transport拆分为连接和读取超时）：每次尝试前等待礼貌延迟，失败后按retry_policy退避
+        重试次数用完或重试期间主机被熔断时，抛出最后的异常或返回最后一次的响应
+        请求前主机已处于熔断中时抛出CircuitOpenError；stream=True时正文读取中的错误不重试
+        """
+        host = urlparse(url).netloc
+        if not self.breaker.allow(host):
+            raise CircuitOpenError(f"主机熔断中: {host}")
+        kwargs['timeout'] = self.transport.timeout(kwargs.get('timeout'))
+        attempts = self.retry_policy.new_attempts()
+        while True:
+            self._wait_for_host(url)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                kind = self.retry_policy.error_kind(e)
+                if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    self._record_failure(host)
+                delay = None if kind is None else self.retry_policy.next_delay(attempts, kind)
+                if delay is None or not self.breaker.allow(host):
+                    raise
+                self._forget_dns_failure(url)
+                self.logger.warning(f"请求 {url} 失败，{delay:.1f}秒后重试: {str(e)}")
+            else:
+                if not kwargs.get('stream'):
+                    # 非流式请求在返回前已读完正文，elapsed之后的时间都是下载
+                    self.metrics.observe('download', max(0.0, time.perf_counter() - started
+                                                         - response.elapsed.total_seconds()), url)
+                self._record_response(url, response)
+                status = response.status_code
+                if status not in self.retry_policy.RETRY_STATUS:
+                    return response
+                delay = self._status_delay(host, status, response.headers, attempts)
+                if delay is None or not self.breaker.allow(host):
+                    return response
+                response.close()
+                self.logger.warning(f"{url} 返回 {status}，{delay:.1f}秒后重试")
+            self.metrics.increment('retries')
+            self.scheduler.defer(host, delay)
+
+    def _status_delay(self, host, status, headers, attempts):
+        """
+        可重试状态码的重试等待秒数，不再重试时返回None
+        响应带Retry-After时总是按它推迟该主机的后续请求（即使超过max_retry_after、本URL不再重试）
+        """
+        retry_after = self.retry_policy.retry_after(status, headers)
+        if retry_after is not None:
+            self.scheduler.defer(host, retry_after)
+        return self.retry_policy.next_delay(attempts, 'status', retry_after)
+
+    def _forget_dns_failure(self, url):
+        """重试前删除主机的DNS失败缓存，重试时重新解析而不是再次命中同一个失败"""
+        if self.dns_cache is not None:
+            self.dns_cache.forget(urlparse(url).hostname)
+
+    def _record_failure(self, host):
+        """记录一次请求失败（网络错误或5xx），达到阈值时打开该主机的熔断"""
+        if self.breaker.record_failure(host):
+            self.metrics.increment('circuit_opened')
+            self.logger.warning(f"主机 {host} 连续失败，暂停调度 "
+                                f"{self.breaker.retry_at(host) - time.monotonic():.0f} 秒")
+
+    def _suspend(self, entry):
+        """主机熔断中：条目暂存到冷却结束，不占用待爬队列和暂缓列表"""
+        self._suspended.setdefault(urlparse(entry[0]).netloc, []).append(entry)
+
+    def _release_suspended(self):
+        """冷却结束的主机，其暂存条目放回待爬队列（恢复后的第一个请求即为探测）"""
+        for host in [host for host in self._suspended if self.breaker.allow(host)]:
+            entries = self._suspended.pop(host)
+            self.logger.info(f"主机 {host} 冷却结束，恢复 {len(entries)} 个待爬URL")
+            for entry in entries:
+                self.frontier.requeue(entry)
+
+    def _suspended_wait(self):
+        """距离最早一个熔断主机冷却结束的秒数"""
+        return max(0.0, min(self.breaker.retry_at(host) for host in self._suspended) - time.monotonic())
+
+    def _record_response(self, url, response):
+        """把响应状态和耗时反馈给调度器，记录建立连接和首字节耗时"""
+        latency = response.elapsed.total_seconds()
+        connect = take_connect_time()
+        if connect:
+            self.metrics.increment('connections_opened')
+            self.metrics.observe('connect', connect, url)
+        else:
+            self.metrics.increment('connections_reused')
+        self.metrics.observe('ttfb', max(0.0, latency - connect), url)
+        self._record_host(url, response.status_code, latency)
+
+    def _record_host(self, url, status, latency):
+        """更新主机的调度状态和请求统计"""
+        host = urlparse(url).netloc
+        self.scheduler.record(host, status, latency)
+        self.metrics.count_response(host, status)
+        if status >= 500:
+            self._record_failure(host)
+        elif status != 429 and self.breaker.record_success(host):
+            self.logger.info(f"主机 {host} 已恢复")
+        
+        error = status >= 400
+        stats = self.host_stats.setdefault(host, {'requests': 0, 'errors': 0})
+        stats['requests'] += 1
+        if error:
+            stats['errors'] += 1
+        if self.state is not None:
+            self.state.record_host(host, error)
+
+    def score_link(self, url, depth, page):
+        """
+        计算链接在priority排序下的分数（越大越先爬），子类可覆盖；种子URL的page为None
+        聚焦爬取时为链接的相关度（见_focus_score）；'pagerank'排序在算出第一次PageRank后使用链接的PageRank（见_link_rank）
+        """
+        if self.focus_topic is not None:
+            return self._focus_score(url, page)
+        if self.frontier_ordering == 'pagerank' and self._page_ranks is not None:
+            return self._link_rank(url, page)
+        return -depth
+
+    def _focus_score(self, url, page):
+        """
+        聚焦爬取的链接相关度：锚文本、URL中的词和父页面正文三部分相关度按focus_weights加权
+        种子URL（没有父页面）为1
+        """
+        if page is None:
+            return 1.0
+        if page.relevance is None:
+            page.relevance = self.focus_topic.relevance(page.text)
+        anchor_weight, url_weight, parent_weight = self.focus_weights
+        return (anchor_weight * self.focus_topic.relevance(page.anchors.get(url, ''))
+                + url_weight * self.focus_topic.url_relevance(url)
+                + parent_weight * page.relevance)
+
+    def _observe_focus(self, page):
+        """聚焦爬取时计算页面的相关度，相关度不低于focus_threshold的页面计为命中"""
+        if self.focus_topic is None:
+            return
+        page.relevance = self.focus_topic.relevance(page.text)
+        self.metrics.increment('focus_pages')
+        if page.relevance >= self.focus_threshold:
+            self.metrics.increment('focus_relevant')
+
+    def _budget_spent(self):
+        """聚焦爬取的抓取预算是否已用完"""
+        return self.focus_budget is not None and self._pages_dispatched >= self.focus_budget
+
+    def _links_only(self, content_types):
+        """是否只需要提取链接（此时使用流式提取；近似重复检测和聚焦爬取需要正文，不使用流式提取）"""
+        return (set(content_types) == {'links'} and self.near_duplicate_policy is None
+                and self.focus_topic is None)
+
+    def _near_duplicate_actions(self, url, page):
+        """
+        近似重复检测：正文的SimHash与已爬页面的距离不超过阈值时按near_duplicate_policy跳过
+        :return: (是否保存页面和图片, 是否展开出链)
+        """
+        if self.near_duplicates is None:
+            return True, True
+        fingerprint = simhash(page.text)
+        if fingerprint is None:
+            return True, True
+        original = self.near_duplicates.find(fingerprint, exclude=url)
+        if original is None:
+            self.near_duplicates.add(url, fingerprint)
+            return True, True
+        self.metrics.increment('near_duplicates')
+        self.logger.info(f"近似重复页面: {url} ≈ {original}")
+        policy = self.near_duplicate_policy
+        return policy not in ('skip_save', 'skip_all'), policy not in ('skip_links', 'skip_all')
+
+    def score_sitemap_entry(self, url, lastmod):
+        """
+        计算站点地图条目在priority排序下的分数，子类可覆盖
+        聚焦爬取时为URL与主题的相关度（没有锚文本和父页面，只看URL中的词），同样受focus_threshold限制；
+        否则按lastmod时间戳（越新越先爬），没有lastmod的为0，都排在链接发现的页面（分数为-深度）之前
+        """
+        if self.focus_topic is not None:
+            return self.focus_topic.url_relevance(url)
+        return lastmod if lastmod is not None else 0.0
+
+    def _enqueue_links(self, page, depth, max_depth):
+        """把页面出链放入待爬队列（超出深度的不入队）"""
+        if depth >= max_depth:
+            return
+        for link in page.links:
+            self._enqueue(link, depth + 1, page)
+
+    def _crawl_page(self, url, depth, max_depth, content_types, save_dir):
+        """抓取并处理单个页面，出链放入待爬队列"""
+        self.logger.info(f"处理 [{depth}/{max_depth}] {url}")
+        
+        try:
+            if not self._robots_allows(url):
                 return
             
-            # 解析HTML内容
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 保存文本内容
-            if 'all' in content_types or 'text' in content_types:
-                self._save_text_content(url, soup, save_dir)
-            
-            # 保存图片
-            if 'all' in content_types or 'images' in content_types:
-                self._save_images(url, soup, save_dir)
+            if self._links_only(content_types):
+                # 只需要链接时边下载边入队，不构建DOM树
+                on_link = (lambda link: self._enqueue(link, depth + 1)) if depth < max_depth else None
+                links, unchanged = self._stream_links(url, on_link)
+                if links is not None:
+                    self._record_visit(url, depth, unchanged)
+                    self._record_links(url, links)
+                    self._save_page(url, PageResult(url, links=links), unchanged, content_types, save_dir)
+                return
             
-            # 保存链接
-            if 'all' in content_types or 'links' in content_types:
-                self._save_links(url, soup, save_dir)
+            body, encoding, unchanged = self._fetch_page(url)
+            if body is None:
+                return
+            self._record_visit(url, depth, unchanged)
             
-            # 递归爬取
-            if current_depth < max_depth:
-                links = self.get_all_links(url)
-                for link in tqdm(links, desc=f"深度 {current_depth} 爬取进度"):
-                    self._crawl_recursive(link, max_depth, current_depth + 1, 
-                                        content_types, save_dir)
+            # 解析HTML内容（只解析一次，各步骤共享结果）
+            page = self._parse_body(url, body, encoding, content_types)
+            self._observe_focus(page)
+            self._record_links(url, page.links)
+            save, expand = self._near_duplicate_actions(url, page)
+            if save:
+                self._save_page(url, page, unchanged, content_types, save_dir)
+                
+                # 保存图片
+                if 'all' in content_types or 'images' in content_types:
+                    self._save_images(url, page, save_dir)
             
-            # 礼貌延迟
-            time.sleep(0.5)
+            # 出链入队
+            if expand:
+                self._enqueue_links(page, depth, max_depth)
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             self.logger.error(f"处理 {url} 时出错: {str(e)}")
+            self._record_failed_visit(url, e)
 
-    def _save_text_content(self, url, soup, save_dir):
-        """保存文本内容"""
-        try:
-            # 提取主要文本内容（可优化为读取<article>或<main>标签）
-            for unwanted in soup(['script', 'style', 'nav', 'footer', 'iframe']):
-                unwanted.decompose()
-                
-            text = soup.get_text(separator='\n', strip=True)
-            
-            # 生成文件名
-            parsed_url = urlparse(url)
-            filename = f"{parsed_url.netloc}_{self.sanitize_filename(parsed_url.path)}.txt"
-            filepath = os.path.join(save_dir, 'text', filename)
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"URL: {url}\n\n")
-                f.write(text)
-            
-            self.logger.info(f"已保存文本: {filepath}")
-        except Exception as e:
-            self.logger.error(f"保存文本失败: {str(e)}")
+    def _save_page(self, url, page, unchanged, content_types, save_dir):
+        """
+        保存文本和链接（出链总会入队）
+        内容与上次爬取相同、且验证器缓存记录同一输出已写入过这些部分时跳过；
+        否则用页面内容（304时来自缓存的正文）补写
+        """
+        want_all = 'all' in content_types
+        text = page.text if want_all or 'text' in content_types else None
+        links = page.links if want_all or 'links' in content_types else None
+        if unchanged and self._already_saved(url, text is not None, bool(links)):
+            self.logger.info(f"页面未变化，跳过保存: {url}")
+            return
+        
+        started = time.perf_counter()
+        ok = self.sink.write(url, text, links)
+        self.metrics.observe('save', time.perf_counter() - started, url)
+        # 自定义输出的write()可能没有返回值，视为成功
+        if self.http_cache is not None and ok is not False:
+            self.http_cache.mark_saved(url, self._saved_signature(text is not None, bool(links)))
 
-    def _save_images(self, base_url, soup, save_dir):
+    def _saved_signature(self, text, links):
+        """已写入输出的记录：输出类型和写入的部分，如 jsonl:links,text"""
+        sink = self.output_sink if isinstance(self.output_sink, str) else type(self.output_sink).__name__
+        parts = [name for name, wanted in (('links', links), ('text', text)) if wanted]
+        return f"{sink}:{','.join(parts)}"
+
+    def _already_saved(self, url, text, links):
+        """当前内容是否已由同一输出写入过需要的部分（每页一个文件的输出还检查文件是否仍在）"""
+        cached = self.http_cache.get(url) if self.http_cache is not None else None
+        if cached is None or not cached['saved']:
+            return False
+        saved_sink, _, saved_parts = cached['saved'].partition(':')
+        sink, _, parts = self._saved_signature(text, links).partition(':')
+        if sink != saved_sink or not set(filter(None, parts.split(','))) <= set(saved_parts.split(',')):
+            return False
+        has = getattr(self.sink, 'has', None)
+        return has is None or has(url, text, links)
+
+    def _save_images(self, base_url, page, save_dir):
         """保存图片（优化版）"""
         try:
-            # 查找所有可能的图片标签和属性
-            img_tags = []
-            for tag in soup.find_all(['img', 'picture', 'source', 'figure']):
-                for attr in ['src', 'data-src', 'srcset', 'data-original', 'content']:
-                    if tag.has_attr(attr):
-                        img_tags.append((tag, attr))
-            
-            if not img_tags:
+            if not page.images:
                 self.logger.info(f"未在 {base_url} 中找到图片")
                 return
             
-            domain = urlparse(base_url).netloc.replace(':', '_')
-            image_dir = os.path.join(save_dir, 'images', domain)
-            
-            for tag, attr in img_tags:
-                img_urls = []
-                if attr == 'srcset':
-                    # 处理srcset属性（可能包含多个URL）
-                    for src in tag[attr].split(','):
-                        img_urls.append(src.strip().split(' ')[0])
-                else:
-                    img_urls.append(tag[attr].strip())
-                
-                for img_url in img_urls:
-                    try:
-                        # 处理URL
-                        img_url = urljoin(base_url, img_url.split('?')[0])
-                        
-                        # 生成文件名
-                        img_name = os.path.basename(urlparse(img_url).path)
-                        if not img_name:
-                            img_name = f"image_{int(time.time() * 1000)}"
-                        
-                        # 确保有扩展名
-                        if '.' not in img_name:
-                            ext = self.guess_file_extension(img_url)
-                            img_name = f"{img_name}.{ext}"
-                        
-                        # 安全文件名
-                        img_name = self.sanitize_filename(img_name)
-                        filepath = os.path.join(image_dir, img_name)
-                        
-                        # 下载图片
-                        if not os.path.exists(filepath):
-                            if self.download_resource(img_url, filepath):
-                                self.logger.info(f"已保存图片: {filepath}")
-                            else:
-                                self.logger.warning(f"图片下载失败: {img_url}")
-                        else:
-                            self.logger.info(f"图片已存在: {filepath}")
-                            
-                        time.sleep(0.2)  # 礼貌延迟
-                        
-                    except Exception as e:
-                        self.logger.error(f"处理图片 {img_url} 时出错: {str(e)}")
+            for img_url, filepath in self._iter_image_jobs(base_url, page, save_dir):
+                try:
+                    self._save_image(img_url, filepath)
+                except Exception as e:
+                    self.logger.error(f"处理图片 {img_url} 时出错: {str(e)}")
                         
         except Exception as e:
             self.logger.error(f"保存图片时发生错误: {str(e)}")
 
+    def _save_image(self, img_url, filepath):
+        """下载单张图片"""
+        plan = self._plan_image(img_url, filepath)
+        if plan is None:
+            return
+        target, cached = plan
+        result, digest = self._download(img_url, target, cached)
+        self._finish_image(img_url, filepath, target, result, digest)
+
+    def _plan_image(self, img_url, filepath):
+        """
+        决定图片是否需要下载
+        :return: (下载目标路径, 验证器缓存条目)，不需要下载时返回None
+        """
+        # 本次爬取中已处理过的URL不再请求
+        if img_url in self._images_seen:
+            return None
+        self._images_seen.add(img_url)
+        
+        if self.robots is not None and self.robots.allowed_cached(img_url) is False:
+            self.logger.info(f"robots.txt禁止抓取图片: {img_url}")
+            return None
+        if self._over_budget(urlparse(img_url).netloc):
+            self.metrics.increment('budget_skipped')
+            return None
+        
+        if self.image_store is not None:
+            known = self.image_store.lookup(img_url)
+            if known is None:
+                return self.image_store.temp_path(), None
+            # 已知URL：有验证器缓存时做一次条件请求，否则直接使用已存内容
+            if self.http_cache is None:
+                self.logger.info(f"图片已在存储中: {img_url}")
+                return None
+            return self.image_store.temp_path(), self.http_cache.get(img_url)
+        
+        if os.path.exists(filepath):
+            # 没有验证器缓存时，已存在的图片直接跳过
+            if self.http_cache is None:
+                self.logger.info(f"图片已存在: {filepath}")
+                return None
+            return filepath, self.http_cache.get(img_url)
+        return filepath, None
+
+    def _finish_image(self, img_url, filepath, target, result, digest):
+        """记录下载结果，内容寻址存储时把临时文件存入存储"""
+        if result == self.UNCHANGED:
+            self.logger.info(f"图片未变化: {img_url}")
+        elif result:
+            if self.image_store is not None:
+                path, is_new = self.image_store.commit(img_url, target, digest)
+                self.logger.info(f"已保存图片: {path}" if is_new else f"图片内容重复: {img_url} -> {path}")
+            else:
+                self.logger.info(f"已保存图片: {filepath}")
+        else:
+            self.logger.warning(f"图片下载失败: {img_url}")
+        
+        # 304或失败时删除内容寻址存储的临时文件
+        if self.image_store is not None and os.path.exists(target):
+            os.remove(target)
+
+    def _iter_image_jobs(self, base_url, page, save_dir):
+        """
+        根据页面中的图片候选生成 (图片URL, 保存路径) 下载任务
+        使用内容寻址存储时保存路径为None
+        """
+        domain = urlparse(base_url).netloc.replace(':', '_')
+        image_dir = os.path.join(save_dir, 'images', domain)
+        
+        for attrs in page.images:
+            img_urls = []
+            candidates = self._parse_srcset(attrs['srcset']) if 'srcset' in attrs else []
+            if self.srcset_mode == 'best' and candidates:
+                # 只下载srcset中宽度/像素密度最大的一个
+                img_urls.append(max(candidates, key=lambda c: (c[2] == 'w', c[1]))[0])
+            else:
+                img_urls.extend(candidate[0] for candidate in candidates)
+                img_urls.extend(value.strip() for attr, value in attrs.items() if attr != 'srcset')
+            
+            for img_url in img_urls:
+                if not img_url or img_url.startswith('data:'):
+                    continue
+                try:
+                    # 处理URL
+                    img_url = urljoin(base_url, img_url.split('?')[0])
+                    if self.image_store is not None:
+                        yield img_url, None
+                        continue
+                    
+                    # 生成文件名
+                    img_name = os.path.basename(urlparse(img_url).path)
+                    if not img_name:
+                        img_name = f"image_{int(time.time() * 1000)}"
+                    
+                    # 确保有扩展名
+                    if '.' not in img_name:
+                        ext = self.guess_file_extension(img_url)
+                        img_name = f"{img_name}.{ext}"
+                    
+                    # 安全文件名
+                    img_name = self.sanitize_filename(img_name)
+                    filepath = os.path.join(image_dir, img_name)
+                except Exception as e:
+                    self.logger.error(f"处理图片 {img_url} 时出错: {str(e)}")
+                    continue
+                
+                yield img_url, filepath
+
+    def _parse_srcset(self, value):
+        """解析srcset属性，返回 [(URL, 数值, 单位)]，单位为'w'（宽度）或'x'（像素密度）"""
+        candidates = []
+        for item in value.split(','):
+            parts = item.strip().split()
+            if not parts:
+                continue
+            number, unit = 1.0, 'x'
+            if len(parts) > 1 and parts[1][-1:] in ('w', 'x'):
+                try:
+                    number, unit = float(parts[1][:-1]), parts[1][-1]
+                except ValueError:
+                    pass
+            candidates.append((parts[0], number, unit))
+        return candidates
+
     def guess_file_extension(self, url):
         """从URL猜测文件扩展名"""
         path = urlparse(url).path.lower()
@@ -279,37 +1401,547 @@ class EnhancedWebCrawler:
             return 'webp'
         return 'jpg'  # 默认
 
-    def _save_links(self, url, soup, save_dir):
-        """保存链接"""
+
+class AsyncWebCrawler(EnhancedWebCrawler):
+    """
+    基于asyncio的并发爬取引擎，crawl()参数与EnhancedWebCrawler一致
+    页面抓取和图片下载共享同一个事件循环，同时受全局并发和单主机并发限制
+    """
+    SUPPORTS_HTTP2 = True
+
+    def __init__(self, max_concurrency=50, per_host_concurrency=2, image_concurrency=None,
+                 parse_workers=0, parse_queue_size=None, **kwargs):
+        """
+        :param max_concurrency: 全局同时进行的请求数上限
+        :param per_host_concurrency: 单个主机同时进行的请求数上限
+        :param image_concurrency: 图片下载的并发上限（默认为全局上限的一半，保证页面抓取总有空位）
+        :param parse_workers: 解析进程数；0表示在事件循环线程内解析，None表示使用全部CPU核心
+        :param parse_queue_size: 同时等待或正在解析的页面数上限（默认为解析进程数的2倍），
+            满额时抓取任务等待，从而限制新页面的抓取
+        其余参数（如crawl_delay、host_delays）传给EnhancedWebCrawler
+        """
+        super().__init__(**kwargs)
+        if self.transport.max_requests_per_connection is not None:
+            raise ValueError("max_requests_per_connection只用于同步引擎（EnhancedWebCrawler）")
+        if self.transport.http2 and self.transport.pool_maxsize != TransportConfig.DEFAULT_POOL_MAXSIZE:
+            raise ValueError("HTTP/2不支持pool_maxsize（同一主机复用一个连接），请用per_host_concurrency限制单主机并发")
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.image_concurrency = image_concurrency or max(1, max_concurrency // 2)
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self.parse_queue_size = parse_queue_size or 2 * max(1, self.parse_workers)
+        self._parse_pool = None
+
+    def crawl(self, start_url, max_depth=1, content_types=None, save_dir='./crawled_data', resume=False,
+              use_sitemaps=False):
+        """
+        异步爬取方法（参数含义同EnhancedWebCrawler.crawl）
+        """
+        if aiohttp is None:
+            raise ImportError("异步引擎需要安装aiohttp: pip install aiohttp")
+        if self.transport.http2 and httpx is None:
+            raise ImportError("HTTP/2需要安装httpx: pip install httpx[http2]")
+        
+        if content_types is None:
+            content_types = ['all']
+        
+        if not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+        
+        self.logger.info(f"开始异步爬取: {start_url} (深度: {max_depth}, 并发: {self.max_concurrency})")
+        asyncio.run(self._crawl_async(start_url, max_depth, content_types, save_dir, resume, use_sitemaps))
+        self.logger.info("爬取完成!")
+
+    async def _crawl_async(self, start_url, max_depth, content_types, save_dir, resume, use_sitemaps=False):
+        """从待爬队列派发页面任务，直到队列为空且所有页面、图片任务完成"""
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        self._image_limit = asyncio.Semaphore(self.image_concurrency)
+        self._host_limits = {}
+        self._host_active = {}  # 主机 -> 已派发未完成的页面任务数
+        self._image_tasks = set()
+        self._progress = tqdm(desc="已爬取页面", unit="页")
+        self._parse_slots = asyncio.Semaphore(self.parse_queue_size)
+        self._parse_queued = 0  # 等待或正在进程池中解析的页面数
+        self._robots_locks = {}  # 源站 -> 锁，同一源站的robots.txt只获取一次
         try:
-            links = set()
-            for tag in soup.find_all(['a', 'link', 'area'], href=True):
-                href = tag['href'].strip()
-                if href.startswith(('javascript:', 'mailto:', 'tel:')):
-                    continue
-                full_url = urljoin(url, href)
-                if self.is_valid_url(full_url):
-                    links.add(full_url)
+            if self.parse_workers > 0:
+                # 不用fork：此时已有SQLite连接和后台线程，fork出的子进程会继承它们的状态
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                                       mp_context=self._parse_context(),
+                                                       initializer=init_parse_worker,
+                                                       initargs=(self.html_parser.name,))
+                self.logger.info(f"解析进程数: {self.parse_workers}, 解析队列上限: {self.parse_queue_size}")
             
-            if links:
-                parsed_url = urlparse(url)
-                filename = f"{parsed_url.netloc}_{self.sanitize_filename(parsed_url.path)}_links.txt"
-                filepath = os.path.join(save_dir, 'links', filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(f"从 {url} 提取的 {len(links)} 个链接:\n\n")
-                    for link in sorted(links):
-                        f.write(f"{link}\n")
+            # 站点地图在派发页面任务前用同步会话读取
+            self._open_crawl(start_url, save_dir, resume, use_sitemaps)
+            try:
+                await self._dispatch_loop(max_depth, content_types, save_dir)
+            finally:
+                self._close_crawl()
+        finally:
+            self._progress.close()
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown(cancel_futures=True)
+                self._parse_pool = None
+
+    @staticmethod
+    def _parse_context():
+        """解析进程的启动方式：优先forkserver，不支持时（如Windows）用spawn"""
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        return multiprocessing.get_context(method)
+
+    async def _dispatch_loop(self, max_depth, content_types, save_dir):
+        """派发页面任务，直到队列为空（或达到预算）且所有页面、图片任务完成"""
+        async with self._open_http() as http:
+            self._http = http
+            pending = set()
+            parked = []
+            self.metrics.register_gauge('pages_in_flight', lambda: len(pending))
+            self.metrics.register_gauge('parked', lambda: len(parked))
+            self.metrics.register_gauge('image_tasks', lambda: len(self._image_tasks))
+            self.metrics.register_gauge('parse_queue', lambda: self._parse_queued)
+            self.metrics.register_gauge('suspended', lambda: sum(map(len, self._suspended.values())))
+            while pending or ((self.frontier or parked or self._suspended) and not self._budget_spent()):
+                self._release_suspended()
+                # 保持最多max_concurrency个页面任务在运行，已满额的主机暂缓派发
+                while len(pending) < self.max_concurrency and not self._budget_spent():
+                    entry = self._next_entry(
+                        parked, lambda host: self._host_active.get(host, 0) < self.per_host_concurrency)
+                    if entry is None:
+                        break
+                    host = urlparse(entry[0]).netloc
+                    if self._skip_over_budget(entry):
+                        continue
+                    if not self.breaker.allow(host):
+                        self._suspend(entry)
+                        continue
+                    self._pages_dispatched += 1
+                    pending.add(self._dispatch_page(host, entry, max_depth, content_types, save_dir))
                 
-                self.logger.info(f"已保存链接列表: {filepath}")
+                # 有熔断中的主机时最多等到最早的冷却结束（预算用完后只等待在途任务）
+                wait = self._suspended_wait() if self._suspended and not self._budget_spent() else None
+                if pending:
+                    done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                elif wait is not None:
+                    await asyncio.sleep(wait)
+            
+            # 等待剩余的图片下载
+            if self._image_tasks:
+                await asyncio.gather(*self._image_tasks, return_exceptions=True)
+
+    def _open_http(self):
+        """按transport创建异步HTTP客户端：默认为aiohttp会话，http2时为httpx的HTTP/2客户端"""
+        transport = self.transport
+        if transport.http2:
+            limits = httpx.Limits(max_connections=transport.pool_connections,
+                                  max_keepalive_connections=transport.pool_connections,
+                                  keepalive_expiry=transport.keepalive_timeout)
+            # httpx默认为每个请求输出一条INFO日志，请求结果已由爬虫记录
+            logging.getLogger('httpx').setLevel(logging.WARNING)
+            # http1=False时http地址直接以HTTP/2（h2c）连接
+            return httpx.AsyncClient(http2=True, http1=transport.http2 != 'h2c', limits=limits,
+                                     headers=dict(self.session.headers), follow_redirects=True)
+        options = {}
+        if self.dns_cache is not None:
+            # 由DnsCache缓存，关闭aiohttp自带的缓存
+            options.update(resolver=DnsCacheResolver(self.dns_cache), use_dns_cache=False)
+        connector = aiohttp.TCPConnector(limit=transport.pool_connections, limit_per_host=transport.pool_maxsize,
+                                         keepalive_timeout=transport.keepalive_timeout, **options)
+        return aiohttp.ClientSession(headers=dict(self.session.headers), connector=connector,
+                                     trace_configs=[self._trace_config()])
+
+    async def _send_async(self, url, timeout, headers=None):
+        """发送一次GET，返回未读取正文的响应（aiohttp响应或Http2Response）"""
+        transport = self.transport
+        if not transport.http2:
+            return await self._http.get(url, headers=headers, timeout=aiohttp.ClientTimeout(
+                total=timeout if transport.read_timeout is None else None,
+                sock_connect=transport.connect_timeout, sock_read=transport.read_timeout))
+        connect_timeout, read_timeout = transport.timeout(timeout)
+        request = self._http.build_request('GET', url, headers=headers, timeout=httpx.Timeout(
+            read_timeout, connect=connect_timeout), extensions={'trace': self._http2_trace(url)})
+        return Http2Response(await self._http.send(request, stream=True))
+
+    @staticmethod
+    async def _release_async(response):
+        """释放响应占用的连接（HTTP/2为关闭流）"""
+        if isinstance(response, Http2Response):
+            await response.aclose()
+        else:
+            response.release()
+
+    def _http2_trace(self, url):
+        """httpx请求跟踪（指标同_trace_config）：没有建立连接事件的请求复用了已有连接"""
+        started = time.perf_counter()
+        timing = {'connect': 0.0}
+
+        async def trace(event, info):
+            if event == 'connection.connect_tcp.started':
+                timing['connect_started'] = time.perf_counter()
+            elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+                timing['connect'] = time.perf_counter() - timing['connect_started']
+            elif event.endswith('.send_request_headers.started'):
+                if 'connect_started' in timing:
+                    self.metrics.increment('connections_opened')
+                    self.metrics.observe('connect', timing['connect'], url)
+                else:
+                    self.metrics.increment('connections_reused')
+            elif event.endswith('.receive_response_headers.complete'):
+                self.metrics.observe('ttfb', time.perf_counter() - started - timing['connect'], url)
+        return trace
+
+    def _trace_config(self):
+        """aiohttp请求跟踪：记录新建连接耗时、连接复用次数和首字节耗时（不含建立连接）"""
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.url = str(params.url)
+            context.started = time.perf_counter()
+            context.connect = 0.0
+
+        async def on_connection_create_start(session, context, params):
+            context.connect_started = time.perf_counter()
+
+        async def on_connection_create_end(session, context, params):
+            context.connect = time.perf_counter() - context.connect_started
+            self.metrics.increment('connections_opened')
+            self.metrics.observe('connect', context.connect, context.url)
+
+        async def on_connection_reuseconn(session, context, params):
+            self.metrics.increment('connections_reused')
+
+        async def on_request_end(session, context, params):
+            # 收到响应头时触发
+            self.metrics.observe('ttfb', time.perf_counter() - context.started - context.connect, context.url)
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_start.append(on_connection_create_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    def _dispatch_page(self, host, entry, max_depth, content_types, save_dir):
+        """创建页面任务并计入主机的在途任务数"""
+        self._host_active[host] = self._host_active.get(host, 0) + 1
+        task = asyncio.create_task(self._process_entry(entry, max_depth, content_types, save_dir))
+        task.add_done_callback(lambda _: self._release_host(host))
+        return task
+
+    def _release_host(self, host):
+        """页面任务结束，减少主机的在途任务数"""
+        self._host_active[host] -= 1
+        if not self._host_active[host]:
+            del self._host_active[host]
+
+    async def _wait_for_host_async(self, url):
+        """异步等待该主机的礼貌延迟，不影响其他主机"""
+        wait = self.scheduler.reserve(urlparse(url).netloc)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _host_limit(self, url):
+        """获取主机对应的并发信号量"""
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_limits[host]
+
+    async def _process_entry(self, entry, max_depth, content_types, save_dir):
+        """处理一个待爬条目；抓取过程中该主机被熔断时暂存条目，冷却结束后重新抓取"""
+        url, depth, _ = entry
+        try:
+            await self._process_page(url, depth, max_depth, content_types, save_dir)
+        except CircuitOpenError:
+            self._suspend(entry)
+
+    async def _process_page(self, url, depth, max_depth, content_types, save_dir):
+        """抓取并处理单个页面，出链放入待爬队列，图片下载作为独立任务调度"""
+        self.logger.info(f"处理 [{depth}/{max_depth}] {url}")
+        
+        try:
+            if not await self._robots_allows_async(url):
+                return
+            
+            if self._links_only(content_types):
+                await self._process_links_only(url, depth, max_depth, content_types, save_dir)
+            else:
+                await self._process_full_page(url, depth, max_depth, content_types, save_dir)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            self.logger.error(f"处理 {url} 时出错: {str(e)}")
+            self._record_failed_visit(url, e)
+        
+        # 被取消（如Ctrl-C）的任务不标记完成，resume时会重新抓取
+        self._mark_done(url)
+
+    async def _robots_allows_async(self, url):
+        """异步版robots.txt检查（规则同_robots_allows），同一源站并发时只获取一次"""
+        if self.robots is None:
+            return True
+        rules = self.robots.get(url)
+        if rules is None:
+            lock = self._robots_locks.setdefault(RobotsCache.origin(url), asyncio.Lock())
+            async with lock:
+                rules = self.robots.get(url)
+                if rules is None:
+                    rules = await self._fetch_robots_async(url)
+        return self._check_robots(url, rules)
+
+    async def _fetch_robots_async(self, url):
+        """异步获取并缓存URL所属源站的robots.txt"""
+        robots_url = RobotsCache.robots_url(url)
+        try:
+            async with self._host_limit(url), self._request_async(robots_url, 10) as response:
+                status, body = response.status, await response.text(encoding='utf-8', errors='replace')
+        except self._transport_errors() as e:
+            self.logger.warning(f"获取 {robots_url} 失败: {str(e)}")
+            status, body = None, None
+        return self.robots.put(url, status, body)
+
+    async def _process_full_page(self, url, depth, max_depth, content_types, save_dir):
+        """完整解析页面：保存内容、调度图片下载、出链入队"""
+        body, encoding, unchanged = await self._fetch_body_async(url)
+        if body is None:
+            return
+        self._record_visit(url, depth, unchanged)
+        
+        page = await self._parse_async(url, body, encoding, content_types)
+        self._observe_focus(page)
+        self._record_links(url, page.links)
+        self._progress.update(1)
+        save, expand = self._near_duplicate_actions(url, page)
+        if save:
+            self._save_page(url, page, unchanged, content_types, save_dir)
+            
+            # 图片下载不阻塞页面发现
+            if 'all' in content_types or 'images' in content_types:
+                for img_url, filepath in self._iter_image_jobs(url, page, save_dir):
+                    task = asyncio.create_task(self._save_image_async(img_url, filepath))
+                    self._image_tasks.add(task)
+                    task.add_done_callback(self._image_tasks.discard)
+        
+        if expand:
+            self._enqueue_links(page, depth, max_depth)
+
+    async def _process_links_only(self, url, depth, max_depth, content_types, save_dir):
+        """只需要链接时边下载边入队，不构建DOM树"""
+        on_link = (lambda link: self._enqueue(link, depth + 1)) if depth < max_depth else None
+        links, unchanged = await self._stream_links_async(url, on_link)
+        if links is None:
+            return
+        self._record_visit(url, depth, unchanged)
+        self._record_links(url, links)
+        self._progress.update(1)
+        self._save_page(url, PageResult(url, links=links), unchanged, content_types, save_dir)
+
+    async def _parse_async(self, url, body, encoding, content_types):
+        """
+        解析页面：配置了解析进程时交给进程池，否则在当前线程解析
+        等待和正在解析的页面数受parse_queue_size限制，满额时调用方（抓取任务）在此等待
+        """
+        if self._parse_pool is None:
+            return self._parse_body(url, body, encoding, content_types)
+        
+        want_text, want_images, want_anchors = self._wanted_parts(content_types)
+        self._parse_queued += 1
+        try:
+            async with self._parse_slots:
+                (hrefs, images, text, anchors), decode_seconds, parse_seconds = \
+                    await asyncio.get_running_loop().run_in_executor(
+                        self._parse_pool, parse_in_worker, body, encoding, want_text, want_images, want_anchors)
+        finally:
+            self._parse_queued -= 1
+        self._observe_parse(url, decode_seconds, parse_seconds)
+        return self._build_page(url, hrefs, images, text, anchors)
+
+    async def _fetch_body_async(self, url):
+        """
+        抓取页面的原始字节，304时返回缓存的正文
+        :return: (正文字节, 编码, 内容是否与上次相同)，非文本内容返回 (None, None, False)
+        """
+        cached = self.http_cache.get(url) if self.http_cache is not None else None
+        
+        async with self._host_limit(url), self._request_async(
+                url, 10, HttpValidatorCache.conditional_headers(cached)) as response:
+            if response.status == 304:
+                if cached is None or cached['body'] is None:
+                    self.logger.warning(f"收到304但没有缓存副本: {url}")
+                    return None, None, False
+                return zlib.decompress(cached['body']), cached['encoding'], True
+            response.raise_for_status()
+            
+            content_type = response.headers.get('content-type', '').lower()
+            if not ('html' in content_type or 'text' in content_type):
+                self.logger.warning(f"跳过非文本内容: {url} (Content-Type: {content_type})")
+                return None, None, False
+            
+            read_started = time.perf_counter()
+            body = await response.read()
+            self.metrics.observe('download', time.perf_counter() - read_started, url)
+            self._record_bytes(url, len(body))
+            encoding = self._resolve_charset(url, content_type, body)
+            return body, encoding, self._store_validators(url, response.headers, body, encoding, cached)
+
+    async def _stream_links_async(self, url, on_link=None):
+        """异步版流式链接提取（规则同_stream_links），返回 (链接集合, 内容是否与上次相同)"""
+        cached = self.http_cache.get(url) if self.http_cache is not None else None
+        links = set()
+        
+        async with self._host_limit(url), self._request_async(
+                url, 10, HttpValidatorCache.conditional_headers(cached)) as response:
+            if response.status == 304:
+                if cached is None or cached['body'] is None:
+                    self.logger.warning(f"收到304但没有缓存副本: {url}")
+                    return None, False
+                extractor = StreamingLinkExtractor()
+                self._collect_links(url, extractor.feed_text(HttpValidatorCache.cached_text(cached)), links, on_link)
+                self._collect_links(url, extractor.finish(), links, on_link)
+                return links, True
+            response.raise_for_status()
+            
+            content_type = response.headers.get('content-type', '').lower()
+            if not ('html' in content_type or 'text' in content_type):
+                self.logger.warning(f"跳过非文本内容: {url} (Content-Type: {content_type})")
+                return None, False
+            
+            extractor = StreamingLinkExtractor(
+                max_bytes=self.max_body_size, resolve=lambda prefix: self._resolve_charset(url, content_type, prefix))
+            read_started = time.perf_counter()
+            async for chunk in response.content.iter_chunked(8192):
+                self._collect_links(url, extractor.feed_bytes(chunk), links, on_link)
+                if extractor.truncated:
+                    self.logger.warning(f"正文超过 {self.max_body_size} 字节，停止读取: {url}")
+                    break
+            self._collect_links(url, extractor.finish(), links, on_link)
+            self.metrics.observe('download', time.perf_counter() - read_started, url)
+            self._record_bytes(url, extractor.bytes_read)
+            return links, self._store_stream_validators(url, response.headers, extractor, cached)
+
+    @contextlib.asynccontextmanager
+    async def _request_async(self, url, timeout, headers=None):
+        """
+        异步版带重试的GET（规则同_get），产出aiohttp响应或Http2Response，退出时释放连接
+        调用方应已持有主机名额；等待礼貌延迟和退避时不占用全局名额
+        :param timeout: 整个请求（含读取正文）的超时秒数，transport设置了连接或读取超时时改用各自的设置
+        """
+        host = urlparse(url).netloc
+        if not self.breaker.allow(host):
+            raise CircuitOpenError(f"主机熔断中: {host}")
+        attempts = self.retry_policy.new_attempts()
+        while True:
+            await self._wait_for_host_async(url)
+            async with self._global_limit:
+                started = time.monotonic()
+                try:
+                    response = await self._send_async(url, timeout, headers)
+                except self._transport_errors() as e:
+                    kind = self._async_error_kind(e)
+                    # 连接类错误和超时（含httpx的网络异常）计入熔断
+                    if isinstance(e, aiohttp.ClientConnectionError) or not isinstance(e, aiohttp.ClientError):
+                        self._record_failure(host)
+                    delay = None if kind is None else self.retry_policy.next_delay(attempts, kind)
+                    if delay is None or not self.breaker.allow(host):
+                        raise
+                    self._forget_dns_failure(url)
+                    self.logger.warning(f"请求 {url} 失败，{delay:.1f}秒后重试: {str(e) or type(e).__name__}")
+                else:
+                    self._record_host(url, response.status, time.monotonic() - started)
+                    delay = None
+                    if response.status in self.retry_policy.RETRY_STATUS:
+                        delay = self._status_delay(host, response.status, response.headers, attempts)
+                    if delay is None or not self.breaker.allow(host):
+                        try:
+                            yield response
+                        finally:
+                            await self._release_async(response)
+                        return
+                    await self._release_async(response)
+                    self.logger.warning(f"{url} 返回 {response.status}，{delay:.1f}秒后重试")
+            self.metrics.increment('retries')
+            self.scheduler.defer(host, delay)
+
+    def _fetch_errors(self):
+        """异步页面请求可能抛出的异常类型（aiohttp的HTTP错误是ClientError，httpx的另算）"""
+        if httpx is None:
+            return self._transport_errors()
+        return self._transport_errors() + (httpx.HTTPStatusError,)
+
+    @staticmethod
+    def _transport_errors():
+        """异步请求可能抛出的网络异常类型"""
+        if httpx is None:
+            return aiohttp.ClientError, asyncio.TimeoutError
+        return aiohttp.ClientError, asyncio.TimeoutError, httpx.TransportError
+
+    @staticmethod
+    def _async_error_kind(error):
+        """aiohttp/httpx异常的重试类别（规则同RetryPolicy.error_kind）"""
+        if httpx is not None and isinstance(error, httpx.TransportError):
+            if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+                return 'connect'
+            if isinstance(error, (httpx.ReadError, httpx.ReadTimeout, httpx.WriteError,
+                                  httpx.RemoteProtocolError, httpx.PoolTimeout)):
+                return 'read'
+            return None
+        if isinstance(error, (aiohttp.ClientSSLError, aiohttp.InvalidURL)):
+            return None
+        # aiohttp 3.10起连接超时有单独的异常类型
+        if isinstance(error, (aiohttp.ClientConnectorError, getattr(aiohttp, 'ConnectionTimeoutError', ()))):
+            return 'connect'
+        if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)):
+            return 'read'
+        return None
+
+    async def _save_image_async(self, img_url, filepath):
+        """异步下载单张图片（规则同_save_image）"""
+        try:
+            plan = self._plan_image(img_url, filepath)
+            if plan is None:
+                return
+            target, cached = plan
+            result, digest = await self._download_async(img_url, target, cached)
+            self._finish_image(img_url, filepath, target, result, digest)
         except Exception as e:
-            self.logger.error(f"保存链接失败: {str(e)}")
+            self.logger.error(f"处理图片 {img_url} 时出错: {str(e)}")
+
+    async def _download_async(self, url, save_path, cached=None):
+        """异步版资源下载方法（重试和条件请求规则同_download），返回 (结果, 摘要)"""
+        async with self._image_limit, self._host_limit(url):
+            try:
+                async with self._request_async(url, 15, HttpValidatorCache.conditional_headers(cached)) as response:
+                    if response.status == 304 and cached is not None:
+                        return self.UNCHANGED, None
+                    response.raise_for_status()
+                    
+                    # 检查内容类型
+                    content_type = response.headers.get('content-type', '').lower()
+                    if 'image' in content_type or url.lower().split('?')[0].split('.')[-1] in ['jpg', 'jpeg', 'png', 'gif', 'webp']:
+                        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                        digest = hashlib.sha256()
+                        read_started = time.perf_counter()
+                        with open(save_path, 'wb') as f:
+                            async for chunk in response.content.iter_chunked(8192):
+                                digest.update(chunk)
+                                f.write(chunk)
+                            size = f.tell()
+                        self.metrics.observe('download', time.perf_counter() - read_started, url)
+                        self._record_bytes(url, size)
+                        if self.http_cache is not None:
+                            self.http_cache.store(url, response.headers, digest.hexdigest())
+                        return True, digest.hexdigest()
+                    else:
+                        self.logger.warning(f"非图片内容: {url} (Content-Type: {content_type})")
+                        return False, None
+            except Exception as e:
+                self.logger.error(f"下载 {url} 失败: {str(e)}")
+                return False, None
 
 
 def main():
     print("=== 增强版网页爬虫 ===")
-    print("注意: 请遵守robots.txt协议和目标网站的使用条款")
+    print("注意: 爬虫会自动遵守robots.txt，也请遵守目标网站的使用条款")
     
     # 用户输入
     start_url = input("请输入起始URL (例如 https://example.com): ").strip()
@@ -345,14 +1977,40 @@ def main():
     save_dir = input(f"保存目录 (默认: ./crawled_data): ").strip()
     save_dir = save_dir if save_dir else './crawled_data'
     
+    resume = False
+    if os.path.exists(os.path.join(save_dir, '.crawl_state.sqlite')):
+        resume = input("发现上次的爬取检查点，是否继续 [y/N]: ").strip().lower() == 'y'
+    
+    use_sitemaps = input("是否从站点地图(sitemap)获取页面 [y/N]: ").strip().lower() == 'y'
+    incremental = input("是否使用增量模式（再次爬取时只重新抓取可能已变化的页面） [y/N]: ").strip().lower() == 'y'
+    keywords = input("聚焦爬取的关键词 (逗号分隔，回车表示不聚焦): ").strip()
+    focus_topic = [keyword.strip() for keyword in keywords.split(',') if keyword.strip()] or None
+    skip_duplicates = input("是否跳过近似重复的页面（不保存、不展开链接） [y/N]: ").strip().lower() == 'y'
+    near_duplicate_policy = 'skip_all' if skip_duplicates else None
+    max_pages = input("每个主机最多抓取的页面数 (回车不限制): ").strip()
+    max_pages = int(max_pages) if max_pages.isdigit() and int(max_pages) > 0 else None
+    use_async = input("是否使用异步并发引擎 (需安装aiohttp) [y/N]: ").strip().lower() == 'y'
+    
+    configs = {
+        'scope': ScopeConfig(near_duplicate_policy=near_duplicate_policy, max_pages_per_host=max_pages),
+        'focus': FocusConfig(focus_topic=focus_topic),
+        'recrawl': RecrawlConfig(incremental=incremental),
+    }
+    if use_async:
+        parse_workers = input("解析进程数 (默认0，在主线程中解析): ").strip()
+        crawler = AsyncWebCrawler(parse_workers=int(parse_workers) if parse_workers.isdigit() else 0, **configs)
+    else:
+        crawler = EnhancedWebCrawler(**configs)
+    
     # 开始爬取
-    crawler = EnhancedWebCrawler()
     print("\n开始爬取 (查看web_crawler.log获取详细日志)...")
     crawler.crawl(
         start_url=start_url,
         max_depth=max_depth,
         content_types=content_types,
-        save_dir=save_dir
+        save_dir=save_dir,
+        resume=resume,
+        use_sitemaps=use_sitemaps
     )
     print("爬取完成!")
 
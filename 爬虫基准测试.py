@@ -0,0 +1,385 @@
+"""
+爬虫基准测试：在本机启动一个合成站点，依次运行各个爬虫，记录吞吐量、延迟和资源占用
+每个爬虫在独立的子进程中运行，峰值内存和CPU时间互不影响；结果写成JSON，便于对比不同提交
+
+用法示例:
+    python 爬虫基准测试.py --fanout 5 --depth 3 --page-size 20000 --images 3 --output bench.json
+    python 爬虫基准测试.py --crawlers enhanced,async --latency 0.02 --error-rate 0.05 --repeat 3
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import importlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 爬虫名 -> (文件名, 类名)
+CRAWLERS = {
+    'legacy': ('Python爬虫工具.py', 'WebCrawler'),
+    'enhanced': ('更新版Python爬虫.py', 'EnhancedWebCrawler'),
+    'async': ('更新版Python爬虫.py', 'AsyncWebCrawler'),
+}
+
+# 最小的合法PNG文件头，图片内容用它加填充字节
+PNG_HEADER = b'\x89PNG\r\n\x1a\n'
+
+WORDS = ('crawler', 'benchmark', 'page', 'link', 'image', 'frontier', 'parser', 'latency',
+         'throughput', 'memory', 'host', 'delay', 'queue', 'shard', 'index', 'text')
+
+
+class SyntheticSite:
+    """
+    合成站点：页面按编号组成完全树，页面i的子页面为 i*fanout+1 ... i*fanout+fanout
+    页面内容、延迟和错误都由 (seed, 路径) 决定，多次运行完全相同
+    """
+    def __init__(self, fanout=5, depth=3, page_size=20000, images=3, image_size=4096,
+                 latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        """
+        :param fanout: 每个页面的子页面数
+        :param depth: 树的深度（根页面为第0层）
+        :param page_size: 每个页面的大致字节数（不足时用文本段落填充）
+        :param images: 每个页面的图片数
+        :param image_size: 每张图片的字节数
+        :param latency: 每个请求的固定延迟（秒）
+        :param jitter: 额外的随机延迟上限（秒）
+        :param error_rate: 返回500的请求比例
+        :param seed: 随机种子
+        """
+        self.fanout = fanout
+        self.depth = depth
+        self.page_size = page_size
+        self.images = images
+        self.image_size = image_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.total_pages = sum(fanout ** level for level in range(depth + 1))
+
+    def _rng(self, path):
+        return random.Random(f"{self.seed}:{path}")
+
+    def plan(self, path):
+        """返回请求的 (延迟秒数, 是否返回错误)"""
+        rng = self._rng(path)
+        delay = self.latency + rng.uniform(0, self.jitter)
+        return delay, rng.random() < self.error_rate
+
+    def page(self, number):
+        """生成页面HTML（字节）"""
+        rng = self._rng(f"page:{number}")
+        first_child = number * self.fanout + 1
+        children = [n for n in range(first_child, first_child + self.fanout) if n < self.total_pages]
+
+        parts = [f"<html><head><title>Page {number}</title></head><body>",
+                 f"<nav><a href=\"/p/0.html\">home</a></nav><h1>Page {number}</h1>"]
+        if number:
+            parts.append(f"<a href=\"/p/{(number - 1) // self.fanout}.html\">parent</a>")
+        parts.extend(f"<a href=\"/p/{child}.html\">child {child}</a>" for child in children)
+        parts.extend(f"<img src=\"/img/{number}-{k}.png\" alt=\"image {k}\">" for k in range(self.images))
+
+        size = sum(len(part) for part in parts)
+        while size < self.page_size:
+            paragraph = "<p>" + " ".join(rng.choice(WORDS) for _ in range(40)) + "</p>"
+            parts.append(paragraph)
+            size += len(paragraph)
+        parts.append("<footer>synthetic site</footer></body></html>")
+        return "".join(parts).encode('utf-8')
+
+    def image(self, name):
+        """生成图片内容（字节）"""
+        rng = self._rng(f"img:{name}")
+        return PNG_HEADER + rng.randbytes(max(0, self.image_size - len(PNG_HEADER)))
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """合成站点的请求处理器，统计请求数和发送的字节数"""
+    protocol_version = 'HTTP/1.1'
+    # 响应头和正文分两次写出，不关闭Nagle算法时每个响应都会多等一个延迟确认（约40毫秒）
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        delay, error = server.site.plan(self.path)
+        if delay > 0:
+            time.sleep(delay)
+
+        status, content_type, body = 200, 'text/html; charset=utf-8', None
+        path = self.path.split('?')[0]
+        if error:
+            status, content_type, body = 500, 'text/plain', b'injected error'
+        elif path.startswith('/p/') and path.endswith('.html') and path[3:-5].isdigit() \
+                and int(path[3:-5]) < server.site.total_pages:
+            body = server.site.page(int(path[3:-5]))
+        elif path.startswith('/img/') and path.endswith('.png'):
+            content_type, body = 'image/png', server.site.image(path[5:-4])
+        else:
+            status, content_type, body = 404, 'text/plain', b'not found'
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        server.count(path, status, len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BenchmarkServer(ThreadingHTTPServer):
+    """在后台线程运行的合成站点服务器（监听127.0.0.1的随机端口）"""
+    daemon_threads = True
+
+    def __init__(self, site):
+        super().__init__(('127.0.0.1', 0), SiteHandler)
+        self.site = site
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.reset_stats()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/p/0.html"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, path, status, size):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += size
+            if status >= 400:
+                self.stats['errors'] += 1
+            elif path.startswith('/img/'):
+                self.stats['images'] += 1
+            else:
+                self.stats['pages'] += 1
+
+    def handle_error(self, request, client_address):
+        # 爬虫关闭长连接时的断开属于正常情况，不打印
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'pages': 0, 'images': 0, 'errors': 0, 'bytes': 0}
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+def percentile(values, p):
+    """最近秩法百分位数，空列表返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, round(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def load_crawler_class(name):
+    """从仓库中的脚本加载爬虫类（按模块原名从sys.path导入，forkserver/spawn启动的解析进程才能重新导入它）"""
+    filename, class_name = CRAWLERS[name]
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    module = importlib.import_module(os.path.splitext(filename)[0])
+    return getattr(module, class_name)
+
+
+def instrument(crawler, name, latencies):
+    """包装单页处理方法，记录每个页面的处理耗时"""
+    if name == 'async':
+        original = crawler._process_page
+
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - started)
+        crawler._process_page = timed
+    else:
+        original = crawler._crawl_page
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - started)
+        crawler._crawl_page = timed
+
+
+def run_worker(args):
+    """子进程入口：运行一个爬虫并把测量结果写入 args.result"""
+    crawler_class = load_crawler_class(args.worker)
+    if args.worker == 'legacy':
+        crawler = crawler_class(page_delay=0, image_delay=0)
+    else:
+        crawler = crawler_class(crawl_delay=0, **json.loads(args.crawler_options))
+
+    latencies = []
+    instrument(crawler, args.worker, latencies)
+    content_types = args.content_types.split(',')
+
+    started = time.perf_counter()
+    crawler.crawl(args.url, max_depth=args.max_depth, content_types=content_types, save_dir=args.save_dir)
+    wall = time.perf_counter() - started
+
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)  # 解析进程池等子进程
+    result = {
+        'wall_seconds': wall,
+        'pages_processed': len(latencies),
+        'latency_p50': percentile(latencies, 50),
+        'latency_p99': percentile(latencies, 99),
+        'cpu_seconds': self_usage.ru_utime + self_usage.ru_stime + child_usage.ru_utime + child_usage.ru_stime,
+        # Linux上ru_maxrss的单位是KB
+        'peak_rss_mb': max(self_usage.ru_maxrss, child_usage.ru_maxrss) / 1024,
+    }
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+def run_one(name, server, args):
+    """在子进程中运行一次爬虫，合并服务器端统计后返回结果"""
+    with tempfile.TemporaryDirectory(prefix='crawler_bench_') as workdir:
+        result_path = os.path.join(workdir, 'result.json')
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker', name,
+            '--url', server.url, '--max-depth', str(args.depth + 1),
+            '--content-types', args.content_types, '--crawler-options', args.crawler_options,
+            '--save-dir', os.path.join(workdir, 'data'), '--result', result_path,
+        ]
+        # 只访问本机服务器，不走代理
+        env = dict(os.environ, NO_PROXY='127.0.0.1,localhost', no_proxy='127.0.0.1,localhost')
+
+        server.reset_stats()
+        completed = subprocess.run(command, cwd=workdir, env=env, timeout=args.timeout,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        served = server.snapshot()
+        if completed.returncode != 0:
+            return {'error': completed.stderr.decode('utf-8', errors='replace')[-2000:]}
+
+        with open(result_path, encoding='utf-8') as f:
+            result = json.load(f)
+
+    wall = result['wall_seconds']
+    result.update({
+        'pages_per_sec': result['pages_processed'] / wall if wall else None,
+        'bytes_per_sec': served['bytes'] / wall if wall else None,
+        'server': served,
+    })
+    return result
+
+
+def git_commit():
+    """当前提交的哈希，不在git仓库中时返回None"""
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, timeout=10)
+        return output.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="爬虫基准测试（离线，使用本机合成站点）")
+    parser.add_argument('--crawlers', default=','.join(CRAWLERS), help="要测试的爬虫，逗号分隔")
+    parser.add_argument('--fanout', type=int, default=5, help="每个页面的子页面数")
+    parser.add_argument('--depth', type=int, default=3, help="站点深度（根页面为第0层）")
+    parser.add_argument('--page-size', type=int, default=20000, help="页面大小（字节）")
+    parser.add_argument('--images', type=int, default=3, help="每个页面的图片数")
+    parser.add_argument('--image-size', type=int, default=4096, help="图片大小（字节）")
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.0, help="额外随机延迟的上限（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回500的请求比例")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--content-types', default='all', help="爬取的内容类型，逗号分隔")
+    parser.add_argument('--crawler-options', default='{}',
+                        help="传给增强版/异步爬虫构造函数的JSON参数，如 '{\"seen_store\": \"bloom\"}'")
+    parser.add_argument('--repeat', type=int, default=1, help="每个爬虫运行的次数")
+    parser.add_argument('--timeout', type=float, default=600, help="单次运行的超时（秒）")
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'benchmark_results.json'),
+                        help="结果JSON文件（默认写到系统临时目录，不污染工作目录）")
+    # 以下参数供子进程使用
+    parser.add_argument('--worker', choices=list(CRAWLERS), help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--max-depth', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--save-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    names = [name.strip() for name in args.crawlers.split(',') if name.strip()]
+    for name in names:
+        if name not in CRAWLERS:
+            sys.exit(f"未知的爬虫: {name}（可选: {', '.join(CRAWLERS)}）")
+
+    site = SyntheticSite(fanout=args.fanout, depth=args.depth, page_size=args.page_size,
+                         images=args.images, image_size=args.image_size, latency=args.latency,
+                         jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    server = BenchmarkServer(site)
+    server.start()
+    print(f"合成站点: {server.url} ({site.total_pages} 个页面)")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'site': {key: getattr(site, key) for key in (
+            'fanout', 'depth', 'page_size', 'images', 'image_size', 'latency', 'jitter', 'error_rate', 'seed',
+            'total_pages')},
+        'content_types': args.content_types,
+        'crawler_options': json.loads(args.crawler_options),
+        'results': {},
+    }
+    try:
+        for name in names:
+            runs = []
+            for run in range(args.repeat):
+                result = run_one(name, server, args)
+                runs.append(result)
+                if 'error' in result:
+                    print(f"{name} 第{run + 1}次运行失败:\n{result['error']}")
+                elif not result['pages_processed']:
+                    print(f"{name} 第{run + 1}次: 没有处理任何页面")
+                else:
+                    print(f"{name} 第{run + 1}次: {result['pages_per_sec']:.1f} 页/秒, "
+                          f"{result['bytes_per_sec'] / 1024:.0f} KB/秒, "
+                          f"p50 {result['latency_p50'] * 1000:.1f} ms, p99 {result['latency_p99'] * 1000:.1f} ms, "
+                          f"CPU {result['cpu_seconds']:.2f} 秒, 峰值内存 {result['peak_rss_mb']:.1f} MB")
+            report['results'][name] = runs
+    finally:
+        server.stop()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+爬虫组件：更新版Python爬虫.py使用的基础设施，按功能分模块
+
+    网址      URL规范化、爬虫陷阱检测和已见URL存储
+    解析      HTML解析器后端、流式链接提取和字符编码识别
+    调度      待爬队列和按主机的礼貌调度
+    重试      重试策略和按主机的熔断器（旧版爬虫也使用）
+    站点规则  robots.txt和站点地图
+    状态存储  爬取检查点、HTTP条件请求缓存和增量重爬历史
+    内容分析  SimHash、链接图与PageRank、聚焦爬取的主题相关度
+    输出      图片存储和文本/链接的输出
+    配置      爬虫的配置对象
+    域名解析  DNS缓存
+    传输      同步引擎的HTTP连接池和HTTP/2响应包装
+    指标      爬取指标和Prometheus导出
+"""
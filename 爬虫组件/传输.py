@@ -0,0 +1,176 @@
+"""
+同步引擎的HTTP传输（连接计时、DNS缓存、keep-alive限制）和HTTP/2响应包装
+"""
+import sys
+import time
+import socket
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError, NameResolutionError, ConnectTimeoutError
+from urllib3.util import connection as urllib3_connection
+
+
+# 新建连接的耗时（按线程记录，请求返回后由爬虫取走）
+_connect_timings = threading.local()
+
+
+def take_connect_time():
+    """取出并清零当前线程最近一次请求中新建连接的耗时（复用连接时为0）"""
+    seconds = getattr(_connect_timings, 'seconds', 0.0)
+    _connect_timings.seconds = 0.0
+    return seconds
+
+
+class _CachedDnsMixin:
+    """设置了dns_cache时通过DnsCache解析主机名，再依次尝试各个地址（错误类型同urllib3）"""
+    dns_cache = None
+
+    def _new_conn(self):
+        if self.dns_cache is None:
+            return super()._new_conn()
+        try:
+            addresses = self.dns_cache.resolve(self._dns_host.rstrip('.'))
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        error = None
+        for address in addresses:
+            try:
+                sock = urllib3_connection.create_connection(
+                    (address, self.port), self.timeout,
+                    source_address=self.source_address, socket_options=self.socket_options)
+            except socket.timeout:
+                error = ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})")
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+            else:
+                sys.audit("http.client.connect", self, self.host, self.port)
+                return sock
+        raise error
+
+
+class _TimedHTTPConnection(_CachedDnsMixin, HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_timings.seconds = getattr(_connect_timings, 'seconds', 0.0) + time.perf_counter() - started
+
+
+class _TimedHTTPSConnection(_CachedDnsMixin, HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_timings.seconds = getattr(_connect_timings, 'seconds', 0.0) + time.perf_counter() - started
+
+
+class _KeepAlivePoolMixin:
+    """
+    连接池的keep-alive限制：空闲超过keepalive_timeout或已处理max_requests个请求的连接先关闭，
+    下次使用时重新建立；关闭的次数记入adapter的stats
+    """
+    keepalive_timeout = None
+    max_requests = None
+    adapter = None
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        idle_since = getattr(conn, 'idle_since', None)
+        if (idle_since is not None and self.keepalive_timeout is not None and conn.sock is not None
+                and time.monotonic() - idle_since > self.keepalive_timeout):
+            conn.close()
+            self.adapter.count('closed_idle')
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.idle_since = time.monotonic()
+            conn.requests_served = getattr(conn, 'requests_served', 0) + 1
+            if self.max_requests is not None and conn.requests_served >= self.max_requests:
+                conn.close()
+                conn.requests_served = 0
+                self.adapter.count('closed_max_requests')
+        super()._put_conn(conn)
+
+
+class _TimedHTTPConnectionPool(_KeepAlivePoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(_KeepAlivePoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    记录新建连接（含TLS握手）耗时的HTTPAdapter，耗时通过take_connect_time()取出
+    支持keep-alive限制（见_KeepAlivePoolMixin），stats记录因此关闭的连接数
+    """
+    # pickle时保存的属性（HTTPAdapter只保存__attrs__中列出的）
+    __attrs__ = HTTPAdapter.__attrs__ + ['keepalive_timeout', 'max_requests_per_connection']
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, keepalive_timeout=None,
+                 max_requests_per_connection=None, dns_cache=None, **kwargs):
+        """
+        :param pool_connections: 最多保留多少个主机的连接池
+        :param pool_maxsize: 每个主机最多保持的连接数
+        :param keepalive_timeout: 空闲连接保持的秒数，None表示不限制
+        :param max_requests_per_connection: 每个连接最多处理的请求数，None表示不限制
+        :param dns_cache: 新建连接时使用的DnsCache，None时使用系统解析（不随pickle保存）
+        """
+        self.keepalive_timeout = keepalive_timeout
+        self.max_requests_per_connection = max_requests_per_connection
+        self.dns_cache = dns_cache
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize, **kwargs)
+
+    def count(self, name):
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        limits = {'keepalive_timeout': self.keepalive_timeout, 'max_requests': self.max_requests_per_connection,
+                  'adapter': self}
+        dns = {'dns_cache': self.dns_cache}
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('HTTPConnectionPool', (_TimedHTTPConnectionPool,), dict(
+                limits, ConnectionCls=type('HTTPConnection', (_TimedHTTPConnection,), dns))),
+            'https': type('HTTPSConnectionPool', (_TimedHTTPSConnectionPool,), dict(
+                limits, ConnectionCls=type('HTTPSConnection', (_TimedHTTPSConnection,), dns))),
+        }
+
+    def __setstate__(self, state):
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self.dns_cache = None
+        super().__setstate__(state)
+
+
+class Http2Response:
+    """把httpx的流式响应包装成异步引擎使用的aiohttp响应接口"""
+    def __init__(self, response):
+        self._response = response
+        self.status = response.status_code
+        self.headers = response.headers
+        self.http_version = response.http_version
+        self.content = self  # 与aiohttp一致：response.content.iter_chunked(n)
+
+    async def read(self):
+        return await self._response.aread()
+
+    async def text(self, encoding='utf-8', errors='strict'):
+        return (await self.read()).decode(encoding, errors)
+
+    def iter_chunked(self, size):
+        return self._response.aiter_bytes(size)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            self._response.raise_for_status()
+
+    async def aclose(self):
+        await self._response.aclose()
@@ -0,0 +1,422 @@
+"""
+页面内容分析：SimHash近似重复检测、链接图与PageRank、聚焦爬取的主题相关度
+"""
+import os
+import sys
+import re
+from urllib.parse import urlparse, unquote
+import time
+import json
+import math
+import heapq
+import hashlib
+import sqlite3
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np  # 链接图的向量化合并和PageRank（需安装：pip install numpy）
+except ImportError:
+    np = None
+
+
+# 中日韩文字（假名、汉字、谚文）的字符范围，SimHash和相关度计算的分词共用
+_CJK_CHARS = '\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af'
+_CJK_CHAR = re.compile(f'[{_CJK_CHARS}]')
+# SimHash分词：中日韩字符逐字成词，其余按字母数字串
+_SIMHASH_TOKEN = re.compile(f'[{_CJK_CHARS}]|[^\\W_]+')
+# 每一位在各字节取值下是否为1：_BYTE_BITS[值][位]
+_BYTE_BITS = [[value >> bit & 1 for bit in range(8)] for value in range(256)]
+
+
+def simhash(text, shingle_size=3):
+    """
+    计算文本的64位SimHash指纹：按shingle_size个词的滑动窗口取片段，每个片段哈希到64位后按位投票
+    内容相近的文本指纹的汉明距离小；没有可用词时返回None
+    """
+    tokens = _SIMHASH_TOKEN.findall(text.lower())
+    if not tokens:
+        return None
+    if len(tokens) < shingle_size:
+        shingles = [' '.join(tokens)]
+    else:
+        shingles = [' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+    # 所有片段哈希连成一个字节串，按字节位置分别计数，避免逐片段逐位循环
+    blob = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles)
+    half = len(shingles) / 2
+    fingerprint = 0
+    for position in range(8):
+        ones = [0] * 8
+        for value, count in Counter(blob[position::8]).items():
+            for bit, is_set in enumerate(_BYTE_BITS[value]):
+                if is_set:
+                    ones[bit] += count
+        for bit in range(8):
+            if ones[bit] > half:
+                fingerprint |= 1 << (8 * (7 - position) + bit)
+    return fingerprint
+
+
+class SimHashIndex:
+    """
+    SimHash指纹索引，查找汉明距离不超过max_distance的已有页面
+    按鸽巢原理把64位指纹分成max_distance+1段：距离不超过max_distance的两个指纹至少有一段完全相同，
+    查询时只比较同段相同的候选；path非None时持久化到SQLite（resume时恢复）
+    """
+    def __init__(self, max_distance=3, path=None, commit_every=100):
+        """
+        :param max_distance: 视为近似重复的最大汉明距离（位数）
+        :param path: SQLite数据库路径，None表示只保存在内存中
+        :param commit_every: 累计多少次写入后提交一次
+        """
+        self.max_distance = max_distance
+        self._blocks = self._split_blocks(max_distance + 1)
+        self._buckets = [{} for _ in self._blocks]  # 每段一个字典：段值 -> URL列表
+        self._fingerprints = {}  # URL -> 指纹
+        self.commit_every = commit_every
+        self._pending_writes = 0
+        self.conn = None
+        if path is not None:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS simhash (url TEXT PRIMARY KEY, fingerprint INTEGER NOT NULL)')
+            self.conn.commit()
+            for url, fingerprint in self.conn.execute('SELECT url, fingerprint FROM simhash'):
+                self._insert(url, fingerprint & 0xFFFFFFFFFFFFFFFF)
+
+    @staticmethod
+    def _split_blocks(count):
+        """把64位平均分成count段，返回每段的 (右移位数, 掩码)"""
+        blocks = []
+        start = 0
+        for index in range(count):
+            width = (64 - start) // (count - index)
+            blocks.append((start, (1 << width) - 1))
+            start += width
+        return blocks
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def find(self, fingerprint, exclude=None):
+        """返回与指纹距离不超过max_distance的一个已有URL（不含exclude），没有时返回None"""
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            for url in buckets.get(fingerprint >> shift & mask, ()):
+                if url != exclude and bin(self._fingerprints[url] ^ fingerprint).count('1') <= self.max_distance:
+                    return url
+        return None
+
+    def add(self, url, fingerprint):
+        """记录URL的指纹（已有时替换）"""
+        self._remove(url)
+        self._insert(url, fingerprint)
+        if self.conn is not None:
+            # SQLite的INTEGER是有符号64位
+            signed = fingerprint - (1 << 64) if fingerprint >> 63 else fingerprint
+            self.conn.execute('INSERT OR REPLACE INTO simhash VALUES (?, ?)', (url, signed))
+            self._pending_writes += 1
+            if self._pending_writes >= self.commit_every:
+                self.conn.commit()
+                self._pending_writes = 0
+
+    def _insert(self, url, fingerprint):
+        self._fingerprints[url] = fingerprint
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            buckets.setdefault(fingerprint >> shift & mask, []).append(url)
+
+    def _remove(self, url):
+        fingerprint = self._fingerprints.pop(url, None)
+        if fingerprint is None:
+            return
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            key = fingerprint >> shift & mask
+            buckets[key].remove(url)
+            if not buckets[key]:
+                del buckets[key]
+
+    def close(self):
+        """提交并关闭数据库"""
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+
+class LinkGraph:
+    """
+    内存中的链接图：URL映射为连续的整数ID，边按CSR压缩存储（节点i的出链为 targets[offsets[i]:offsets[i+1]]）
+    新加入的出链先追加到尾部缓冲，compact()时合并进CSR；同一页面再次加入时替换它之前的出链
+    安装了numpy时合并和PageRank按数组运算向量化，否则用纯Python计算
+    """
+    # 快照目录中的文件
+    SNAPSHOT_FILES = ('urls.txt', 'offsets.bin', 'targets.bin')
+
+    def __init__(self):
+        self.urls = []  # ID -> URL
+        self.ids = {}  # URL -> ID
+        self.offsets = array('Q', [0])  # 只覆盖上次合并时已有的节点
+        self.targets = array('I')
+        self._tail_sources = array('I')
+        self._tail_targets = array('I')
+        self._tail_start = {}  # 尾部缓冲中的页面 -> 其最近一批出链的起始位置
+
+    def node_id(self, url):
+        """URL的ID，新URL分配下一个ID"""
+        node = self.ids.get(url)
+        if node is None:
+            node = self.ids[url] = len(self.urls)
+            self.urls.append(url)
+        return node
+
+    def add_page(self, url, links):
+        """记录页面的出链（重复链接和指向自身的链接不计）"""
+        source = self.node_id(url)
+        ids = self.ids
+        targets = set()
+        for link in links:
+            node = ids.get(link)
+            targets.add(self.node_id(link) if node is None else node)
+        targets.discard(source)
+        self._tail_start[source] = len(self._tail_sources)
+        self._tail_sources.extend([source] * len(targets))
+        self._tail_targets.extend(sorted(targets))
+
+    def __len__(self):
+        return len(self.urls)
+
+    def edge_count(self):
+        """边数（先合并尾部缓冲）"""
+        self.compact()
+        return len(self.targets)
+
+    def compact(self):
+        """把尾部缓冲合并进CSR数组"""
+        if not self._tail_start and len(self.offsets) == len(self.urls) + 1:
+            return
+        if np is not None:
+            self._compact_numpy()
+        else:
+            self._compact_python()
+        self._tail_sources = array('I')
+        self._tail_targets = array('I')
+        self._tail_start = {}
+
+    def _compact_numpy(self):
+        n = len(self.urls)
+        counts = np.zeros(n, dtype=np.int64)
+        counts[:len(self.offsets) - 1] = np.diff(np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64))
+        sources = np.repeat(np.arange(n, dtype=np.uint32), counts)
+        targets = np.frombuffer(self.targets, dtype=np.uint32)
+        tail_sources = np.frombuffer(self._tail_sources, dtype=np.uint32)
+        tail_targets = np.frombuffer(self._tail_targets, dtype=np.uint32)
+        # 重新加入的页面丢弃CSR中的旧出链，尾部缓冲中只保留最近一批
+        replaced = np.zeros(n, dtype=bool)
+        starts = np.zeros(n, dtype=np.int64)
+        replaced[list(self._tail_start)] = True
+        starts[list(self._tail_start)] = list(self._tail_start.values())
+        keep = ~replaced[sources]
+        keep_tail = np.arange(len(tail_sources)) >= starts[tail_sources]
+        sources = np.concatenate((sources[keep], tail_sources[keep_tail]))
+        targets = np.concatenate((targets[keep], tail_targets[keep_tail]))
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(n + 1, dtype=np.uint64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        self.offsets = array('Q', offsets.tobytes())
+        self.targets = array('I', targets[order].astype(np.uint32).tobytes())
+
+    def _compact_python(self):
+        adjacency = [self.targets[self.offsets[node]:self.offsets[node + 1]]
+                     if node + 1 < len(self.offsets) and node not in self._tail_start else ()
+                     for node in range(len(self.urls))]
+        batches = {}
+        for index, (source, target) in enumerate(zip(self._tail_sources, self._tail_targets)):
+            if index >= self._tail_start[source]:
+                batches.setdefault(source, []).append(target)
+        self.offsets = array('Q', [0])
+        self.targets = array('I')
+        for node, targets in enumerate(adjacency):
+            self.targets.extend(batches.get(node, targets))
+            self.offsets.append(len(self.targets))
+
+    def in_degree(self):
+        """每个节点的入链数（按ID）"""
+        self.compact()
+        if np is not None:
+            counts = np.bincount(np.frombuffer(self.targets, dtype=np.uint32), minlength=len(self.urls))
+            return array('I', counts.astype(np.uint32).tobytes())
+        counts = array('I', bytes(4 * len(self.urls)))
+        for target in self.targets:
+            counts[target] += 1
+        return counts
+
+    def pagerank(self, damping=0.85, iterations=50, tolerance=1e-6):
+        """
+        PageRank（按ID，总和为1）：没有出链的节点（含未抓取的页面）把分数均分给所有节点
+        :param tolerance: 两次迭代的L1差小于该值时停止
+        """
+        self.compact()
+        n = len(self.urls)
+        if not n:
+            return array('d')
+        if np is None:
+            return self._pagerank_python(damping, iterations, tolerance)
+        out_degree = np.diff(np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64))
+        sources = np.repeat(np.arange(n), out_degree)
+        targets = np.frombuffer(self.targets, dtype=np.uint32)
+        share = np.zeros(n)
+        np.divide(1.0, out_degree, out=share, where=out_degree > 0)
+        dangling = out_degree == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(iterations):
+            spread = np.bincount(targets, weights=(rank * share)[sources], minlength=n)
+            updated = damping * (spread + rank[dangling].sum() / n) + (1.0 - damping) / n
+            converged = np.abs(updated - rank).sum() < tolerance
+            rank = updated
+            if converged:
+                break
+        return array('d', rank.tobytes())
+
+    def _pagerank_python(self, damping, iterations, tolerance):
+        n = len(self.urls)
+        rank = [1.0 / n] * n
+        for _ in range(iterations):
+            updated = [0.0] * n
+            dangling = 0.0
+            for node in range(n):
+                start, end = self.offsets[node], self.offsets[node + 1]
+                if start == end:
+                    dangling += rank[node]
+                    continue
+                share = rank[node] / (end - start)
+                for target in self.targets[start:end]:
+                    updated[target] += share
+            base = damping * dangling / n + (1.0 - damping) / n
+            updated = [damping * value + base for value in updated]
+            converged = sum(abs(a - b) for a, b in zip(updated, rank)) < tolerance
+            rank = updated
+            if converged:
+                break
+        return array('d', rank)
+
+    def top(self, scores, count=10):
+        """分数最高的count个URL：[(URL, 分数)]"""
+        return [(self.urls[node], scores[node])
+                for node in heapq.nlargest(count, range(len(scores)), key=scores.__getitem__)]
+
+    def snapshot(self, path):
+        """
+        把合并后的图写入目录path：urls.txt（每行一个URL，行号即ID）、offsets.bin和targets.bin（本机字节序的数组）
+        各文件先写临时文件再替换，meta.json最后写入
+        """
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        for name, write in zip(self.SNAPSHOT_FILES, (
+                lambda f: f.write('\n'.join(self.urls).encode('utf-8')),
+                self.offsets.tofile,
+                self.targets.tofile)):
+            temp_path = os.path.join(path, name + '.tmp')
+            with open(temp_path, 'wb') as f:
+                write(f)
+            os.replace(temp_path, os.path.join(path, name))
+        meta = {'nodes': len(self.urls), 'edges': len(self.targets), 'byteorder': sys.byteorder,
+                'saved_at': time.time()}
+        with open(os.path.join(path, 'meta.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
+
+    @classmethod
+    def load(cls, path):
+        """读取snapshot写入的目录，快照不完整或与本机字节序不同时抛出ValueError"""
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['byteorder'] != sys.byteorder:
+            raise ValueError(f"链接图快照的字节序为 {meta['byteorder']}")
+        graph = cls()
+        with open(os.path.join(path, 'urls.txt'), 'rb') as f:
+            data = f.read().decode('utf-8')
+        graph.urls = data.split('\n') if data else []
+        graph.ids = {url: node for node, url in enumerate(graph.urls)}
+        graph.offsets = array('Q')
+        graph.targets = array('I')
+        with open(os.path.join(path, 'offsets.bin'), 'rb') as f:
+            graph.offsets.fromfile(f, meta['nodes'] + 1)
+        with open(os.path.join(path, 'targets.bin'), 'rb') as f:
+            graph.targets.fromfile(f, meta['edges'])
+        if len(graph.urls) != meta['nodes']:
+            raise ValueError(f"链接图快照不完整: {path}")
+        return graph
+
+
+# 相关度计算的词项：中日韩文字连续段（按相邻两字切分），其他文字按单词
+_TOPIC_TOKEN = re.compile(f'[{_CJK_CHARS}]+|[^\\W_{_CJK_CHARS}]+')
+# 不参与相关度计算的常见英文虚词
+_STOPWORDS = frozenset('''a an and are as at be but by for from has have in is it its of on or that the their
+    this to was were will with you your www http https html htm php aspx index'''.split())
+
+
+def topic_terms(text):
+    """把文本切分为相关度计算的词项（小写，去掉虚词和单个字母或数字）"""
+    terms = []
+    for token in _TOPIC_TOKEN.findall(text.lower()):
+        if _CJK_CHAR.match(token):
+            terms.extend(token[i:i + 2] for i in range(max(1, len(token) - 1)))
+        elif len(token) > 1 and token not in _STOPWORDS:
+            terms.append(token)
+    return terms
+
+
+class FocusTopic:
+    """
+    聚焦爬取的主题：由关键词和/或少量示例文本得到带权重的词项向量，
+    文本的相关度为其词频向量（按1+log压缩）与主题向量的余弦相似度（0~1）
+    """
+    def __init__(self, keywords=(), examples=(), max_terms=200):
+        """
+        :param keywords: 关键词列表（也可以是空格分隔的字符串），每个词项权重为1
+        :param examples: 示例文本列表，取在多篇示例中都频繁出现的max_terms个词项，最大权重为1
+        :param max_terms: 从示例文本中最多取多少个词项
+        """
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        weights = Counter()
+        for keyword in keywords:
+            for term in topic_terms(keyword):
+                weights[term] = 1.0
+        examples = [text for text in examples if text]
+        if examples:
+            frequency, documents = Counter(), Counter()
+            for text in examples:
+                terms = topic_terms(text)
+                frequency.update(terms)
+                documents.update(set(terms))
+            scored = {term: (1 + math.log(count)) * documents[term] / len(examples)
+                      for term, count in frequency.items()}
+            top = heapq.nlargest(max_terms, scored.items(), key=lambda item: item[1])
+            if top:
+                highest = top[0][1]
+                for term, score in top:
+                    weights[term] = max(weights[term], score / highest)
+        if not weights:
+            raise ValueError("聚焦爬取需要关键词或示例文本")
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        self.weights = {term: weight / norm for term, weight in weights.items()}
+
+    def relevance(self, text):
+        """文本与主题的相关度（0~1）"""
+        counts = Counter(topic_terms(text)) if text else None
+        if not counts:
+            return 0.0
+        dot = norm = 0.0
+        weights = self.weights
+        for term, count in counts.items():
+            value = 1 + math.log(count)
+            norm += value * value
+            if term in weights:
+                dot += value * weights[term]
+        return dot / math.sqrt(norm)
+
+    def url_relevance(self, url):
+        """URL路径和查询中的词与主题的相关度（先做百分号解码）"""
+        parsed = urlparse(url)
+        return self.relevance(unquote(f"{parsed.path} {parsed.query}"))
@@ -0,0 +1,261 @@
+"""
+带正负缓存和后台预解析的DNS缓存
+"""
+import time
+import socket
+import ipaddress
+import threading
+import asyncio
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    import aiohttp  # 异步引擎支持（需安装：pip install aiohttp）
+except ImportError:
+    aiohttp = None
+
+
+def system_resolver(host):
+    """默认解析器：系统getaddrinfo，返回去重后的IP地址列表"""
+    addresses = []
+    for _, _, _, _, sockaddr in socket.getaddrinfo(host, None, type=socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class DnsCache:
+    """
+    爬取期间的DNS缓存：成功结果缓存ttl秒，主机名不存在的失败缓存negative_ttl秒，临时失败（如EAI_AGAIN）不缓存
+    同一主机同时只解析一次（其余调用等待同一结果）；prefetch()在后台线程提前解析，
+    链接入队时调用，抓取时通常已能命中（线程安全）
+    """
+    # 表示主机名不存在的错误码，只有这些失败会被缓存
+    NEGATIVE_ERRORS = tuple(code for code in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', None))
+                            if code is not None)
+
+    def __init__(self, resolver=None, ttl=300, negative_ttl=60, max_entries=100000, workers=8, on_resolve=None):
+        """
+        :param resolver: 解析函数，接收主机名，返回IP地址列表或 (IP地址列表, TTL秒数)；
+            失败时抛出OSError（如socket.gaierror）；默认为系统getaddrinfo
+        :param ttl: 成功结果的缓存秒数（解析器未给出TTL时）
+        :param negative_ttl: 主机名不存在（NEGATIVE_ERRORS）的缓存秒数
+        :param max_entries: 最多缓存的主机数，超出时先清理过期条目，再淘汰最早的
+        :param workers: 后台预解析的线程数
+        :param on_resolve: 每次实际解析后的回调 on_resolve(主机, 耗时秒数, 是否成功)
+        """
+        self.resolver = resolver or system_resolver
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.workers = workers
+        self.on_resolve = on_resolve
+        self._lock = threading.Lock()
+        self._executor = None
+        self.clear()
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries = {}  # 主机 -> (过期时间, IP地址元组或异常)
+            self._inflight = {}  # 主机 -> 解析中的Future
+            self._stats = Counter()
+
+    @staticmethod
+    def _is_literal(host):
+        try:
+            ipaddress.ip_address(host)
+            return True
+        except ValueError:
+            return False
+
+    def _lookup(self, host, prefetch=False):
+        """
+        查找缓存或正在进行的解析（调用方持有锁）
+        :return: (Future, 是否需要由调用方发起解析)
+        """
+        entry = self._entries.get(host)
+        if entry is not None and entry[0] > time.monotonic():
+            if not prefetch:
+                self._stats['negative_hits' if isinstance(entry[1], Exception) else 'hits'] += 1
+            future = Future()
+            if isinstance(entry[1], Exception):
+                future.set_exception(socket.gaierror(*entry[1].args))
+            else:
+                future.set_result(entry[1])
+            return future, False
+        future = self._inflight.get(host)
+        if future is not None:
+            if not prefetch:
+                self._stats['joins'] += 1
+            return future, False
+        self._stats['prefetches' if prefetch else 'misses'] += 1
+        future = self._inflight[host] = Future()
+        return future, True
+
+    def _run(self, host, future):
+        """执行解析，写入缓存并完成future"""
+        started = time.perf_counter()
+        ttl = self.negative_ttl
+        try:
+            result = self.resolver(host)
+            if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], (int, float)):
+                result, ttl = result
+            else:
+                ttl = self.ttl
+            result = tuple(result)
+            if not result:
+                raise socket.gaierror(socket.EAI_NONAME, f"没有地址: {host}")
+        except OSError as e:
+            result = e
+        except BaseException as e:
+            # 解析器自身的错误不缓存
+            with self._lock:
+                self._inflight.pop(host, None)
+            future.set_exception(e)
+            return
+        seconds = time.perf_counter() - started
+        failed = isinstance(result, Exception)
+        with self._lock:
+            self._inflight.pop(host, None)
+            if not failed or self._is_negative(result):
+                if len(self._entries) >= self.max_entries and host not in self._entries:
+                    self._evict()
+                self._entries[host] = (time.monotonic() + ttl, result)
+            else:
+                # 临时失败不缓存，也不覆盖之前成功的结果
+                self._stats['transient_failures'] += 1
+            self._stats['resolutions'] += 1
+            self._stats['failures'] += failed
+            self._stats['resolve_seconds'] += seconds
+            self._stats['resolve_max'] = max(self._stats['resolve_max'], seconds)
+        if self.on_resolve is not None:
+            self.on_resolve(host, seconds, not failed)
+        if failed:
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+    def _is_negative(self, error):
+        """解析失败是否表示主机名不存在（可以缓存）"""
+        return isinstance(error, socket.gaierror) and error.errno in self.NEGATIVE_ERRORS
+
+    def forget(self, host):
+        """删除主机的失败缓存（请求重试前调用，让重试重新解析），成功的结果保留"""
+        if not host:
+            return
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is not None and isinstance(entry[1], Exception):
+                del self._entries[host]
+
+    def _evict(self):
+        """缓存已满：清理过期条目，仍满时淘汰最早加入的四分之一（调用方持有锁）"""
+        now = time.monotonic()
+        for host in [host for host, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[host]
+        if len(self._entries) >= self.max_entries:
+            for host in list(self._entries)[:max(1, self.max_entries // 4)]:
+                del self._entries[host]
+
+    def resolve(self, host):
+        """
+        解析主机名（阻塞），返回IP地址元组；解析失败抛出socket.gaierror
+        未命中时在当前线程解析，IP地址直接返回
+        """
+        if self._is_literal(host):
+            return (host,)
+        started = time.perf_counter()
+        with self._lock:
+            future, owner = self._lookup(host)
+        if owner:
+            self._run(host, future)
+        try:
+            return future.result()
+        finally:
+            self._record_wait(time.perf_counter() - started)
+
+    async def resolve_async(self, host):
+        """resolve()的异步版本，未命中时在后台线程解析，不阻塞事件循环"""
+        if self._is_literal(host):
+            return (host,)
+        started = time.perf_counter()
+        with self._lock:
+            future, owner = self._lookup(host)
+        if owner:
+            self._pool().submit(self._run, host, future)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self._record_wait(time.perf_counter() - started)
+
+    def prefetch(self, host):
+        """在后台线程提前解析主机名（已缓存或正在解析时不做任何事）"""
+        if not host or self._is_literal(host):
+            return
+        with self._lock:
+            future, owner = self._lookup(host, prefetch=True)
+        if owner:
+            self._pool().submit(self._run, host, future)
+
+    def _record_wait(self, seconds):
+        with self._lock:
+            self._stats['lookups'] += 1
+            self._stats['wait_seconds'] += seconds
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dns')
+            return self._executor
+
+    def stats(self):
+        """
+        统计：lookups（抓取时的查询数）、hits/negative_hits/joins（命中缓存、命中失败缓存、等到进行中的解析）、
+        misses、prefetches、resolutions、failures（其中不缓存的transient_failures）、hit_rate，
+        以及解析耗时（平均、最大）和查询的平均等待毫秒数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_hosts'] = len(self._entries)
+        lookups = stats.get('lookups', 0)
+        resolutions = stats.get('resolutions', 0)
+        hits = stats.get('hits', 0) + stats.get('negative_hits', 0) + stats.get('joins', 0)
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        stats['resolve_ms_avg'] = 1000 * stats.pop('resolve_seconds', 0.0) / resolutions if resolutions else 0.0
+        stats['resolve_ms_max'] = 1000 * stats.pop('resolve_max', 0.0)
+        stats['wait_ms_avg'] = 1000 * stats.pop('wait_seconds', 0.0) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """停止后台解析（未开始的预解析取消）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            inflight, self._inflight = self._inflight, {}
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for future in inflight.values():
+            future.cancel()
+
+
+if aiohttp is not None:
+    class DnsCacheResolver(aiohttp.abc.AbstractResolver):
+        """让aiohttp通过DnsCache解析主机名"""
+        def __init__(self, cache):
+            self.cache = cache
+
+        async def resolve(self, host, port=0, family=socket.AF_INET):
+            addresses = await self.cache.resolve_async(host)
+            results = []
+            for address in addresses:
+                address_family = socket.AF_INET6 if ':' in address else socket.AF_INET
+                if family not in (socket.AF_UNSPEC, address_family):
+                    continue
+                results.append({'hostname': host, 'host': address, 'port': port, 'family': address_family,
+                                'proto': 0, 'flags': socket.AI_NUMERICHOST | socket.AI_NUMERICSERV})
+            if not results:
+                raise OSError(socket.EAI_NONAME, f"{host} 没有 {socket.AddressFamily(family).name} 地址")
+            return results
+
+        async def close(self):
+            pass
@@ -0,0 +1,185 @@
+"""
+爬取指标的记录、钩子和Prometheus导出
+"""
+import time
+import json
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CrawlMetrics:
+    """
+    爬取指标：各阶段耗时直方图、按主机和状态码的响应计数、队列深度
+    每次记录同时以字典事件通知已注册的钩子；可渲染为Prometheus文本格式（线程安全）
+    """
+    # 耗时阶段
+    STAGES = ('dns', 'connect', 'ttfb', 'download', 'decode', 'parse', 'save')
+    # 直方图桶的上界（秒）
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, hooks=None):
+        """
+        :param hooks: 钩子列表，每个钩子是接收事件字典的可调用对象
+        """
+        self._lock = threading.Lock()
+        self._hooks = list(hooks or [])
+        self._stages = {}  # 阶段 -> [各桶计数..., 总数, 总耗时]
+        self._responses = {}  # (主机, 状态码) -> 次数
+        self._counters = {}  # 名称 -> 次数
+        self._gauges = {}  # 队列名 -> 返回当前深度的函数
+
+    def add_hook(self, hook):
+        """注册钩子：hook(event)，event为 {'type': 'timing'|'response'|'count', ...}"""
+        self._hooks.append(hook)
+
+    def observe(self, stage, seconds, url=None):
+        """记录一次阶段耗时"""
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = [0] * len(self.BUCKETS) + [0, 0.0]
+            for index, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    entry[index] += 1
+            entry[-2] += 1
+            entry[-1] += seconds
+        self._emit({'type': 'timing', 'stage': stage, 'seconds': seconds, 'url': url})
+
+    def count_response(self, host, status):
+        """记录一个响应的状态码"""
+        with self._lock:
+            key = (host, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+        self._emit({'type': 'response', 'host': host, 'status': status})
+
+    def increment(self, name, amount=1):
+        """增加一个通用计数器"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+        self._emit({'type': 'count', 'name': name, 'amount': amount})
+
+    def register_gauge(self, name, read):
+        """注册队列深度：read()返回当前值，在读取指标时调用"""
+        with self._lock:
+            self._gauges[name] = read
+
+    def unregister_gauges(self):
+        with self._lock:
+            self._gauges = {}
+
+    def gauges(self):
+        """当前各队列的深度"""
+        with self._lock:
+            readers = dict(self._gauges)
+        values = {}
+        for name, read in readers.items():
+            try:
+                values[name] = read()
+            except Exception:
+                continue
+        return values
+
+    def counters(self):
+        """通用计数器的当前值"""
+        with self._lock:
+            return dict(self._counters)
+
+    def stage_totals(self):
+        """各阶段的 (次数, 总耗时)"""
+        with self._lock:
+            return {stage: (entry[-2], entry[-1]) for stage, entry in self._stages.items()}
+
+    def render_prometheus(self):
+        """渲染为Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            stages = {stage: list(entry) for stage, entry in self._stages.items()}
+            responses = dict(self._responses)
+            counters = dict(self._counters)
+        
+        lines.append('# HELP crawler_stage_seconds 各阶段耗时（秒）')
+        lines.append('# TYPE crawler_stage_seconds histogram')
+        for stage, entry in sorted(stages.items()):
+            label = f'stage="{_escape_label(stage)}"'
+            for bound, count in zip(self.BUCKETS, entry):
+                lines.append(f'crawler_stage_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'crawler_stage_seconds_bucket{{{label},le="+Inf"}} {entry[-2]}')
+            lines.append(f'crawler_stage_seconds_sum{{{label}}} {entry[-1]}')
+            lines.append(f'crawler_stage_seconds_count{{{label}}} {entry[-2]}')
+        
+        lines.append('# HELP crawler_responses_total 按主机和状态码统计的响应数')
+        lines.append('# TYPE crawler_responses_total counter')
+        for (host, status), count in sorted(responses.items()):
+            lines.append(f'crawler_responses_total{{host="{_escape_label(host)}",status="{status}"}} {count}')
+        
+        for name, count in sorted(counters.items()):
+            lines.append(f'# TYPE crawler_{name}_total counter')
+            lines.append(f'crawler_{name}_total {count}')
+        
+        lines.append('# HELP crawler_queue_depth 队列深度')
+        lines.append('# TYPE crawler_queue_depth gauge')
+        for name, value in sorted(self.gauges().items()):
+            lines.append(f'crawler_queue_depth{{queue="{_escape_label(name)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def _emit(self, event):
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"指标钩子出错: {str(e)}")
+
+
+def _escape_label(value):
+    """Prometheus标签值转义"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class JsonLinesMetricsHook:
+    """把每个指标事件写成一行JSON（带时间戳），便于离线分析单个请求的各阶段耗时"""
+    def __init__(self, path):
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(dict(event, time=time.time()), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class MetricsServer:
+    """在后台线程提供 /metrics（Prometheus文本格式）的本地HTTP服务"""
+    def __init__(self, metrics, port=9108, host='127.0.0.1'):
+        """
+        :param metrics: CrawlMetrics实例
+        :param port: 监听端口（0表示随机端口）
+        :param host: 监听地址，默认只允许本机访问
+        """
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
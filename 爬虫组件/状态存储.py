@@ -0,0 +1,363 @@
+"""
+SQLite持久化：爬取检查点、HTTP条件请求缓存和增量重爬历史
+"""
+import time
+import math
+import heapq
+import sqlite3
+import zlib
+
+
+class CrawlStateStore:
+    """
+    爬取状态检查点（SQLite）：已入队URL、待爬队列（含深度）和主机统计（含已下载字节数）
+    写操作先缓存在内存中，按时间间隔或条数批量提交
+    """
+    def __init__(self, path, commit_interval=5.0, batch_size=1000):
+        """
+        :param path: SQLite数据库路径
+        :param commit_interval: 两次提交之间的最长间隔（秒）
+        :param batch_size: 缓存的写操作达到该条数时立即提交
+        """
+        self.path = path
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                score REAL NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0
+            )''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS host_stats (
+                host TEXT PRIMARY KEY,
+                requests INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0
+            )''')
+        # 旧版本创建的数据库没有bytes列
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(host_stats)')}
+        if 'bytes' not in columns:
+            self.conn.execute('ALTER TABLE host_stats ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0')
+        self.conn.commit()
+        self._enqueued = []
+        self._done = []
+        self._hosts = {}  # 主机 -> [请求数增量, 错误数增量, 字节数增量]
+        self._last_commit = time.monotonic()
+
+    def record_enqueued(self, url, depth, score=0.0):
+        """记录新入队的URL"""
+        self._enqueued.append((url, depth, score))
+        self.maybe_commit()
+
+    def record_done(self, url):
+        """记录已处理完的URL"""
+        self._done.append((url,))
+        self.maybe_commit()
+
+    def record_host(self, host, error=False):
+        """记录一次对主机的请求"""
+        counts = self._hosts.setdefault(host, [0, 0, 0])
+        counts[0] += 1
+        if error:
+            counts[1] += 1
+
+    def record_bytes(self, host, count):
+        """记录从主机下载的正文字节数（用于恢复后的字节预算）"""
+        self._hosts.setdefault(host, [0, 0, 0])[2] += count
+
+    def maybe_commit(self):
+        """缓存条数或距上次提交的时间达到阈值时提交"""
+        if (len(self._enqueued) + len(self._done) >= self.batch_size
+                or time.monotonic() - self._last_commit >= self.commit_interval):
+            self.flush()
+
+    def flush(self):
+        """把缓存的写操作提交到数据库"""
+        with self.conn:
+            # 先写入队再写完成，同一批中先入队后完成的URL也能正确标记
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO urls (url, depth, score) VALUES (?, ?, ?)', self._enqueued)
+            self.conn.executemany('UPDATE urls SET done = 1 WHERE url = ?', self._done)
+            self.conn.executemany(
+                'INSERT INTO host_stats (host, requests, errors, bytes) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(host) DO UPDATE SET requests = requests + excluded.requests, '
+                'errors = errors + excluded.errors, bytes = bytes + excluded.bytes',
+                [(host, *counts) for host, counts in self._hosts.items()])
+        self._enqueued = []
+        self._done = []
+        self._hosts = {}
+        self._last_commit = time.monotonic()
+
+    def iter_seen(self):
+        """所有已入队过的URL"""
+        for (url,) in self.conn.execute('SELECT url FROM urls'):
+            yield url
+
+    def iter_pending(self):
+        """尚未处理的URL，按入队顺序返回 (url, depth, score)"""
+        for row in self.conn.execute('SELECT url, depth, score FROM urls WHERE done = 0 ORDER BY rowid'):
+            yield row
+
+    def host_stats(self):
+        """主机统计 {主机: {'requests': 请求数, 'errors': 错误数}}"""
+        return {host: {'requests': requests, 'errors': errors}
+                for host, requests, errors in self.conn.execute('SELECT host, requests, errors FROM host_stats')}
+
+    def host_bytes(self):
+        """各主机已下载的正文字节数 {主机: 字节数}"""
+        return dict(self.conn.execute('SELECT host, bytes FROM host_stats WHERE bytes > 0'))
+
+    def reset(self):
+        """清空所有状态（开始新的爬取）"""
+        self._enqueued = []
+        self._done = []
+        self._hosts = {}
+        with self.conn:
+            self.conn.execute('DELETE FROM urls')
+            self.conn.execute('DELETE FROM host_stats')
+
+    def close(self):
+        """提交剩余写操作并关闭数据库"""
+        self.flush()
+        self.conn.close()
+
+
+class HttpValidatorCache:
+    """
+    HTTP验证器缓存（SQLite）：按URL保存ETag、Last-Modified和内容哈希
+    页面还保存压缩后的正文，304时可从缓存副本中继续提取链接；
+    saved记录当前内容已写入的输出（如 "files:links,text"），内容变化时清空
+    """
+    def __init__(self, path, commit_every=100):
+        """
+        :param path: SQLite数据库路径
+        :param commit_every: 累计多少次写入后提交一次
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                encoding TEXT,
+                body BLOB,
+                fetched_at REAL NOT NULL,
+                saved TEXT
+            )''')
+        # 旧版本创建的数据库没有saved列
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(validators)')}
+        if 'saved' not in columns:
+            self.conn.execute('ALTER TABLE validators ADD COLUMN saved TEXT')
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def get(self, url):
+        """返回URL的缓存条目（字典），没有时返回None"""
+        row = self.conn.execute(
+            'SELECT etag, last_modified, content_hash, encoding, body, saved FROM validators WHERE url = ?',
+            (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('etag', 'last_modified', 'content_hash', 'encoding', 'body', 'saved'), row))
+
+    @staticmethod
+    def conditional_headers(entry):
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def cached_text(entry):
+        """解压并解码缓存的页面正文"""
+        return zlib.decompress(entry['body']).decode(entry['encoding'] or 'utf-8', errors='replace')
+
+    def store(self, url, headers, content_hash, body=None, encoding=None, compressed=False):
+        """
+        保存响应的验证器（内容哈希不变时保留saved记录）
+        :param headers: 响应头（大小写不敏感的映射）
+        :param body: 页面正文字节（图片等不需要缓存正文的资源传None）
+        :param compressed: body是否已经过zlib压缩（流式抓取时边下载边压缩）
+        """
+        if body is not None and not compressed:
+            body = zlib.compress(body)
+        self.conn.execute(
+            '''INSERT INTO validators (url, etag, last_modified, content_hash, encoding, body, fetched_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(url) DO UPDATE SET
+                   etag = excluded.etag,
+                   last_modified = excluded.last_modified,
+                   saved = CASE WHEN content_hash = excluded.content_hash THEN saved END,
+                   content_hash = excluded.content_hash,
+                   encoding = excluded.encoding,
+                   body = excluded.body,
+                   fetched_at = excluded.fetched_at''',
+            (url, headers.get('ETag'), headers.get('Last-Modified'), content_hash, encoding,
+             body, time.time()))
+        self._count_write()
+
+    def mark_saved(self, url, saved):
+        """记录URL当前内容已写入的输出"""
+        self.conn.execute('UPDATE validators SET saved = ? WHERE url = ?', (saved, url))
+        self._count_write()
+
+    def _count_write(self):
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.conn.commit()
+            self._pending_writes = 0
+
+    def close(self):
+        """提交并关闭数据库"""
+        self.conn.commit()
+        self.conn.close()
+
+
+class RecrawlHistory:
+    """
+    增量重爬的页面变化历史（SQLite）：每个URL的深度、首次和最近抓取时间、最近变化时间、复查次数和其中发现变化的次数
+    把页面变化看作泊松过程估计变化率，每次爬取选出最可能已经变化的页面重新抓取
+    复查失败也更新最近抓取时间（避免失败的页面变化概率一直上升）；404/410或连续失败过多的页面从历史中删除
+    """
+    # 表示页面已不存在的状态码
+    GONE_STATUS = (404, 410)
+
+    def __init__(self, path, commit_every=100, default_interval=86400.0, max_interval=30 * 86400.0,
+                 max_failures=3):
+        """
+        :param path: SQLite数据库路径
+        :param commit_every: 累计多少次写入后提交一次
+        :param default_interval: 还没有复查过的页面假定的平均变化间隔（秒）
+        :param max_interval: 估计的平均变化间隔上限（秒），从未变化的页面也大约按这个周期重新抓取
+        :param max_failures: 连续复查失败达到该次数的页面从历史中删除
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self.default_interval = default_interval
+        self.max_interval = max_interval
+        self.max_failures = max_failures
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                first_fetched REAL NOT NULL,
+                last_fetched REAL NOT NULL,
+                last_changed REAL NOT NULL,
+                checks INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0
+            )''')
+        # 旧版本创建的数据库没有failures列
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(pages)')}
+        if 'failures' not in columns:
+            self.conn.execute('ALTER TABLE pages ADD COLUMN failures INTEGER NOT NULL DEFAULT 0')
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def known(self, url):
+        """URL是否抓取过"""
+        return self.conn.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone() is not None
+
+    def record(self, url, depth, changed, now=None):
+        """
+        记录一次成功抓取；第一次抓取只建立记录，之后每次计为一次复查
+        :param changed: 内容是否与上次抓取时不同
+        :return: 是否为复查（之前抓取过）
+        """
+        now = time.time() if now is None else now
+        revisit = self.known(url)
+        self.conn.execute(
+            '''INSERT INTO pages (url, depth, first_fetched, last_fetched, last_changed) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(url) DO UPDATE SET
+                   depth = MIN(depth, excluded.depth),
+                   last_fetched = excluded.last_fetched,
+                   last_changed = CASE WHEN ? THEN excluded.last_changed ELSE last_changed END,
+                   checks = checks + 1,
+                   changes = changes + ?,
+                   failures = 0''',
+            (url, depth, now, now, now, bool(changed), int(bool(changed))))
+        self._count_write()
+        return revisit
+
+    def record_failure(self, url, status=None, now=None):
+        """
+        记录一次失败的复查：计为一次没有发现变化的复查并更新最近抓取时间；
+        页面已不存在（GONE_STATUS）或连续失败达到max_failures次时删除记录
+        :param status: 响应状态码，网络错误时为None
+        :return: 'gone'（已删除）、'failed'（已记录）；URL不在历史中时返回None
+        """
+        now = time.time() if now is None else now
+        row = self.conn.execute('SELECT failures FROM pages WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        if status in self.GONE_STATUS or row[0] + 1 >= self.max_failures:
+            self.conn.execute('DELETE FROM pages WHERE url = ?', (url,))
+            outcome = 'gone'
+        else:
+            self.conn.execute(
+                'UPDATE pages SET last_fetched = ?, checks = checks + 1, failures = failures + 1 WHERE url = ?',
+                (now, url))
+            outcome = 'failed'
+        self._count_write()
+        return outcome
+
+    def _count_write(self):
+        """累计写入次数，达到commit_every时提交"""
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.conn.commit()
+            self._pending_writes = 0
+
+    def change_rate(self, checks, changes, span):
+        """
+        估计每秒的变化率：按固定间隔复查checks次、其中changes次发现变化时，
+        用Cho和Garcia-Molina的估计 -ln((n - X + 0.5) / (n + 0.5)) / 平均间隔（修正了间隔内多次变化只能看到一次的偏差）
+        :param span: 首次到最近一次抓取的秒数
+        """
+        if checks == 0 or span <= 0:
+            rate = 1.0 / self.default_interval
+        else:
+            rate = -math.log((checks - changes + 0.5) / (checks + 0.5)) / (span / checks)
+        return max(rate, 1.0 / self.max_interval)
+
+    def plan(self, budget, now=None):
+        """
+        选出最多budget个最可能已经变化的页面（变化概率 1 - exp(-变化率 × 距上次抓取的秒数)）
+        :return: [(URL, 深度, 变化概率)]，概率从高到低
+        """
+        now = time.time() if now is None else now
+        self.conn.commit()
+        
+        def candidates():
+            for url, depth, first, last, checks, changes in self.conn.execute(
+                    'SELECT url, depth, first_fetched, last_fetched, checks, changes FROM pages'):
+                rate = self.change_rate(checks, changes, last - first)
+                yield 1.0 - math.exp(-rate * max(0.0, now - last)), url, depth
+        
+        return [(url, depth, probability)
+                for probability, url, depth in heapq.nlargest(budget, candidates())]
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def close(self):
+        """提交并关闭数据库"""
+        self.conn.commit()
+        self.conn.close()
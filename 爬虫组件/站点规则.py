@@ -0,0 +1,248 @@
+"""
+robots.txt规则匹配、按主机缓存，以及站点地图解析
+"""
+import re
+from urllib.parse import urlparse
+import time
+import sqlite3
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+
+
+class RobotsRules:
+    """
+    一个主机的robots.txt规则匹配器
+    无通配符的规则存入 前缀 -> 是否允许 的字典，按规则长度从长到短查找，查找次数只取决于不同长度的个数；
+    含 * 或 $ 的规则编译为正则。最长（最具体）的规则生效，长度相同时Allow优先（RFC 9309）
+    """
+    # 只解析robots.txt的前500 KiB（RFC 9309）
+    MAX_SIZE = 500 * 1024
+
+    def __init__(self, rules=(), crawl_delay=None, sitemaps=()):
+        """
+        :param rules: (是否允许, 路径模式) 列表
+        :param crawl_delay: Crawl-delay（秒），未设置为None
+        :param sitemaps: robots.txt中声明的站点地图URL
+        """
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        self._prefixes = {}  # 前缀 -> 是否允许
+        patterns = []
+        for allow, pattern in rules:
+            if '*' in pattern or pattern.endswith('$'):
+                patterns.append((len(pattern), allow, self._compile(pattern)))
+            else:
+                self._prefixes[pattern] = self._prefixes.get(pattern, False) or allow
+        self._lengths = sorted({len(prefix) for prefix in self._prefixes}, reverse=True)
+        self._patterns = sorted(patterns, key=lambda item: item[0], reverse=True)
+
+    @staticmethod
+    def _compile(pattern):
+        anchored = pattern.endswith('$')
+        if anchored:
+            pattern = pattern[:-1]
+        regex = '.*'.join(re.escape(part) for part in pattern.split('*'))
+        return re.compile(regex + ('$' if anchored else ''))
+
+    @classmethod
+    def parse(cls, text, user_agent=None):
+        """
+        解析robots.txt
+        :param user_agent: 爬虫的产品标识（如 'MyCrawler'），有匹配的组时使用该组，否则使用 * 组
+        """
+        groups = []  # [(用户代理列表, 规则列表, Crawl-delay)]
+        sitemaps = []
+        agents, rules, delay = [], [], None
+        in_rules = False
+        for line in text[:cls.MAX_SIZE].splitlines():
+            line = line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            key, value = key.strip().lower(), value.strip()
+            
+            if key == 'user-agent':
+                if in_rules:
+                    # 规则之后的User-agent开始新的组
+                    groups.append((agents, rules, delay))
+                    agents, rules, delay = [], [], None
+                    in_rules = False
+                agents.append(value.lower())
+            elif key in ('allow', 'disallow'):
+                in_rules = True
+                # 空的Disallow表示允许全部，不产生规则
+                if value:
+                    rules.append((key == 'allow', value))
+            elif key == 'crawl-delay':
+                in_rules = True
+                try:
+                    delay = float(value)
+                except ValueError:
+                    pass
+            elif key == 'sitemap':
+                sitemaps.append(value)
+        if agents:
+            groups.append((agents, rules, delay))
+        
+        token = user_agent.lower() if user_agent else None
+        selected = [group for group in groups if token and token in group[0]]
+        if not selected:
+            selected = [group for group in groups if '*' in group[0]]
+        # 同一用户代理的多个组合并
+        merged_rules = [rule for group in selected for rule in group[1]]
+        delays = [group[2] for group in selected if group[2] is not None]
+        return cls(merged_rules, max(delays) if delays else None, sitemaps)
+
+    def allowed_url(self, url):
+        """URL是否允许抓取"""
+        parsed = urlparse(url)
+        return self.allowed((parsed.path or '/') + (f"?{parsed.query}" if parsed.query else ''))
+
+    def allowed(self, path):
+        """路径（含查询串）是否允许抓取"""
+        if path == '/robots.txt':
+            return True
+        best_length, best_allow = -1, True
+        for length in self._lengths:
+            allow = self._prefixes.get(path[:length])
+            if allow is not None:
+                best_length, best_allow = length, allow
+                break
+        for length, allow, regex in self._patterns:
+            if length < best_length:
+                break
+            if regex.match(path) and (length > best_length or allow):
+                best_length, best_allow = length, allow
+        return best_allow
+
+
+class RobotsCache:
+    """
+    robots.txt缓存：内存中按源站（协议+主机）保存解析后的规则，并持久化原文到SQLite
+    2xx按内容解析；4xx（及重定向过多等）视为允许全部；5xx或无法访问视为禁止全部，并使用较短的有效期以便重试
+    """
+    def __init__(self, path=None, ttl=86400, error_ttl=600, user_agent=None):
+        """
+        :param path: SQLite数据库路径，None表示只在内存中缓存
+        :param ttl: 成功获取的robots.txt的有效期（秒）
+        :param error_ttl: 获取失败（5xx或网络错误）时结果的有效期（秒）
+        :param user_agent: 匹配robots.txt分组用的产品标识，None时只使用 * 组
+        """
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.user_agent = user_agent
+        self._entries = {}  # 源站 -> (规则, 过期时间)
+        self.conn = None
+        if path is not None:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS robots (
+                    origin TEXT PRIMARY KEY,
+                    status INTEGER,
+                    body TEXT,
+                    expires REAL NOT NULL
+                )''')
+            self.conn.commit()
+
+    @staticmethod
+    def origin(url):
+        """URL所属的源站（robots.txt按源站生效）"""
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+    @staticmethod
+    def robots_url(url):
+        return RobotsCache.origin(url) + '/robots.txt'
+
+    def get(self, url):
+        """返回URL所属源站未过期的规则，没有时返回None"""
+        origin = self.origin(url)
+        entry = self._entries.get(origin)
+        if entry is None and self.conn is not None:
+            row = self.conn.execute('SELECT status, body, expires FROM robots WHERE origin = ?',
+                                    (origin,)).fetchone()
+            if row is not None:
+                entry = (self._rules_for(row[0], row[1]), row[2])
+                self._entries[origin] = entry
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def allowed_cached(self, url):
+        """根据已缓存的规则判断：允许返回True，禁止返回False，规则未知时返回None"""
+        rules = self.get(url)
+        if rules is None:
+            return None
+        return rules.allowed_url(url)
+
+    def put(self, url, status, body):
+        """
+        保存一次robots.txt的获取结果并返回规则
+        :param status: HTTP状态码，网络错误时为None
+        :param body: robots.txt文本（非2xx时忽略）
+        """
+        origin = self.origin(url)
+        failed = status is None or status >= 500
+        expires = time.time() + (self.error_ttl if failed else self.ttl)
+        rules = self._rules_for(status, body)
+        self._entries[origin] = (rules, expires)
+        if self.conn is not None:
+            self.conn.execute('INSERT OR REPLACE INTO robots VALUES (?, ?, ?, ?)',
+                              (origin, status, body if status is not None and 200 <= status < 300 else None, expires))
+            self.conn.commit()
+        return rules
+
+    def _rules_for(self, status, body):
+        if status is not None and 200 <= status < 300:
+            return RobotsRules.parse(body or '', self.user_agent)
+        if status is not None and status < 500:
+            return RobotsRules()
+        return RobotsRules([(False, '/')])
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def iter_sitemap(stream):
+    """
+    流式解析sitemap或sitemap索引：处理完的元素立即清除，内存占用与文件大小无关
+    :param stream: 二进制文件对象（gzip压缩的需先解压）
+    :return: 生成 (类型, loc, lastmod)，类型为 'url' 或 'sitemap'，lastmod可能为None
+    """
+    context = ElementTree.iterparse(stream, events=('start', 'end'))
+    _, root = next(context)
+    for event, element in context:
+        if event != 'end':
+            continue
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag not in ('url', 'sitemap'):
+            continue
+        loc = lastmod = None
+        for child in element:
+            name = child.tag.rsplit('}', 1)[-1]
+            if name == 'loc':
+                loc = (child.text or '').strip()
+            elif name == 'lastmod':
+                lastmod = (child.text or '').strip() or None
+        if loc:
+            yield tag, loc, lastmod
+        root.clear()
+
+
+def parse_lastmod(value):
+    """把W3C日期时间（如 2024-05-01 或 2024-05-01T12:00:00+08:00）转换为时间戳，无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        if len(value) == 4:
+            value += '-01-01'
+        elif len(value) == 7:
+            value += '-01'
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
@@ -0,0 +1,274 @@
+"""
+URL规范化、爬虫陷阱检测和已见URL存储
+"""
+import sys
+import re
+from urllib.parse import urlparse, urlunparse, parse_qsl, quote_plus, unquote_plus
+import math
+import hashlib
+import fnmatch
+from array import array
+from collections import Counter
+
+
+# 各协议的默认端口，规范化时去掉
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+# 规范化时默认去掉的查询参数（广告跟踪和会话ID，不影响页面内容），fnmatch通配符，不区分大小写
+DEFAULT_STRIP_PARAMS = ('utm_*', 'gclid', 'fbclid', 'msclkid', 'yclid', '_ga', 'mc_cid', 'mc_eid',
+                        'sessionid', 'phpsessid', 'jsessionid', 'aspsessionid*', 'cfid', 'cftoken')
+
+
+def compile_strip_params(patterns):
+    """把查询参数规则（如 'utm_*'）编译为canonicalize_url使用的正则，没有规则时返回None"""
+    patterns = [pattern.lower() for pattern in patterns or ()]
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns), re.I)
+
+
+def canonicalize_url(url, strip_params=None):
+    """
+    URL规范化：协议和主机名小写、去掉默认端口和片段、查询参数排序（没有值的参数如 ?flag 保持原样）
+    同一资源的不同写法规范化后相同，用于去重；端口无效等无法解析的URL抛出ValueError
+    :param strip_params: compile_strip_params编译的规则，名称匹配的查询参数和路径参数（如 ;jsessionid=）被去掉
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # IPv6地址
+    netloc = host
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parsed.port}"
+    if parsed.username:
+        userinfo = parsed.username + (f":{parsed.password}" if parsed.password else '')
+        netloc = f"{userinfo}@{netloc}"
+    
+    # (参数名, 值)，没有等号的参数值为None，重新编码时也不加等号
+    pairs = []
+    for item in parsed.query.split('&'):
+        if item:
+            key, equals, value = item.partition('=')
+            pairs.append((unquote_plus(key), unquote_plus(value) if equals else None))
+    params = parsed.params
+    if strip_params is not None:
+        pairs = [(key, value) for key, value in pairs if not strip_params.fullmatch(key)]
+        if params:
+            params = ';'.join(item for item in params.split(';')
+                              if not strip_params.fullmatch(item.partition('=')[0]))
+    query = '&'.join(quote_plus(key) if value is None else f"{quote_plus(key)}={quote_plus(value)}"
+                     for key, value in sorted(pairs, key=lambda pair: (pair[0], pair[1] or '')))
+    return urlunparse((scheme, netloc, parsed.path or '/', params, query, ''))
+
+
+# 形如ID的路径段：UUID或含数字的长十六进制串（哈希、对象ID）
+_ID_SEGMENT = re.compile(r'[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}|(?=[a-f]*\d)[0-9a-f]{16,}', re.I)
+_DIGITS = re.compile(r'\d+')
+
+
+def url_pattern(url):
+    """
+    URL模板：路径中形如ID的段换成{id}、其余数字串换成{n}，查询只保留参数名（去重排序）
+    如 /calendar/2024/05?view=month&day=3 -> /calendar/{n}/{n}?day&view
+    """
+    parsed = urlparse(url)
+    path = '/'.join('{id}' if _ID_SEGMENT.fullmatch(segment) else _DIGITS.sub('{n}', segment)
+                    for segment in parsed.path.split('/'))
+    keys = sorted({key for key, _ in parse_qsl(parsed.query, keep_blank_values=True)})
+    return f"{parsed.netloc}{path}?{'&'.join(keys)}"
+
+
+class UrlPatternAnalyzer:
+    """
+    爬虫陷阱检测：按URL模板（见url_pattern）计数，同一模板接受的URL达到上限后不再接受
+    日历、无限翻页和查询参数组合生成的URL模板相同；路径过深、同一路径段重复过多（相对链接循环）
+    或URL过长的直接拒绝
+    """
+    def __init__(self, max_urls_per_pattern=1000, max_path_depth=20, max_segment_repeats=3, max_url_length=2048):
+        """
+        :param max_urls_per_pattern: 每个URL模板最多接受的URL数，None表示不限制
+        :param max_path_depth: 路径最多的段数
+        :param max_segment_repeats: 同一路径段最多出现的次数
+        :param max_url_length: URL最大长度（字符）
+        """
+        self.max_urls_per_pattern = max_urls_per_pattern
+        self.max_path_depth = max_path_depth
+        self.max_segment_repeats = max_segment_repeats
+        self.max_url_length = max_url_length
+        self.counts = {}  # 模板 -> 已接受的URL数
+
+    def admit(self, url):
+        """
+        检查并计数一个新URL
+        :return: 接受时返回None，否则返回原因：'length'、'depth'、'repeat'或'pattern'（模板已达上限）
+        """
+        if len(url) > self.max_url_length:
+            return 'length'
+        segments = [segment for segment in urlparse(url).path.split('/') if segment]
+        if len(segments) > self.max_path_depth:
+            return 'depth'
+        if segments and max(Counter(segments).values()) > self.max_segment_repeats:
+            return 'repeat'
+        pattern = url_pattern(url)
+        count = self.counts.get(pattern, 0)
+        if self.max_urls_per_pattern is not None and count >= self.max_urls_per_pattern:
+            return 'pattern'
+        self.counts[pattern] = count + 1
+        return None
+
+    def record(self, url):
+        """计入一个已接受过的URL（从检查点恢复时使用），不做检查"""
+        pattern = url_pattern(url)
+        self.counts[pattern] = self.counts.get(pattern, 0) + 1
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class ExactSeenStore:
+    """精确的已见URL集合（保存完整URL字符串）"""
+    name = 'exact'
+
+    def __init__(self):
+        self._urls = set()
+        self._string_bytes = 0
+
+    def add(self, url):
+        if url not in self._urls:
+            self._urls.add(url)
+            self._string_bytes += sys.getsizeof(url)
+
+    def __contains__(self, url):
+        return url in self._urls
+
+    def __len__(self):
+        return len(self._urls)
+
+    def memory_bytes(self):
+        """集合本身加上URL字符串占用的内存"""
+        return sys.getsizeof(self._urls) + self._string_bytes
+
+
+class FingerprintSeenStore:
+    """
+    64位指纹集合：URL哈希成64位整数，存放在array实现的开放寻址表中（线性探测）
+    每个URL约占16字节（负载因子0.5），误判概率约为 URL数 / 2^64
+    """
+    name = 'fingerprint'
+    MAX_LOAD = 0.5
+
+    def __init__(self, initial_capacity=1 << 12):
+        capacity = 1
+        while capacity < initial_capacity:
+            capacity <<= 1
+        self._table = array('Q', bytes(8 * capacity))  # 0表示空槽
+        self._mask = capacity - 1
+        self._count = 0
+
+    @staticmethod
+    def fingerprint(url):
+        """URL的64位指纹（0保留给空槽）"""
+        value = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+        return value or 1
+
+    def _slot(self, fingerprint):
+        """返回指纹所在的槽位，或应插入的空槽位"""
+        table, mask = self._table, self._mask
+        index = fingerprint & mask
+        while table[index] and table[index] != fingerprint:
+            index = (index + 1) & mask
+        return index
+
+    def add(self, url):
+        fingerprint = self.fingerprint(url)
+        index = self._slot(fingerprint)
+        if not self._table[index]:
+            self._table[index] = fingerprint
+            self._count += 1
+            if self._count > len(self._table) * self.MAX_LOAD:
+                self._grow()
+
+    def _grow(self):
+        """容量翻倍并重新插入所有指纹"""
+        old_table = self._table
+        self._table = array('Q', bytes(16 * len(old_table)))
+        self._mask = len(self._table) - 1
+        for fingerprint in old_table:
+            if fingerprint:
+                self._table[self._slot(fingerprint)] = fingerprint
+
+    def __contains__(self, url):
+        return bool(self._table[self._slot(self.fingerprint(url))])
+
+    def __len__(self):
+        return self._count
+
+    def memory_bytes(self):
+        return self._table.itemsize * len(self._table)
+
+
+class BloomSeenStore:
+    """
+    布隆过滤器：按目标误判率分配位数组，存满后追加一个容量翻倍、误判率减半的新过滤器
+    误判的URL会被当作已见而不抓取，内存远小于精确集合
+    """
+    name = 'bloom'
+
+    def __init__(self, capacity=1000000, fp_rate=0.001):
+        """
+        :param capacity: 第一个过滤器的设计容量
+        :param fp_rate: 目标误判率
+        """
+        self.fp_rate = fp_rate
+        self._filters = []  # [(位数组, 位数, 哈希函数个数, 容量, 已插入数)]
+        self._count = 0
+        self._add_filter(capacity, fp_rate / 2)
+
+    def _add_filter(self, capacity, fp_rate):
+        bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        self._filters.append([bytearray((bits + 7) // 8), bits, hashes, capacity, 0])
+
+    @staticmethod
+    def _positions(url, bits, hashes):
+        """双重哈希生成k个位位置"""
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % bits for i in range(hashes)]
+
+    def _in_filter(self, url, bloom):
+        bitmap, bits, hashes = bloom[0], bloom[1], bloom[2]
+        return all(bitmap[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url, bits, hashes))
+
+    def add(self, url):
+        if url in self:
+            return
+        bloom = self._filters[-1]
+        if bloom[4] >= bloom[3]:
+            self._add_filter(bloom[3] * 2, self.fp_rate / (2 ** (len(self._filters) + 1)))
+            bloom = self._filters[-1]
+        bitmap = bloom[0]
+        for pos in self._positions(url, bloom[1], bloom[2]):
+            bitmap[pos >> 3] |= 1 << (pos & 7)
+        bloom[4] += 1
+        self._count += 1
+
+    def __contains__(self, url):
+        return any(self._in_filter(url, bloom) for bloom in self._filters)
+
+    def __len__(self):
+        return self._count
+
+    def memory_bytes(self):
+        return sum(len(bloom[0]) for bloom in self._filters)
+
+
+# 已见URL存储的可选后端
+SEEN_STORES = {
+    'exact': ExactSeenStore,
+    'fingerprint': FingerprintSeenStore,
+    'bloom': BloomSeenStore,
+}
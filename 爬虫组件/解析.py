@@ -0,0 +1,601 @@
+"""
+HTML解析：多种解析器后端、流式链接提取和字符编码识别
+"""
+import re
+import codecs
+from html.parser import HTMLParser
+import time
+import hashlib
+import zlib
+import logging
+
+from bs4 import BeautifulSoup, NavigableString
+
+try:
+    from lxml import etree as lxml_etree  # 可选的快速解析器（需安装：pip install lxml）
+except ImportError:
+    lxml_etree = None
+
+try:
+    import charset_normalizer  # 未声明编码时的抽样统计猜测（通常随requests安装）
+except ImportError:
+    charset_normalizer = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxHTMLParser  # 可选（需安装：pip install selectolax）
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxHTMLParser
+    except ImportError:
+        SelectolaxHTMLParser = None
+
+
+class PageResult:
+    """一次抓取、一次解析得到的页面结果，供各保存步骤共享（只读）"""
+    def __init__(self, url, text='', images=None, links=None, anchors=None):
+        self.url = url
+        self.text = text
+        self.images = images if images is not None else []  # 每个图片标签一个 {属性名: 属性值}
+        self.links = links if links is not None else set()
+        self.anchors = anchors if anchors is not None else {}  # 规范化的链接URL -> 锚文本（提取了锚文本时）
+        self.relevance = None  # 聚焦爬取时页面与主题的相关度
+
+
+# 提取正文时跳过的标签
+TEXT_SKIP_TAGS = ('script', 'style', 'nav', 'footer', 'iframe', 'template')
+# HTML5中内容按原始文本解析的标签（其中的<a>等不是标签），以及不渲染的template；
+# html.parser不区分这些，各后端统一按HTML5处理：不从其中提取链接和图片
+RAW_TEXT_TAGS = ('textarea', 'title', 'xmp', 'iframe', 'noembed', 'noframes')
+HIDDEN_TAGS = RAW_TEXT_TAGS + ('template',)
+# 带href的链接标签和带src的框架标签
+LINK_TAGS = ('a', 'link', 'area')
+FRAME_TAGS = ('iframe', 'frame')
+# 可能携带图片地址的标签和属性
+IMAGE_TAGS = ('img', 'picture', 'source', 'figure')
+IMAGE_ATTRS = ('src', 'data-src', 'srcset', 'data-original', 'content')
+
+
+# 锚文本最多保留的字符数
+MAX_ANCHOR_CHARS = 200
+
+
+def _anchor_text(text, title=None, alt=None):
+    """链接的锚文本（合并空白），没有文字时依次使用title属性和其中图片的alt"""
+    text = ' '.join(text.split()) or ' '.join((title or '').split()) or ' '.join((alt or '').split())
+    return text[:MAX_ANCHOR_CHARS]
+
+
+def _followable(href):
+    """去掉首尾空白，排除javascript/mailto/tel链接"""
+    href = href.strip()
+    if not href or href.startswith(('javascript:', 'mailto:', 'tel:')):
+        return None
+    return href
+
+
+class _HiddenContentFilter:
+    """html.parser分词器的补充：跟踪是否处在HIDDEN_TAGS的内容中（html.parser把其中的内容也当作标记）"""
+    _hidden = None  # 当前所在的隐藏标签名
+    _hidden_depth = 0  # 嵌套的template层数（原始文本标签不嵌套）
+
+    def _is_hidden(self, tag):
+        """处理一个开始标签，返回该标签是否位于隐藏内容中"""
+        if self._hidden is not None:
+            if tag == self._hidden == 'template':
+                self._hidden_depth += 1
+            return True
+        if tag in HIDDEN_TAGS:
+            self._hidden, self._hidden_depth = tag, 1
+        return False
+
+    def handle_endtag(self, tag):
+        if tag == self._hidden:
+            self._hidden_depth -= 1
+            if not self._hidden_depth:
+                self._hidden = None
+
+
+class _FrameScanner(_HiddenContentFilter, HTMLParser):
+    """按文档顺序收集iframe/frame的src（用于HTML5解析器会丢弃的frameset之外的<frame>）"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._is_hidden(tag) or tag not in FRAME_TAGS:
+            return
+        value = dict(attrs).get('src')
+        href = _followable(value) if value is not None else None
+        if href:
+            self.hrefs.append(href)
+
+
+class SoupParser:
+    """BeautifulSoup + html.parser：纯Python实现，总是可用，但最慢"""
+    name = 'html.parser'
+    # extract_bytes可直接接收的正文编码（其余编码先在Python中解码）
+    byte_encodings = ()
+
+    @staticmethod
+    def available():
+        return True
+
+    def extract(self, html, want_text=True, want_images=True, want_anchors=False):
+        """
+        解析HTML，提取原始链接、图片属性和正文
+        :return: (未解析的链接列表, 每个图片标签的属性字典列表, 正文文本, 锚文本列表)，
+            锚文本与链接一一对应（框架为空字符串），want_anchors为False时为None
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        self._html5_content(soup)
+        
+        hrefs = []
+        anchors = [] if want_anchors else None
+        for tag in soup.find_all(LINK_TAGS, href=True):
+            href = _followable(tag['href'])
+            if href:
+                hrefs.append(href)
+                if want_anchors:
+                    anchors.append(self._anchor(tag))
+        for tag in soup.find_all(FRAME_TAGS, src=True):
+            href = _followable(tag['src'])
+            if href:
+                hrefs.append(href)
+                if want_anchors:
+                    anchors.append('')
+        
+        images = []
+        if want_images:
+            for tag in soup.find_all(IMAGE_TAGS):
+                attrs = {attr: tag[attr] for attr in IMAGE_ATTRS if tag.has_attr(attr)}
+                if attrs:
+                    images.append(attrs)
+        
+        return hrefs, images, self._text(soup) if want_text else '', anchors
+
+    @staticmethod
+    def _html5_content(soup):
+        """按HTML5的方式处理html.parser不认识的内容模型：删除template，原始文本标签的内容还原为文本"""
+        for tag in soup.find_all(HIDDEN_TAGS):
+            if tag.name == 'template':
+                tag.decompose()
+            elif tag.contents:
+                tag.string = tag.decode_contents(formatter=None)
+
+    @staticmethod
+    def _anchor(tag):
+        """
+        链接的锚文本；html.parser不会像HTML5那样在下一个<a>处关闭未闭合的<a>，
+        所以只取到嵌套的<a>为止
+        """
+        parts = []
+        img = None
+        for node in tag.descendants:
+            if node.name == 'a':
+                break
+            if type(node) is NavigableString:
+                parts.append(node)
+            elif node.name == 'img' and img is None:
+                img = node
+        return _anchor_text(' '.join(parts), tag.get('title'), img.get('alt') if img is not None else None)
+
+    @staticmethod
+    def _text(soup):
+        """提取正文文本，跳过脚本、导航等标签（不修改解析树）"""
+        parts = []
+        for string in soup.find_all(string=True):
+            # 排除注释、CDATA、脚本等特殊字符串
+            if type(string) is not NavigableString:
+                continue
+            if any(parent.name in TEXT_SKIP_TAGS for parent in string.parents):
+                continue
+            string = string.strip()
+            if string:
+                parts.append(string)
+        return '\n'.join(parts)
+
+
+class LxmlParser:
+    """lxml（libxml2）：C实现的HTML解析器，需安装lxml"""
+    name = 'lxml'
+    byte_encodings = ('utf-8',)
+
+    @staticmethod
+    def available():
+        return lxml_etree is not None
+
+    def __init__(self):
+        self._parser = lxml_etree.HTMLParser(encoding='utf-8')
+
+    def extract(self, html, want_text=True, want_images=True, want_anchors=False):
+        """输出与SoupParser.extract相同"""
+        return self.extract_bytes(html.encode('utf-8'), want_text, want_images, want_anchors)
+
+    def extract_bytes(self, body, want_text=True, want_images=True, want_anchors=False):
+        """解析UTF-8字节，由libxml2解码（输出同extract）"""
+        root = lxml_etree.fromstring(body, self._parser) if body.strip() else None
+        if root is None:
+            return [], [], '', [] if want_anchors else None
+        
+        # template的内容在libxml2中是普通子元素
+        hidden = {element for template in root.iter('template') for element in template.iter()}
+        hrefs = []
+        anchors = [] if want_anchors else None
+        for tags, attr in ((LINK_TAGS, 'href'), (FRAME_TAGS, 'src')):
+            for element in root.iter(*tags):
+                if hidden and element in hidden:
+                    continue
+                value = element.get(attr)
+                href = _followable(value) if value is not None else None
+                if href:
+                    hrefs.append(href)
+                    if want_anchors:
+                        anchors.append(self._anchor(element) if attr == 'href' else '')
+        
+        images = []
+        if want_images:
+            for element in root.iter(*IMAGE_TAGS):
+                if hidden and element in hidden:
+                    continue
+                attrs = {attr: element.get(attr) for attr in IMAGE_ATTRS if element.get(attr) is not None}
+                if attrs:
+                    images.append(attrs)
+        
+        return hrefs, images, self._text(root) if want_text else '', anchors
+
+    @staticmethod
+    def _anchor(element):
+        img = element.find('.//img')
+        return _anchor_text(' '.join(element.itertext()), element.get('title'),
+                            img.get('alt') if img is not None else None)
+
+    @staticmethod
+    def _text(root):
+        """按文档顺序收集text/tail，跳过脚本、导航等标签和注释"""
+        parts = []
+        # 栈中元素为 (节点, 是否已处理完子节点)
+        stack = [(root, False)]
+        while stack:
+            element, done = stack.pop()
+            if done:
+                # tail属于父元素，跳过的标签之后的tail也要保留
+                if element.tail and element is not root:
+                    parts.append(element.tail)
+                continue
+            stack.append((element, True))
+            if not isinstance(element.tag, str) or element.tag in TEXT_SKIP_TAGS:
+                continue
+            if element.text:
+                parts.append(element.text)
+            stack.extend((child, False) for child in reversed(element))
+        return '\n'.join(part.strip() for part in parts if part.strip())
+
+
+# <frame>开始标签（检查是否需要SelectolaxParser._recover_frames），分别用于字节和文本
+_FRAME_TAG = re.compile(rb'<frame[\s/>]', re.I)
+_FRAME_TAG_TEXT = re.compile(r'<frame[\s/>]', re.I)
+
+
+class SelectolaxParser:
+    """selectolax（Lexbor/Modest）：C实现，通常是最快的后端，需安装selectolax"""
+    name = 'selectolax'
+    byte_encodings = ('utf-8',)
+
+    @staticmethod
+    def available():
+        return SelectolaxHTMLParser is not None
+
+    def extract(self, html, want_text=True, want_images=True, want_anchors=False):
+        """输出与SoupParser.extract相同"""
+        return self.extract_bytes(html, want_text, want_images, want_anchors)
+
+    def extract_bytes(self, body, want_text=True, want_images=True, want_anchors=False):
+        """解析UTF-8字节（也接受str），由Lexbor解码（输出同extract）"""
+        tree = SelectolaxHTMLParser(body)
+        if tree.root is None:
+            return [], [], '', [] if want_anchors else None
+        
+        hrefs = []
+        anchors = [] if want_anchors else None
+        for tags, attr in ((LINK_TAGS, 'href'), (FRAME_TAGS, 'src')):
+            for node in tree.css(','.join(f"{tag}[{attr}]" for tag in tags)):
+                href = _followable(node.attributes.get(attr) or '')
+                if href:
+                    hrefs.append(href)
+                    if want_anchors:
+                        anchors.append(self._anchor(node) if attr == 'href' else '')
+        self._recover_frames(body, tree, hrefs, anchors)
+        
+        images = []
+        if want_images:
+            for node in tree.css(','.join(IMAGE_TAGS)):
+                node_attrs = node.attributes
+                attrs = {attr: node_attrs[attr] or '' for attr in IMAGE_ATTRS if attr in node_attrs}
+                if attrs:
+                    images.append(attrs)
+        
+        text = ''
+        if want_text:
+            # 解析树只在本方法内使用，可以直接删除不需要的标签
+            tree.strip_tags(list(TEXT_SKIP_TAGS))
+            parts = (node.text(deep=False).strip()
+                     for node in tree.root.traverse(include_text=True) if node.tag == '-text')
+            text = '\n'.join(part for part in parts if part)
+        return hrefs, images, text, anchors
+
+    @staticmethod
+    def _recover_frames(body, tree, hrefs, anchors):
+        """
+        Lexbor按HTML5丢弃frameset之外的<frame>，其他后端仍会提取；
+        出现这种<frame>时用_FrameScanner重新收集框架链接（替换已收集的iframe/frame部分）
+        """
+        if not (_FRAME_TAG if isinstance(body, bytes) else _FRAME_TAG_TEXT).search(body):
+            return
+        if tree.css_first('frameset') is not None:
+            return
+        frames = len(tree.css(','.join(f"{tag}[src]" for tag in FRAME_TAGS)))
+        scanner = _FrameScanner()
+        scanner.feed(body.decode('utf-8', 'replace') if isinstance(body, bytes) else body)
+        scanner.close()
+        del hrefs[len(hrefs) - frames:]
+        hrefs.extend(scanner.hrefs)
+        if anchors is not None:
+            del anchors[len(anchors) - frames:]
+            anchors.extend('' for _ in scanner.hrefs)
+
+    @staticmethod
+    def _anchor(node):
+        img = node.css_first('img')
+        return _anchor_text(node.text(deep=True, separator=' '), node.attributes.get('title'),
+                            img.attributes.get('alt') if img is not None else None)
+
+
+class StreamingLinkExtractor(_HiddenContentFilter, HTMLParser):
+    """
+    增量链接提取器：按块输入正文字节，边下载边产出链接，不构建DOM树
+    同时计算正文哈希并压缩保存正文，供验证器缓存使用
+    """
+    def __init__(self, encoding=None, max_bytes=None, resolve=None):
+        """
+        :param encoding: 正文编码，默认UTF-8（无法解码的字节被替换）
+        :param max_bytes: 最多处理的正文字节数，超出部分被忽略（truncated置为True）
+        :param resolve: 未给出encoding时的编码判定函数，接收正文开头（META_SNIFF_BYTES字节，
+            正文更短时为全部正文）并返回编码；判定前收到的正文先缓存
+        """
+        super().__init__(convert_charrefs=True)
+        self.encoding = encoding
+        self._resolve = resolve if encoding is None else None
+        self._decoder = None if self._resolve else self._make_decoder(encoding)
+        self._prefix = []  # 判定编码前缓存的正文块
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.truncated = False
+        self.digest = hashlib.sha256()
+        self._compressor = zlib.compressobj()
+        self._compressed = []
+        self._hrefs = []
+
+    def feed_bytes(self, chunk):
+        """输入一块正文，返回其中新发现的原始链接"""
+        if self.truncated:
+            return []
+        if self.max_bytes is not None and self.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.bytes_read]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        self.digest.update(chunk)
+        self._compressed.append(self._compressor.compress(chunk))
+        self._decode(chunk)
+        return self._take()
+
+    def feed_text(self, text):
+        """输入已解码的文本（如304时的缓存副本），返回其中的原始链接"""
+        self.feed(text)
+        return self._take()
+
+    def finish(self):
+        """结束输入，返回剩余的链接"""
+        self._decode(b'', final=True)
+        self.close()
+        return self._take()
+
+    def _decode(self, chunk, final=False):
+        """解码一块正文并分词；编码未定时先缓存，攒够正文开头再判定"""
+        if self._decoder is None:
+            self._prefix.append(chunk)
+            if not final and self.bytes_read < META_SNIFF_BYTES:
+                return
+            chunk, self._prefix = b''.join(self._prefix), []
+            self.encoding = self._resolve(chunk)
+            self._decoder = self._make_decoder(self.encoding)
+        self.feed(self._decoder.decode(chunk, final))
+
+    @staticmethod
+    def _make_decoder(encoding):
+        try:
+            decoder_class = codecs.getincrementaldecoder(encoding or 'utf-8')
+        except LookupError:
+            decoder_class = codecs.getincrementaldecoder('utf-8')
+        return decoder_class(errors='replace')
+
+    def compressed_body(self):
+        """zlib压缩后的已读正文（在finish之后调用）"""
+        return b''.join(self._compressed) + self._compressor.flush()
+
+    def handle_starttag(self, tag, attrs):
+        if self._is_hidden(tag):
+            return
+        if tag in LINK_TAGS:
+            wanted = 'href'
+        elif tag in FRAME_TAGS:
+            wanted = 'src'
+        else:
+            return
+        for name, value in attrs:
+            if name == wanted and value is not None:
+                href = _followable(value)
+                if href:
+                    self._hrefs.append(href)
+                break
+
+    def _take(self):
+        hrefs, self._hrefs = self._hrefs, []
+        return hrefs
+
+
+def decode_body(body, encoding=None):
+    """按声明的编码解码正文（默认UTF-8，无法解码的字节被替换）"""
+    try:
+        return body.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+def parse_body(parser, body, encoding, want_text=True, want_images=True, want_anchors=False):
+    """
+    解析原始正文：解析器能直接接收该编码的字节时不在Python中解码（解码计入解析耗时）
+    :return: (提取结果, 解码耗时（未在Python中解码时为None）, 解析耗时)
+    """
+    started = time.perf_counter()
+    if (encoding or 'utf-8') in parser.byte_encodings:
+        result = parser.extract_bytes(body, want_text, want_images, want_anchors)
+        return result, None, time.perf_counter() - started
+    html = decode_body(body, encoding)
+    decoded = time.perf_counter()
+    result = parser.extract(html, want_text, want_images, want_anchors)
+    return result, decoded - started, time.perf_counter() - decoded
+
+
+# 在正文开头多少字节内查找<meta charset>（HTML规范要求声明位于前1024字节，这里留出余量）
+META_SNIFF_BYTES = 4096
+# 统计猜测编码时最多使用的样本字节数
+DETECT_SAMPLE_BYTES = 64 * 1024
+# 字节序标记及对应编码
+BYTE_ORDER_MARKS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+_META_CHARSET = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+
+
+def normalize_charset(label):
+    """
+    把编码标签规范为Python编解码器名，未知编码返回None
+    按HTML规范，ISO-8859-1和US-ASCII按windows-1252解码
+    """
+    try:
+        name = codecs.lookup(label).name
+    except LookupError:
+        return None
+    return 'cp1252' if name in ('iso8859-1', 'ascii') else name
+
+
+def charset_from_content_type(content_type):
+    """Content-Type中声明的编码，未声明或未知时返回None"""
+    match = _HEADER_CHARSET.search(content_type or '')
+    return normalize_charset(match.group(1)) if match else None
+
+
+def sniff_meta_charset(prefix):
+    """正文开头 <meta charset> 或 <meta http-equiv="Content-Type"> 声明的编码"""
+    match = _META_CHARSET.search(prefix[:META_SNIFF_BYTES])
+    if not match:
+        return None
+    charset = normalize_charset(match.group(1).decode('ascii'))
+    # 能写出<meta>说明文档是ASCII兼容的，声明的UTF-16按规范视为UTF-8
+    return 'utf-8' if charset and charset.startswith('utf-16') else charset
+
+
+def is_utf8(sample):
+    """样本是否为合法的UTF-8（末尾可能截断在多字节字符中间）"""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_charset(sample):
+    """统计猜测编码（只看样本）：交给charset_normalizer，不可用或无结果时为windows-1252"""
+    if charset_normalizer is not None:
+        best = charset_normalizer.from_bytes(sample).best()
+        if best is not None:
+            return normalize_charset(best.encoding) or 'cp1252'
+    return 'cp1252'
+
+
+class CharsetResolver:
+    """
+    正文编码判定：字节序标记 → HTTP头的charset → 正文开头的<meta charset> → 样本是合法UTF-8
+    → 该主机上次统计猜测的编码 → 抽样统计猜测
+    只检查正文的有限字节，不对整个正文做统计检测；主机缓存只保存统计猜测的结果（页面自己的声明不外推）
+    """
+    # 判定结果的来源
+    SOURCES = ('bom', 'header', 'meta', 'utf8', 'host', 'detect')
+
+    def __init__(self, sample_bytes=DETECT_SAMPLE_BYTES):
+        """
+        :param sample_bytes: 统计猜测时最多使用的正文字节数
+        """
+        self.sample_bytes = sample_bytes
+        self._host_charsets = {}  # 主机 -> 最近一次统计猜测的编码
+
+    def resolve(self, host, content_type, body):
+        """
+        :param body: 完整正文或其开头（至少META_SNIFF_BYTES字节时meta声明才可靠）
+        :return: (编码, 来源)
+        """
+        for mark, encoding in BYTE_ORDER_MARKS:
+            if body.startswith(mark):
+                return encoding, 'bom'
+        encoding = charset_from_content_type(content_type)
+        if encoding is not None:
+            return encoding, 'header'
+        encoding = sniff_meta_charset(body)
+        if encoding is not None:
+            return encoding, 'meta'
+        sample = body[:self.sample_bytes]
+        if is_utf8(sample):
+            return 'utf-8', 'utf8'
+        encoding = self._host_charsets.get(host)
+        if encoding is not None:
+            return encoding, 'host'
+        encoding = self._host_charsets[host] = detect_charset(sample)
+        return encoding, 'detect'
+
+
+# 解析进程中的解析器实例（由init_parse_worker创建）
+_worker_parser = None
+
+
+def init_parse_worker(parser_name):
+    """解析进程初始化：每个进程只创建一次解析器"""
+    global _worker_parser
+    _worker_parser = create_html_parser(parser_name)
+
+
+def parse_in_worker(body, encoding, want_text, want_images, want_anchors=False):
+    """
+    在解析进程中解码并提取页面，只返回基本类型以减少跨进程传输开销
+    :return: 同parse_body
+    """
+    return parse_body(_worker_parser, body, encoding, want_text, want_images, want_anchors)
+
+
+# HTML解析器后端，'auto'按顺序选择第一个可用的
+HTML_PARSERS = {
+    'selectolax': SelectolaxParser,
+    'lxml': LxmlParser,
+    'html.parser': SoupParser,
+}
+
+
+def create_html_parser(name='auto'):
+    """创建HTML解析器后端，所选后端未安装时回退到html.parser"""
+    if name == 'auto':
+        for parser_class in HTML_PARSERS.values():
+            if parser_class.available():
+                return parser_class()
+    parser_class = HTML_PARSERS[name]
+    if not parser_class.available():
+        logging.getLogger(__name__).warning(f"解析器 {name} 未安装，回退到 html.parser")
+        parser_class = SoupParser
+    return parser_class()
@@ -0,0 +1,283 @@
+"""
+待爬队列的排序与溢出，以及按主机的礼貌调度
+"""
+import os
+from urllib.parse import urlparse
+import time
+import json
+import heapq
+import shutil
+import tempfile
+from collections import deque
+
+
+class BFSOrdering:
+    """按深度广度优先：先进先出"""
+    def __init__(self):
+        self._queue = deque()
+
+    def push(self, entry):
+        self._queue.append(entry)
+
+    def pop(self):
+        return self._queue.popleft()
+
+    def __len__(self):
+        return len(self._queue)
+
+
+class HostRoundRobinOrdering:
+    """按主机轮转：每个主机一个先进先出队列，轮流取出，避免集中请求同一主机"""
+    def __init__(self):
+        self._queues = {}
+        self._hosts = deque()
+        self._size = 0
+
+    def push(self, entry):
+        host = urlparse(entry[0]).netloc
+        if host not in self._queues:
+            self._queues[host] = deque()
+            self._hosts.append(host)
+        self._queues[host].append(entry)
+        self._size += 1
+
+    def pop(self):
+        host = self._hosts.popleft()
+        queue = self._queues[host]
+        entry = queue.popleft()
+        if queue:
+            self._hosts.append(host)
+        else:
+            del self._queues[host]
+        self._size -= 1
+        return entry
+
+    def __len__(self):
+        return self._size
+
+
+class PriorityOrdering:
+    """按分数优先：分数高的先出，同分按入队顺序"""
+    def __init__(self):
+        self._heap = []
+        self._counter = 0
+
+    def push(self, entry):
+        heapq.heappush(self._heap, (-entry[2], self._counter, entry))
+        self._counter += 1
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def rescore(self, score):
+        """按score(entry)重新计算所有条目的分数并重建堆（同分仍按入队顺序）"""
+        heap = []
+        for _, counter, entry in self._heap:
+            value = score(entry)
+            heap.append((-value, counter, (entry[0], entry[1], value)))
+        heapq.heapify(heap)
+        self._heap = heap
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class CrawlFrontier:
+    """
+    待爬URL队列：入队时去重，排序策略可插拔，内存中条目超过上限时溢出到磁盘
+    条目格式为 (url, depth, score)
+    """
+    ORDERINGS = {
+        'bfs': BFSOrdering,
+        'host': HostRoundRobinOrdering,
+        'priority': PriorityOrdering,
+        # 分数为链接的PageRank，由爬虫定期重新计算（见EnhancedWebCrawler.pagerank_interval）
+        'pagerank': PriorityOrdering,
+    }
+
+    def __init__(self, ordering='bfs', max_in_memory=100000, spill_dir=None, seen=None):
+        """
+        :param ordering: 排序策略名称（'bfs', 'host', 'priority'）或实现了push/pop/__len__的对象
+        :param max_in_memory: 内存中最多保留的条目数，超出部分写入磁盘
+        :param spill_dir: 溢出文件目录（默认使用临时目录）
+        :param seen: 已入队URL集合，用于入队去重
+        """
+        self.ordering = self.ORDERINGS[ordering]() if isinstance(ordering, str) else ordering
+        self.max_in_memory = max(2, max_in_memory)
+        self.seen = seen if seen is not None else set()
+        self._spill_dir = spill_dir
+        self._own_spill_dir = False
+        self._segment_size = self.max_in_memory // 2
+        self._segments = deque()  # 已写入磁盘的溢出段文件（按写入先后）
+        self._buffer = []  # 尚未写入磁盘的溢出条目
+        self._spilled = 0
+        self._segment_id = 0
+        self._score = None  # rescore设置的评分函数，读回的溢出条目按它重新计算分数
+
+    def push(self, url, depth, score=0.0):
+        """入队（已见过的URL直接忽略），返回是否为新URL"""
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        
+        # 一旦开始溢出，新条目也进入溢出区，保持先后顺序
+        self.requeue((url, depth, score))
+        return True
+
+    def requeue(self, entry):
+        """把已取出的条目放回队列（不做去重），用于暂缓处理"""
+        if self._spilled or len(self.ordering) >= self.max_in_memory:
+            self._spill(entry)
+        else:
+            self.ordering.push(entry)
+
+    def pop(self):
+        """取出下一个条目 (url, depth, score)，队列为空时抛出IndexError"""
+        if self._spilled and len(self.ordering) < self._segment_size:
+            self._refill()
+        if not len(self.ordering):
+            raise IndexError("frontier为空")
+        return self.ordering.pop()
+
+    def __len__(self):
+        return len(self.ordering) + self._spilled
+
+    def rescore(self, score):
+        """
+        按score(entry)重新计算条目分数：内存中的条目立即重排（排序策略支持rescore时），
+        溢出到磁盘的条目在读回时计算
+        """
+        self._score = score
+        if hasattr(self.ordering, 'rescore'):
+            self.ordering.rescore(score)
+
+    def close(self):
+        """删除溢出文件"""
+        for path in self._segments:
+            if os.path.exists(path):
+                os.remove(path)
+        if self._own_spill_dir and self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        self._segments.clear()
+        self._buffer = []
+        self._spilled = 0
+
+    def _spill(self, entry):
+        """把条目写入溢出缓冲，缓冲满一段时落盘"""
+        self._buffer.append(entry)
+        self._spilled += 1
+        if len(self._buffer) >= self._segment_size:
+            self._flush_buffer()
+
+    def _flush_buffer(self):
+        """把溢出缓冲写成一个段文件"""
+        if not self._buffer:
+            return
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='frontier_')
+            self._own_spill_dir = True
+        os.makedirs(self._spill_dir, exist_ok=True)
+        
+        path = os.path.join(self._spill_dir, f"segment_{self._segment_id:08d}.jsonl")
+        self._segment_id += 1
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in self._buffer:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._segments.append(path)
+        self._buffer = []
+
+    def _refill(self):
+        """从最早的溢出段（或尚未落盘的缓冲）读回一批条目"""
+        if self._segments:
+            path = self._segments.popleft()
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = [tuple(json.loads(line)) for line in f]
+            os.remove(path)
+        else:
+            entries, self._buffer = self._buffer, []
+        
+        for entry in entries:
+            if self._score is not None:
+                entry = (entry[0], entry[1], self._score(entry))
+            self.ordering.push(entry)
+        self._spilled -= len(entries)
+
+
+class PolitenessScheduler:
+    """
+    按主机的礼貌调度器：记录每个主机下次允许请求的时间
+    延迟只作用于刚访问过的主机，并根据响应延迟和429/503自适应调整
+    """
+    # 触发退避的状态码
+    BACKOFF_STATUS = (429, 503)
+
+    def __init__(self, default_delay=0.5, host_delays=None, latency_factor=1.0,
+                 backoff_factor=2.0, max_delay=60.0, latency_smoothing=0.3, max_penalty=32.0):
+        """
+        :param default_delay: 同一主机两次请求之间的基础延迟（秒）
+        :param host_delays: 按主机配置的基础延迟，如 {'example.com': 2.0}
+        :param latency_factor: 延迟不低于 平均响应时间 * latency_factor
+        :param backoff_factor: 收到429/503时延迟的放大倍数
+        :param max_delay: 延迟上限（秒）
+        :param latency_smoothing: 响应时间指数平均的平滑系数
+        :param max_penalty: 退避倍数的上限（倍数，不是秒数；实际延迟另受max_delay限制）
+        """
+        self.default_delay = default_delay
+        self.host_delays = dict(host_delays or {})
+        self.latency_factor = latency_factor
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        self.latency_smoothing = latency_smoothing
+        self.max_penalty = max_penalty
+        self._next_allowed = {}  # 主机 -> 下次允许请求的时间
+        self._latency = {}  # 主机 -> 平均响应时间
+        self._penalty = {}  # 主机 -> 退避倍数
+
+    def set_delay(self, host, delay):
+        """设置主机的基础延迟"""
+        self.host_delays[host] = delay
+
+    def set_min_delay(self, host, delay):
+        """把主机的基础延迟提高到至少delay（如robots.txt的Crawl-delay）"""
+        self.host_delays[host] = max(self.host_delays.get(host, self.default_delay), delay)
+
+    def delay_for(self, host):
+        """当前对该主机生效的延迟"""
+        delay = max(self.host_delays.get(host, self.default_delay),
+                    self._latency.get(host, 0.0) * self.latency_factor)
+        return min(self.max_delay, delay * self._penalty.get(host, 1.0))
+
+    def defer(self, host, seconds):
+        """把该主机的下一次请求推迟到至少seconds秒之后（如Retry-After或重试退避）"""
+        self._next_allowed[host] = max(self._next_allowed.get(host, 0.0), time.monotonic() + seconds)
+
+    def ready_at(self, host):
+        """该主机允许下一次请求的时间点（time.monotonic()时钟）"""
+        return self._next_allowed.get(host, 0.0)
+
+    def wait_time(self, host):
+        """距离该主机允许下一次请求还需等待的秒数"""
+        return max(0.0, self.ready_at(host) - time.monotonic())
+
+    def reserve(self, host):
+        """为该主机预约下一个请求时间，返回需要等待的秒数"""
+        now = time.monotonic()
+        start = max(now, self._next_allowed.get(host, 0.0))
+        self._next_allowed[host] = start + self.delay_for(host)
+        return start - now
+
+    def record(self, host, status=None, latency=None):
+        """记录一次响应，更新平均响应时间和退避倍数"""
+        if latency is not None:
+            previous = self._latency.get(host)
+            self._latency[host] = latency if previous is None else (
+                self.latency_smoothing * latency + (1 - self.latency_smoothing) * previous)
+        
+        penalty = self._penalty.get(host, 1.0)
+        if status in self.BACKOFF_STATUS:
+            self._penalty[host] = min(penalty * self.backoff_factor, self.max_penalty)
+            # 立即推迟该主机的下一次请求（不缩短已有的更长推迟，如Retry-After）
+            self.defer(host, self.delay_for(host))
+        else:
+            self._penalty[host] = max(1.0, penalty * 0.75)
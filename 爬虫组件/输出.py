@@ -0,0 +1,422 @@
+"""
+爬取结果的输出：按内容去重的图片存储，以及文本和链接的文件/分片输出
+"""
+import os
+from urllib.parse import urlparse
+import time
+import json
+import gzip
+import queue
+import threading
+import sqlite3
+import uuid
+import logging
+
+try:
+    import zstandard  # 分片输出的zstd压缩（需安装：pip install zstandard）
+except ImportError:
+    zstandard = None
+
+
+# 图片格式的文件头签名 -> 扩展名（WebP、AVIF另行判断）
+_IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'\x00\x00\x01\x00', 'ico'),
+    (b'II*\x00', 'tif'),
+    (b'MM\x00*', 'tif'),
+)
+
+
+def sniff_image_extension(head):
+    """
+    根据文件开头的字节判断图片格式，返回扩展名；无法识别时返回'bin'
+    只取决于内容本身，相同内容总是得到相同的扩展名
+    """
+    for signature, ext in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    if b'<svg' in head.lower():
+        return 'svg'
+    return 'bin'
+
+
+class ContentAddressedImageStore:
+    """
+    内容寻址的图片存储：每份内容按SHA-256摘要只保存一次（objects/摘要前两位/摘要.扩展名）
+    扩展名由内容的文件头判断，因此同一内容只有一个存储路径，与URL的写法无关；
+    并维护 URL -> 摘要 索引，已知的URL无需再次下载
+    """
+    # 判断格式时读取的文件开头字节数
+    SNIFF_BYTES = 512
+
+    def __init__(self, root, commit_every=100):
+        """
+        :param root: 存储根目录
+        :param commit_every: 索引累计多少次写入后提交一次
+        """
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.commit_every = commit_every
+        self.conn = sqlite3.connect(os.path.join(root, 'index.sqlite'))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                ext TEXT NOT NULL
+            )''')
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def lookup(self, url):
+        """返回URL对应的 (摘要, 扩展名)，未知URL返回None"""
+        return self.conn.execute('SELECT digest, ext FROM images WHERE url = ?', (url,)).fetchone()
+
+    def object_path(self, digest, ext):
+        """内容对应的存储路径"""
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.{ext}")
+
+    def temp_path(self):
+        """下载用的临时文件路径（与存储在同一文件系统，便于原子重命名）"""
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+
+    def commit(self, url, temp_path, digest):
+        """
+        把下载完成的临时文件存入存储并更新索引（扩展名由文件头判断）
+        :return: (存储路径, 是否为新内容)
+        """
+        with open(temp_path, 'rb') as f:
+            ext = sniff_image_extension(f.read(self.SNIFF_BYTES))
+        path = self.object_path(digest, ext)
+        is_new = not os.path.exists(path)
+        if is_new:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        else:
+            os.remove(temp_path)
+        
+        self.conn.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?)', (url, digest, ext))
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.conn.commit()
+            self._pending_writes = 0
+        return path, is_new
+
+    def close(self):
+        """提交索引并关闭"""
+        self.conn.commit()
+        self.conn.close()
+
+
+class FileSink:
+    """
+    每个页面一个文件的输出（原有布局）：text/域名_路径.txt 和 links/域名_路径_links.txt
+    注意：净化后的文件名可能冲突，后写入的页面会覆盖先写入的
+    """
+    def __init__(self, save_dir, sanitize_filename):
+        """
+        :param save_dir: 保存目录
+        :param sanitize_filename: 把URL路径转换为安全文件名的函数
+        """
+        self.save_dir = save_dir
+        self.sanitize_filename = sanitize_filename
+        self.logger = logging.getLogger(__name__)
+
+    def write(self, url, text=None, links=None):
+        """保存页面的文本和/或链接（为None的部分不保存），返回是否全部保存成功"""
+        ok = True
+        if text is not None:
+            ok = self._write_text(url, text)
+        if links:
+            ok = self._write_links(url, links) and ok
+        return ok
+
+    def has(self, url, text=True, links=True):
+        """页面的文本和/或链接文件是否存在（用于判断未变化的页面能否跳过保存）"""
+        return ((not text or os.path.exists(self._text_path(url)))
+                and (not links or os.path.exists(self._links_path(url))))
+
+    def _text_path(self, url):
+        parsed_url = urlparse(url)
+        return os.path.join(self.save_dir, 'text', f"{parsed_url.netloc}_{self.sanitize_filename(parsed_url.path)}.txt")
+
+    def _links_path(self, url):
+        parsed_url = urlparse(url)
+        return os.path.join(self.save_dir, 'links',
+                            f"{parsed_url.netloc}_{self.sanitize_filename(parsed_url.path)}_links.txt")
+
+    def _write_text(self, url, text):
+        try:
+            filepath = self._text_path(url)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(f"URL: {url}\n\n")
+                f.write(text)
+            
+            self.logger.info(f"已保存文本: {filepath}")
+            return True
+        except Exception as e:
+            self.logger.error(f"保存文本失败: {str(e)}")
+            return False
+
+    def _write_links(self, url, links):
+        try:
+            filepath = self._links_path(url)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(f"从 {url} 提取的 {len(links)} 个链接:\n\n")
+                for link in sorted(links):
+                    f.write(f"{link}\n")
+            
+            self.logger.info(f"已保存链接列表: {filepath}")
+            return True
+        except Exception as e:
+            self.logger.error(f"保存链接失败: {str(e)}")
+            return False
+
+    def close(self):
+        pass
+
+
+class ShardSink:
+    """
+    滚动分片输出的基类：记录由后台线程逐条压缩后追加到分片文件，分片超过大小后切换到新文件
+    每条记录是独立的压缩成员，index.sqlite 保存 URL -> (分片, 偏移, 长度)，可随机读取单条记录
+    后台线程的写入错误在下一次write()或close()时抛出；线程已退出时write()不再排队
+    """
+    EXTENSION = ''
+
+    def __init__(self, root, compression='gzip', max_shard_bytes=256 * 1024 * 1024,
+                 queue_size=10000, commit_every=1000):
+        """
+        :param root: 分片目录
+        :param compression: 'gzip' 或 'zstd'（需安装zstandard）
+        :param max_shard_bytes: 单个分片的大小上限（字节）
+        :param queue_size: 等待写入的记录数上限，写入跟不上时write()才会阻塞
+        :param commit_every: 索引累计多少条后提交一次
+        """
+        if compression not in ('gzip', 'zstd'):
+            raise ValueError(f"不支持的压缩格式: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("zstd压缩需要安装zstandard: pip install zstandard")
+        self.root = root
+        self.compression = compression
+        self.max_shard_bytes = max_shard_bytes
+        self.commit_every = commit_every
+        self.index_path = os.path.join(root, 'index.sqlite')
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(root, exist_ok=True)
+        
+        # 接着已有的分片编号写，不覆盖之前的输出
+        suffix = self._shard_suffix()
+        existing = [name for name in os.listdir(root) if name.endswith(suffix)]
+        self._shard_number = len(existing)
+        self._shard = None
+        self._shard_name = None
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None  # 后台线程最近一次的写入错误，由write()/close()抛出
+        self._writer = threading.Thread(target=self._write_loop, name='shard-writer', daemon=True)
+        self._writer.start()
+
+    def write(self, url, text=None, links=None):
+        """
+        把记录交给后台线程写入（为None的部分不保存）
+        之前的记录写入失败时抛出该错误；写入线程已退出时抛出RuntimeError
+        """
+        self._raise_error()
+        self._put((url, time.time(), text, links))
+        return True
+
+    def _put(self, item):
+        """放入队列；队列满时等待，但写入线程退出后不再等待"""
+        while True:
+            if not self._writer.is_alive():
+                self._raise_error()
+                raise RuntimeError("分片写入线程已退出")
+            try:
+                self._queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                pass
+
+    def _raise_error(self):
+        """抛出（并清除）后台线程记录的写入错误"""
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def pending(self):
+        """等待写入的记录数"""
+        return self._queue.qsize()
+
+    def close(self):
+        """等待队列中的记录写完，关闭分片和索引；有未报告的写入错误时抛出"""
+        if self._writer.is_alive():
+            try:
+                self._put(None)
+            except RuntimeError:
+                pass
+        self._writer.join()
+        self._raise_error()
+
+    def read(self, url):
+        """按索引读取URL最近一次写入的记录（已解压的字节），没有时返回None"""
+        conn = sqlite3.connect(self.index_path)
+        try:
+            row = conn.execute('SELECT shard, offset, length FROM records WHERE url = ?', (url,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        shard, offset, length = row
+        with open(os.path.join(self.root, shard), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        if self.compression == 'zstd':
+            # 一条记录可能由多个帧组成
+            return zstandard.ZstdDecompressor().decompressobj(read_across_frames=True).decompress(data)
+        return gzip.decompress(data)
+
+    def encode(self, url, fetched_at, text, links):
+        """把一个页面编码为若干段字节，每段单独压缩为一个成员（子类实现）"""
+        raise NotImplementedError
+
+    def _shard_suffix(self):
+        return self.EXTENSION + ('.zst' if self.compression == 'zstd' else '.gz')
+
+    def _compress(self, parts):
+        if self.compression == 'zstd':
+            compressor = zstandard.ZstdCompressor()
+            return b''.join(compressor.compress(part) for part in parts)
+        return b''.join(gzip.compress(part, compresslevel=6) for part in parts)
+
+    def _write_loop(self):
+        """后台写入线程：压缩、追加、切换分片、更新索引（错误记录到_error）"""
+        conn = None
+        pending = 0
+        try:
+            conn = sqlite3.connect(self.index_path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS records (
+                    url TEXT PRIMARY KEY,
+                    shard TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                )''')
+            conn.commit()
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                try:
+                    url = item[0]
+                    data = self._compress(self.encode(*item))
+                    if self._shard is None or self._shard.tell() + len(data) > self.max_shard_bytes:
+                        self._rotate()
+                    offset = self._shard.tell()
+                    self._shard.write(data)
+                    conn.execute('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)',
+                                 (url, self._shard_name, offset, len(data)))
+                    pending += 1
+                    if pending >= self.commit_every:
+                        # 先把分片数据交给操作系统，索引才不会指向未写出的内容
+                        self._shard.flush()
+                        conn.commit()
+                        pending = 0
+                except Exception as e:
+                    self.logger.error(f"写入分片记录失败: {url}: {str(e)}")
+                    self._error = e
+        except Exception as e:
+            self.logger.error(f"分片写入线程出错: {str(e)}")
+            self._error = e
+        finally:
+            if self._shard is not None:
+                self._shard.close()
+            if conn is not None:
+                conn.commit()
+                conn.close()
+
+    def _rotate(self):
+        """关闭当前分片，打开下一个"""
+        if self._shard is not None:
+            self._shard.close()
+            self.logger.info(f"分片已写满: {self._shard_name}")
+        self._shard_name = f"pages-{self._shard_number:05d}{self._shard_suffix()}"
+        self._shard_number += 1
+        self._shard = open(os.path.join(self.root, self._shard_name), 'ab')
+
+
+class JsonlShardSink(ShardSink):
+    """压缩JSONL分片：每行一个 {"url", "fetched_at", "text", "links"} 对象"""
+    EXTENSION = '.jsonl'
+
+    def encode(self, url, fetched_at, text, links):
+        record = {'url': url, 'fetched_at': fetched_at}
+        if text is not None:
+            record['text'] = text
+        if links is not None:
+            record['links'] = sorted(links)
+        return [(json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')]
+
+
+class WarcShardSink(ShardSink):
+    """
+    WARC/1.1分片：文本保存为resource记录，出链保存为metadata记录（每行 outlink: URL）
+    每个WARC记录单独gzip压缩（.warc.gz约定），同一页面的记录在索引中作为一个整体
+    """
+    EXTENSION = '.warc'
+
+    def __init__(self, root, compression='gzip', **kwargs):
+        if compression != 'gzip':
+            raise ValueError("WARC分片只支持gzip压缩")
+        super().__init__(root, compression, **kwargs)
+
+    def encode(self, url, fetched_at, text, links):
+        date = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(fetched_at))
+        records = []
+        if text is not None:
+            records.append(self._record('resource', url, date, 'text/plain; charset=utf-8', text.encode('utf-8')))
+        if links is not None:
+            block = ''.join(f"outlink: {link}\r\n" for link in sorted(links)).encode('utf-8')
+            records.append(self._record('metadata', url, date, 'application/warc-fields', block))
+        # 每个WARC记录一个gzip成员，普通WARC工具也能逐条读取
+        return records
+
+    @staticmethod
+    def _record(warc_type, url, date, content_type, block):
+        header = (
+            "WARC/1.1\r\n"
+            f"WARC-Type: {warc_type}\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {date}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(block)}\r\n"
+            "\r\n"
+        ).encode('utf-8')
+        return header + block + b"\r\n\r\n"
+
+
+# 页面输出的可选格式
+OUTPUT_SINKS = {
+    'files': FileSink,
+    'jsonl': JsonlShardSink,
+    'warc': WarcShardSink,
+}
@@ -0,0 +1,175 @@
+"""
+爬虫的配置对象：按用途分组EnhancedWebCrawler的参数，每组一个对象
+"""
+import inspect
+
+from .网址 import DEFAULT_STRIP_PARAMS
+from .内容分析 import FocusTopic
+
+
+class PolitenessConfig:
+    """礼貌与重试：按主机的请求间隔、robots.txt、重试策略和熔断器"""
+    def __init__(self, crawl_delay=0.5, host_delays=None, obey_robots=True, robots_ttl=86400,
+                 robots_user_agent=None, retry_policy=None, circuit_breaker=None):
+        """
+        :param crawl_delay: 同一主机两次请求之间的默认延迟（秒）
+        :param host_delays: 按主机配置的延迟，如 {'example.com': 2.0}
+        :param obey_robots: 是否遵守robots.txt（禁止的URL不抓取，Crawl-delay计入主机延迟）
+        :param robots_ttl: robots.txt的缓存有效期（秒），缓存持久化在保存目录中
+        :param robots_user_agent: 匹配robots.txt分组用的产品标识，None时只使用 User-agent: * 组
+        :param retry_policy: 请求重试策略（RetryPolicy实例），None时每个爬虫使用默认策略
+        :param circuit_breaker: 按主机的熔断器（HostCircuitBreaker实例），None时每个爬虫使用默认配置
+        """
+        self.crawl_delay = crawl_delay
+        self.host_delays = host_delays
+        self.obey_robots = obey_robots
+        self.robots_ttl = robots_ttl
+        self.robots_user_agent = robots_user_agent
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+
+
+class ScopeConfig:
+    """爬取范围：URL规范化、爬虫陷阱检测、按主机的配额和近似重复页面的处理"""
+    NEAR_DUPLICATE_POLICIES = (None, 'skip_save', 'skip_links', 'skip_all')
+
+    def __init__(self, strip_query_params=DEFAULT_STRIP_PARAMS, trap_detection=True, max_urls_per_pattern=1000,
+                 max_pages_per_host=None, max_bytes_per_host=None,
+                 near_duplicate_policy=None, near_duplicate_distance=3):
+        """
+        :param strip_query_params: URL规范化时去掉的查询参数名（支持fnmatch通配符，不区分大小写）
+        :param trap_detection: 是否检测爬虫陷阱（见UrlPatternAnalyzer），拒绝的URL不入队
+        :param max_urls_per_pattern: 检测陷阱时每个URL模板最多入队的URL数
+        :param max_pages_per_host: 每个主机最多入队（抓取）的页面数，None表示不限制
+        :param max_bytes_per_host: 每个主机最多下载的正文字节数（页面和图片，按解压后计），
+            达到后该主机的待爬URL和图片不再抓取；None表示不限制
+        :param near_duplicate_policy: 正文与已爬页面近似重复（SimHash）时的处理：'skip_save' 不保存，
+            'skip_links' 不展开出链，'skip_all' 都跳过；None表示不检测
+        :param near_duplicate_distance: 视为近似重复的最大SimHash汉明距离（64位中的位数）
+        """
+        if near_duplicate_policy not in self.NEAR_DUPLICATE_POLICIES:
+            raise ValueError(f"未知的近似重复处理方式: {near_duplicate_policy}")
+        self.strip_query_params = strip_query_params
+        self.trap_detection = trap_detection
+        self.max_urls_per_pattern = max_urls_per_pattern
+        self.max_pages_per_host = max_pages_per_host
+        self.max_bytes_per_host = max_bytes_per_host
+        self.near_duplicate_policy = near_duplicate_policy
+        self.near_duplicate_distance = near_duplicate_distance
+
+
+class StorageConfig:
+    """存储与检查点：已见URL和待爬队列的存储、检查点、HTTP缓存，以及页面和图片的输出"""
+    def __init__(self, checkpoint=True, checkpoint_interval=5.0, seen_store='exact', max_frontier_memory=100000,
+                 http_cache=True, content_addressed_images=True, output_sink='files', shard_compression='gzip',
+                 max_shard_bytes=256 * 1024 * 1024):
+        """
+        :param checkpoint: 是否把爬取状态持久化到保存目录（用于中断后resume）
+        :param checkpoint_interval: 检查点批量提交的间隔（秒）
+        :param seen_store: 已见URL存储后端（'exact', 'fingerprint', 'bloom'）或其实例
+        :param max_frontier_memory: 待爬队列在内存中最多保留的URL数，超出部分溢出到磁盘
+        :param http_cache: 是否在保存目录中缓存ETag/Last-Modified，重复爬取时发送条件请求
+        :param content_addressed_images: 图片按内容摘要去重保存（False时按 images/域名/文件名 保存）
+        :param output_sink: 文本和链接的输出格式：'files'（每页一个文件）、'jsonl'或'warc'（压缩分片，
+            位于保存目录的shards下），也可以传入实现write/close的实例（爬取结束时被关闭）
+        :param shard_compression: 分片的压缩格式（'gzip'或'zstd'，WARC只支持gzip）
+        :param max_shard_bytes: 单个分片的大小上限（字节）
+        """
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.seen_store = seen_store
+        self.max_frontier_memory = max_frontier_memory
+        self.http_cache = http_cache
+        self.content_addressed_images = content_addressed_images
+        self.output_sink = output_sink
+        self.shard_compression = shard_compression
+        self.max_shard_bytes = max_shard_bytes
+
+
+class FocusConfig:
+    """聚焦与链接排序：按主题相关度筛选和排序链接，以及用于PageRank排序的链接图"""
+    def __init__(self, focus_topic=None, focus_threshold=0.05, focus_budget=None, focus_weights=(0.5, 0.2, 0.3),
+                 link_graph=False, pagerank_interval=1000):
+        """
+        :param focus_topic: 聚焦爬取的主题（FocusTopic实例，或关键词列表），None表示不聚焦。聚焦时按链接的
+            相关度排序（frontier_ordering为'bfs'时改用'priority'），不使用流式链接提取
+        :param focus_threshold: 聚焦爬取时链接相关度低于该值的不入队
+        :param focus_budget: 聚焦爬取时本次最多抓取的页面数，None表示不限制
+        :param focus_weights: 链接相关度中 (锚文本, URL中的词, 父页面正文) 三部分的权重
+        :param link_graph: 是否记录链接图（见LinkGraph），快照保存在保存目录的 .link_graph 下，
+            resume或增量模式时从快照继续；frontier_ordering为'pagerank'时总是记录
+        :param pagerank_interval: 每记录多少个页面的出链重新计算一次PageRank、重排待爬队列并保存快照
+        """
+        if focus_topic is not None and not isinstance(focus_topic, FocusTopic):
+            focus_topic = FocusTopic(keywords=focus_topic)
+        self.focus_topic = focus_topic
+        self.focus_threshold = focus_threshold
+        self.focus_budget = focus_budget
+        self.focus_weights = focus_weights
+        self.link_graph = link_graph
+        self.pagerank_interval = pagerank_interval
+
+
+class RecrawlConfig:
+    """增量重爬：记录每个页面的抓取和变化历史，再次爬取时只重新抓取最可能已变化的页面"""
+    def __init__(self, incremental=False, recrawl_budget=1000):
+        """
+        :param incremental: 增量模式：在保存目录中记录每个页面的抓取和变化历史（见RecrawlHistory），
+            再次爬取时只重新抓取最可能已变化的页面，抓取过的页面不再因链接而入队，新发现的链接照常展开；
+            历史为空时为完整爬取。需要StorageConfig.http_cache判断页面是否变化
+        :param recrawl_budget: 增量模式下每次爬取最多重新抓取的已知页面数（新页面不计入）
+        """
+        self.incremental = incremental
+        self.recrawl_budget = recrawl_budget
+
+
+class TransportConfig:
+    """
+    HTTP传输参数：连接池大小、keep-alive限制和超时
+    同步引擎作用于requests/urllib3的连接池，异步引擎作用于aiohttp的连接器或httpx客户端（HTTP/2）
+    """
+    DEFAULT_POOL_MAXSIZE = 10
+
+    def __init__(self, pool_connections=100, pool_maxsize=DEFAULT_POOL_MAXSIZE, keepalive_timeout=30.0,
+                 max_requests_per_connection=None, connect_timeout=None, read_timeout=None, http2=False):
+        """
+        :param pool_connections: 同步引擎最多保留多少个主机的连接池；异步引擎为同时打开的连接总数上限
+        :param pool_maxsize: 每个主机最多保持的连接数
+            （HTTP/2时同一主机的请求复用一个连接，httpx不支持按主机限制，异步引擎设置非默认值时报错）
+        :param keepalive_timeout: 空闲连接保持的秒数，超过后关闭重建；None表示不限制
+        :param max_requests_per_connection: 每个连接最多处理的请求数，达到后关闭重建；None表示不限制
+            （仅同步引擎，aiohttp和httpx都不支持，异步引擎设置时报错）
+        :param connect_timeout: 建立连接的超时秒数，None时与各请求的超时相同
+        :param read_timeout: 读取响应的超时秒数，None时使用各请求自己的超时
+        :param http2: 异步引擎是否使用httpx的HTTP/2客户端（同一主机的请求复用一个连接）：
+            True时https通过ALPN协商，http仍为HTTP/1.1；'h2c'时http也直接使用HTTP/2（服务器须支持）
+        """
+        if http2 not in (False, True, 'h2c'):
+            raise ValueError(f"未知的HTTP/2设置: {http2}")
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_timeout = keepalive_timeout
+        self.max_requests_per_connection = max_requests_per_connection
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2
+
+    def timeout(self, timeout):
+        """同步请求的 (连接超时, 读取超时)，timeout为调用方给出的超时"""
+        return (self.connect_timeout if self.connect_timeout is not None else timeout,
+                self.read_timeout if self.read_timeout is not None else timeout)
+
+
+def config_from_options(config_class, config, options):
+    """
+    取出options中属于config_class的参数（平铺的关键字参数，如crawl_delay），构造配置对象
+    :param config: 调用方给出的配置对象，None时用取出的参数构造；两者不能同时给出
+    :param options: 关键字参数字典，属于该配置的参数会被取出
+    :return: 配置对象
+    """
+    fields = {name: options.pop(name) for name in inspect.signature(config_class).parameters if name in options}
+    if config is None:
+        return config_class(**fields)
+    if fields:
+        raise TypeError(f"{', '.join(fields)} 属于{config_class.__name__}，不能与该配置对象同时给出")
+    return config
@@ -0,0 +1,148 @@
+"""
+请求重试策略和按主机的熔断器（同步、异步引擎和旧版爬虫共用）
+"""
+import time
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+
+class RetryPolicy:
+    """
+    请求重试策略：指数退避加随机抖动，429/503优先遵守Retry-After
+    连接错误、读取错误和可重试状态码各有独立的重试次数
+    """
+    # 可重试的状态码
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    # 会带Retry-After的状态码
+    RETRY_AFTER_STATUS = (429, 503)
+
+    def __init__(self, connect_retries=3, read_retries=2, status_retries=3,
+                 backoff_base=0.5, backoff_max=30.0, max_retry_after=120.0):
+        """
+        :param connect_retries: 连接失败（DNS、拒绝连接、连接超时）的重试次数
+        :param read_retries: 已连接后读取失败（读超时、连接中断）的重试次数
+        :param status_retries: 收到RETRY_STATUS状态码的重试次数
+        :param backoff_base: 第一次重试的退避上限（秒），之后每次翻倍
+        :param backoff_max: 退避时间上限（秒）
+        :param max_retry_after: Retry-After超过该值（秒）时不再重试
+        """
+        self.budgets = {'connect': connect_retries, 'read': read_retries, 'status': status_retries}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+
+    def new_attempts(self):
+        """单个请求的已重试次数（按错误类型）"""
+        return dict.fromkeys(self.budgets, 0)
+
+    def next_delay(self, attempts, kind, retry_after=None):
+        """
+        记录一次kind类错误，返回重试前应等待的秒数；该类重试次数已用完时返回None
+        :param attempts: new_attempts()返回的计数，原地更新
+        :param retry_after: 服务器要求的等待秒数（parse_retry_after的结果）
+        """
+        if attempts[kind] >= self.budgets[kind]:
+            return None
+        attempts[kind] += 1
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        # 完全抖动：在 [0, base * 2^n] 内随机，避免大量请求同时重试
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempts[kind] - 1)))
+
+    @staticmethod
+    def error_kind(error):
+        """requests异常的重试类别：'connect'或'read'，不值得重试的（SSL、URL错误等）返回None"""
+        if isinstance(error, requests.exceptions.SSLError):
+            return None
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return 'connect'
+        if isinstance(error, (requests.exceptions.ReadTimeout, requests.exceptions.ChunkedEncodingError)):
+            return 'read'
+        if isinstance(error, requests.exceptions.ConnectionError):
+            # 连接建立失败（DNS、拒绝连接）时底层原因是NewConnectionError，其余为连接后中断
+            reason = getattr(error.args[0], 'reason', None) if error.args else None
+            return 'connect' if isinstance(reason, NewConnectionError) else 'read'
+        return None
+
+    def retry_after(self, status, headers):
+        """429/503响应中Retry-After要求的等待秒数，没有或无法解析时返回None"""
+        if status not in self.RETRY_AFTER_STATUS:
+            return None
+        return self.parse_retry_after(headers.get('Retry-After'))
+
+    @staticmethod
+    def parse_retry_after(value):
+        """解析Retry-After（秒数或HTTP日期），返回非负秒数，无法解析时返回None"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostCircuitBreaker:
+    """
+    按主机的熔断器：连续失败达到阈值后打开，冷却期内不再调度该主机
+    冷却结束后放行请求作为探测，成功则恢复，失败则冷却时间加倍后再次打开
+    """
+    def __init__(self, failure_threshold=5, cooldown=30.0, max_cooldown=600.0):
+        """
+        :param failure_threshold: 连续失败多少次后打开（每次请求尝试都计数，包括重试）
+        :param cooldown: 第一次打开的冷却时间（秒）
+        :param max_cooldown: 冷却时间上限（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._failures = {}  # 主机 -> 连续失败次数
+        self._open_until = {}  # 主机 -> 允许探测的时间（time.monotonic()时钟）
+        self._cooldowns = {}  # 主机 -> 最近一次的冷却时间
+
+    def allow(self, host):
+        """该主机当前是否可以请求（关闭状态或冷却已结束）"""
+        return time.monotonic() >= self._open_until.get(host, 0.0)
+
+    def retry_at(self, host):
+        """该主机允许探测的时间点，未熔断时为0"""
+        return self._open_until.get(host, 0.0)
+
+    def open_hosts(self):
+        """处于熔断中（含等待探测结果）的主机"""
+        return list(self._open_until)
+
+    def record_success(self, host):
+        """请求成功：清零失败计数，熔断中的主机恢复，返回是否刚恢复"""
+        self._failures.pop(host, None)
+        self._cooldowns.pop(host, None)
+        return self._open_until.pop(host, None) is not None
+
+    def record_failure(self, host):
+        """请求失败：达到阈值（或探测失败）时打开熔断，返回是否刚打开"""
+        failures = self._failures.get(host, 0) + 1
+        probing = host in self._open_until
+        if not probing and failures < self.failure_threshold:
+            self._failures[host] = failures
+            return False
+        if probing and not self.allow(host):
+            # 打开后仍在返回的并发请求不延长冷却
+            return False
+        cooldown = min(self.max_cooldown, self._cooldowns.get(host, self.cooldown / 2) * 2)
+        self._cooldowns[host] = cooldown
+        self._open_until[host] = time.monotonic() + cooldown
+        self._failures[host] = 0
+        return True
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """主机处于熔断中，请求未发出"""